@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Measures how concurrent logins affect the latency of the rest of requests served by the gevent loop, verifying the
+password hashes inline (as the AuthManager used to do) and in the HashPool. Run it on the target board from the root
+of the project, gevent is required:
+
+    python2 benchmarks/bench_logins.py [concurrent logins] [seconds per case]
+"""
+import sys
+import time
+
+import gevent
+
+from genesis2.utils.hashpool import HashPool, PoolBusy
+from genesis2.utils.utils import hashpw, check_password
+
+
+def page_latency(duration, samples):
+    """
+    A cheap request: the delay of a 10ms sleep is the time the loop was blocked by somebody else.
+    """
+    end = time.time() + duration
+    while time.time() < end:
+        start = time.time()
+        gevent.sleep(0.01)
+        samples.append(time.time() - start - 0.01)
+
+
+def logins(verify, hashed, duration, counter):
+    end = time.time() + duration
+    while time.time() < end:
+        try:
+            verify('secret', hashed)
+            counter[0] += 1
+        except PoolBusy:
+            counter[1] += 1
+            gevent.sleep(0.01)
+
+
+def measure(name, verify, hashed, concurrency, duration):
+    samples = []
+    counter = [0, 0]
+    greenlets = [gevent.spawn(page_latency, duration, samples)]
+    greenlets.extend(gevent.spawn(logins, verify, hashed, duration, counter) for i in range(concurrency))
+    gevent.joinall(greenlets)
+    samples.sort()
+    print '%-8s logins/s %7.1f  shed %5d  page delay p50 %7.1fms  p99 %7.1fms  max %7.1fms' % (
+        name, counter[0] / duration, counter[1],
+        samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.99)] * 1000, samples[-1] * 1000)
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    hashed = hashpw('secret')
+
+    measure('inline', check_password, hashed, concurrency, duration)
+    pool = HashPool()
+    measure('pool', pool.verify, hashed, concurrency, duration)
+    pool.close()
+
+
+if __name__ == '__main__':
+    main()
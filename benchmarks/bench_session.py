@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of the per-request work of the SessionManager: the parsing of the cookie and a whole request of a
+returning client and of a new client. Run it from the root of the project:
+
+    python2 benchmarks/bench_session.py [iterations]
+"""
+import sys
+import time
+import Cookie
+
+from genesis2.plugins.genesis2_server.middleware.session import SessionStore, SessionManager, parse_cookie
+
+
+def measure(name, func, iterations):
+    start = time.time()
+    for i in xrange(iterations):
+        func()
+    elapsed = time.time() - start
+    print '%-36s %8.2f us/call' % (name, elapsed / iterations * 1e6)
+
+
+def application(environ, start_response):
+    start_response('200 OK', [('Content-type', 'text/plain')])
+    return ['']
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    store = SessionStore.init_safe()
+    environ = {
+        'REMOTE_ADDR': '192.168.1.10',
+        'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux armv7l) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/40.0',
+        'HTTP_HOST': 'genesis.local:8000',
+    }
+
+    # A returning client
+    SessionManager(store, application)(environ, lambda status, headers: None)
+    session = environ['app.session']
+    header = 'lang=en; sess=%s; theme=dark' % session.id
+
+    measure('Cookie.SimpleCookie', lambda: Cookie.SimpleCookie(header).get('sess'), iterations)
+    measure('parse_cookie', lambda: parse_cookie(header, 'sess'), iterations)
+
+    def returning():
+        request = dict(environ, HTTP_COOKIE=header)
+        SessionManager(store, application)(request, lambda status, headers: None)
+
+    def new():
+        SessionManager(store, application)(dict(environ), lambda status, headers: None)
+
+    measure('request of a returning client', returning, iterations)
+    measure('request of a new client', new, iterations // 10)
+
+
+if __name__ == '__main__':
+    main()
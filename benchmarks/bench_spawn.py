@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Measures how many processes per second the helpers of genesis2.utils.utils can spawn. Run it on the target board
+from the root of the project:
+
+    python2 benchmarks/bench_spawn.py [seconds per case]
+"""
+import sys
+import time
+
+from genesis2.utils import process
+from genesis2.utils.utils import shell, command
+
+
+def measure(name, func, duration):
+    count = 0
+    start = time.time()
+    while time.time() - start < duration:
+        func()
+        count += 1
+    elapsed = time.time() - start
+    print '%-32s %8.1f spawns/s' % (name, count / elapsed)
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+
+    for close_fds in (False, True):
+        process.configure(close_fds=close_fds)
+        suffix = ' (close_fds)' if close_fds else ''
+        measure('shell("true")' + suffix, lambda: shell('true'), duration)
+        measure('command(["true"])' + suffix, lambda: command(['true']), duration)
+
+
+if __name__ == '__main__':
+    main()
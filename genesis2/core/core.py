@@ -2,6 +2,7 @@ import imp
 import os
 import inspect
 import logging
+import importlib
 from types import FunctionType
 
 from genesis2.core.utils import Singleton, Observable
@@ -119,24 +120,41 @@ class PluginLoader(object):
     def __init__(self):
         # Only a call per launcher is allowed to avoid the hot-install of plugins
         self.__called = False
+        # Modules of the plugins loaded
+        self.plugins = []
 
     def load_plugins(self, dir='genesis2', config_path='configs/genesis2.conf'):
+        """
+        Imports the plugins listed in the PLUGINS of the plugins package of ``dir``. They're imported with the name
+        of their package, so the modules that import a plugin by its full name get the same module and the same
+        Plugin classes.
+
+        :param  dir:    path of the package with the plugins package, relative to the root of genesis2
+        """
         if self.__called is False:
             logger = logging.getLogger('genesis2')
-            plugins_dir = os.path.join(os.getcwd(), dir)
-            plugins_module = imp.load_module('plugins', *imp.find_module('plugins', [plugins_dir]))
+            package = dir.strip('/').replace('/', '.') + '.plugins'
+            plugins_module = importlib.import_module(package)
             # This is used by the GenesisConf plugin, to see why read the docs.
             setattr(plugins_module, 'config_path', config_path)
             if hasattr(plugins_module, 'PLUGINS'):
                 for plugin in plugins_module.PLUGINS:
                     try:
-                        imp.load_module(plugin, *imp.find_module(plugin, plugins_module.__path__))
-                    except ImportError:
-                        logger.warning('Plugin %s cannot be loaded in %s' % (plugin, plugins_dir))
+                        self.plugins.append(importlib.import_module('%s.%s' % (package, plugin)))
+                    except ImportError, e:
+                        logger.warning('Plugin %s cannot be loaded in %s: %s' % (plugin, package, e))
             else:
-                logger.error('PLUGINS attribute is missing in %s' % plugins_dir)
+                logger.error('PLUGINS attribute is missing in %s' % package)
             self.__called = True
 
+    def start_plugins(self):
+        """
+        Calls the ``start`` function of the loaded plugins that work in the background, once the apps are loaded.
+        """
+        for plugin in self.plugins:
+            if hasattr(plugin, 'start'):
+                plugin.start()
+
 
 class AppRegister(object):
     """
@@ -1,5 +1,8 @@
 import os
 import gc
+import time
+import shutil
+import tempfile
 from unittest import TestCase
 from mock import patch, MagicMock, call
 
@@ -7,7 +10,8 @@ from genesis2.core.exceptions import AppInterfaceImplError, AppRequirementError,
     PluginInterfaceImplError, PluginAlreadyImplemented, PluginImplementationAbstract
 
 from genesis2.core.core import AppManager, AppInfo, App, PluginLoader, Plugin
-from genesis2.core.utils import Observable, Interface
+from genesis2.core.utils import Observable, Interface, GenesisManager, Singleton
+from genesis2.utils.config import Config
 from genesis2.core.tests.interfaces import IFakeInterface, IAnotherInterface
 import genesis2.apis
 
@@ -234,6 +238,17 @@ class TestIntegration(TestCase):
         with self.assertRaises(AccessDenied):
             app.instance.required()
 
+    def test_plugin_modules(self):
+        import genesis2.core.tests.plugins.alehop_plugin as alehop_plugin
+        self.assertIn(alehop_plugin, PluginLoader().plugins)
+
+    def test_start_plugins(self):
+        loader = PluginLoader()
+        background = MagicMock()
+        with patch.object(loader, 'plugins', [background, object()]):
+            loader.start_plugins()
+        background.start.assert_called_once_with()
+
 
 class TestObservable(TestCase):
     def setUp(self):
@@ -293,6 +308,57 @@ class TestObservable(TestCase):
         self.assertEqual(observable.get_n_observers(), 0)
 
 
+class TestGenesisManager(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'genesis2.conf')
+        self.write('[genesis2]\nbind_port = 8000\n\n[users]\nadmin = hash\n')
+        config = Config()
+        config.load(self.path)
+        Singleton._instances.pop(GenesisManager, None)
+        self.manager = GenesisManager(config)
+        self.observer = MagicMock()
+        self.manager.add_observer(self.observer)
+
+    def tearDown(self):
+        self.manager.unwatch()
+        Singleton._instances.pop(GenesisManager, None)
+        shutil.rmtree(self.dir)
+
+    def write(self, content):
+        with open(self.path, 'w') as fd:
+            fd.write(content)
+
+    def test_reload(self):
+        old = self.manager.config
+        self.write('[genesis2]\nbind_port = 8000\n\n[users]\nadmin = other\nguest = hash\n')
+        diff = self.manager.reload()
+        self.assertEqual(diff, {'users': {'admin': ('hash', 'other'), 'guest': (None, 'hash')}})
+        self.assertIsNot(self.manager.config, old)
+        self.assertEqual(self.manager.config.get('users', 'guest'), 'hash')
+        # The old config is untouched for the requests in flight
+        self.assertEqual(old.get('users', 'admin'), 'hash')
+        self.assertEqual(self.manager.version, 1)
+        self.observer.notify.assert_called_once_with(self.manager, 'config', diff, old, self.manager.config)
+
+    def test_unchanged_or_invalid(self):
+        old = self.manager.config
+        self.assertEqual(self.manager.reload(), {})
+        self.write('invalid')
+        self.assertIsNone(self.manager.reload())
+        self.assertIs(self.manager.config, old)
+        self.assertFalse(self.observer.notify.called)
+
+    def test_watch(self):
+        self.manager.watch(0.01)
+        time.sleep(0.05)
+        self.write('[genesis2]\nbind_port = 9000\n')
+        deadline = time.time() + 2
+        while self.manager.version == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.manager.config.get('genesis2', 'bind_port'), '9000')
+
+
 class TestPluginManager(TestCase):
     def setUp(self):
         class MyPlugin(Plugin):
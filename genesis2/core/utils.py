@@ -1,4 +1,7 @@
+import os
+import logging
 import weakref
+import threading
 
 
 class Singleton(type):
@@ -26,6 +29,12 @@ class Observable(object):
     def get_n_observers(self):
         return len(self.__observers)
 
+    def get_observers(self):
+        """
+        :returns:   list of the observers that are still alive
+        """
+        return [observer for observer in (ref() for ref in list(self.__observers)) if observer is not None]
+
     def add_observer(self, observer):
         # Duck typing
         if hasattr(observer, "notify"):
@@ -42,16 +51,75 @@ class Observable(object):
             observer().notify(self, msg, *args)
 
 
-class GenesisManager():
+def diff_configs(old, new):
+    """
+    Compares two :class:`genesis2.utils.config.Config`.
+
+    :returns:   dict section -> dict option -> (old value, new value) with the options that changed, a value is None if
+                the option doesn't exist in that config
+    """
+    old, new = old.snapshot(), new.snapshot()
+    diff = {}
+    for section in set(old) | set(new):
+        old_options, new_options = old.get(section, {}), new.get(section, {})
+        for option in set(old_options) | set(new_options):
+            old_value, new_value = old_options.get(option), new_options.get(option)
+            if old_value != new_value:
+                diff.setdefault(section, {})[option] = (old_value, new_value)
+    return diff
+
+
+class ConfigWatcher(threading.Thread):
+    """
+    Thread that reloads the config of the :class:`GenesisManager` when its file changes. The file is checked every
+    ``interval`` seconds with a stat, so it costs nothing while the file doesn't change.
+    """
+    def __init__(self, manager, interval=5):
+        super(ConfigWatcher, self).__init__(name='ConfigWatcher')
+        self.daemon = True
+        self.manager = manager
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            # The file is being replaced
+            return None
+        return st.st_mtime, st.st_size, st.st_ino
+
+    def run(self):
+        last = self.signature(self.manager.config.filename)
+        while not self._stopped.wait(self.interval):
+            current = self.signature(self.manager.config.filename)
+            if current is not None and current != last:
+                last = current
+                self.manager.reload()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class GenesisManager(Observable):
     """
     Here's where some hot genesis objects should be referenced to allow that anyone could use them.
     One clear example is the ParserConfig of genesis2.conf.
+
+    The config can be reloaded without restarting genesis2 (see :meth:`reload` and :meth:`watch`): the new config is
+    loaded aside and swapped in a single assignment, so the requests in flight keep the config they started with
+    and the new ones get the new config. The observers are notified with
+    ``notify(manager, 'config', diff, old, new)``, see :func:`diff_configs`.
     """
     __metaclass__ = Singleton
 
     def __init__(self, config):
         super(GenesisManager, self).__init__()
         self.__config = config
+        self.version = 0
+        self._reload_lock = threading.Lock()
+        self._watcher = None
 
     @property
     def config(self):
@@ -65,6 +133,49 @@ class GenesisManager():
     def config(self):
         pass
 
+    def reload(self):
+        """
+        Loads again the file of the config and swaps it if it's valid.
+
+        :returns:   the diff with the previous config or None if the new config is invalid
+        """
+        logger = logging.getLogger('genesis2')
+        with self._reload_lock:
+            old = self.__config
+            new = old.__class__(max_proxies=old.max_proxies)
+            try:
+                new.load(old.filename)
+            except Exception, e:
+                logger.error('Cannot reload %s, keeping the current config: %s' % (old.filename, e))
+                return None
+            new.user_store = old.user_store
+            diff = diff_configs(old, new)
+            if not diff:
+                return diff
+            self.__config = new
+            self.version += 1
+            logger.info('Reloaded %s (version %d), changed sections: %s' %
+                        (old.filename, self.version, ', '.join(sorted(diff))))
+
+        try:
+            self.notify_observers('config', diff, old, new)
+        except Exception, e:
+            logger.error('An observer failed while reloading %s: %s' % (old.filename, e))
+        return diff
+
+    def watch(self, interval=5):
+        """
+        Starts a :class:`ConfigWatcher` that reloads the config when its file changes.
+        """
+        if self._watcher is None:
+            self._watcher = ConfigWatcher(self, interval)
+            self._watcher.start()
+
+    def unwatch(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
 
 class Interface(object):
     """
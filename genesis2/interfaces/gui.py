@@ -107,7 +107,8 @@ class IURLHandler(Interface):
         :type   req:    dict
         :param  sr:     start_response callback for setting HTTP code and headers
         :type   sr:     func(code, headers)
-        :returns:       raw response body
+        :returns:       raw response body: a string, a list of strings, a file or an iterable of strings that is
+                        streamed to the client (its ``close()`` is called when the response ends)
         :rtype:         str
         """
 
@@ -158,11 +159,39 @@ class IWidget(Interface):
 
 
 class ISysStat(Interface):
+    """
+    Statistics of the system resources
+    """
     def get_load(self):
-        pass
+        """
+        :returns:       load average of 1, 5 and 15 minutes
+        :rtype:         tuple(float)
+        """
 
     def get_ram(self):
-        pass
+        """
+        :returns:       used and total RAM in bytes
+        :rtype:         tuple(int)
+        """
 
     def get_swap(self):
-        pass
+        """
+        :returns:       used and total swap in bytes
+        :rtype:         tuple(int)
+        """
+
+    def get_cpu(self, caller=None):
+        """
+        :param  caller: key of the caller, the utilisation is computed since its previous call
+        :returns:       CPU utilisation (%) since the previous call, indexed by cpu
+                        ('cpu' is the aggregate of all the cpus)
+        :rtype:         dict(str:float)
+        """
+
+    def get_disks(self, caller=None):
+        """
+        :param  caller: key of the caller, the rates are computed since its previous call
+        :returns:       bytes/s read ('read') and written ('write') and utilisation
+                        ('busy', %) since the previous call, indexed by block device
+        :rtype:         dict(str:dict)
+        """
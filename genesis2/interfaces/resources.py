@@ -8,10 +8,10 @@ class IConfManager(Interface):
     def get_conf(self, path):
         pass
 
-    def add_observer(self, path):
+    def add_observer(self, observer, path):
         pass
 
-    def delete_observer(self, path):
+    def delete_observer(self, observer, path=None):
         pass
 
     def notify_observers(self, path, event):
@@ -28,6 +28,15 @@ class IConfGenesis2Manager(IConfParserManager):
         super(IConfGenesis2Manager, self).__init__()
 
 
+class IModuleConfig(Interface):
+    """
+    Base interface for the configs of the plugins, looked up by the Dispatcher with the class of the plugin they
+    configure (``target`` attribute).
+    """
+    def overlay_config(self):
+        pass
+
+
 class IComponent (Interface):
     """
     Base interface for background components.
@@ -3,12 +3,17 @@ import logging
 import logging.config
 import json
 
+import genesis2.apis
 from genesis2 import version
-from genesis2.core.core import AppManager
+from genesis2.core.core import AppManager, PluginLoader
 from genesis2.core.utils import GenesisManager
 from genesis2.utils.config import Config
+from genesis2.utils.userstore import UserStore
+from genesis2.utils.throttle import LoginThrottle
+from genesis2.utils.hashpool import HashPool
 from genesis2.utils.arkos_platform import detect_platform
 from genesis2.utils.filesystem import create_files
+from genesis2.utils import interlocked, process, compression
 
 
 def make_log(config_dir):
@@ -57,14 +62,56 @@ def run_server(config_file=''):
         logger.critical("The %s doesn't exist" % config_file)
         exit(-1)
 
+    # Workers that verify the password hashes out of the gevent loop. They're forked before any thread is started,
+    # a fork made while another thread holds a lock could deadlock the worker
+    HashPool(processes=config.get_int('genesis2', 'hash_workers', 0) or None,
+             max_pending=config.get_int('genesis2', 'hash_max_pending', 16)).start()
+
+    # Optional indexed store of the users and their settings, filled from the [users] section and the users/*.conf
+    # files the first time it's used
+    user_store = config.get('genesis2', 'user_store', '')
+    if user_store:
+        user_store = os.path.join(config_dir, user_store)
+        config.user_store = UserStore(user_store)
+        if not config.user_store.has_users():
+            users, files = config.user_store.import_legacy(config)
+            logger.info('Imported %d users and %d user configs in %s' % (users, files, user_store))
+
     # (kudrom) TODO: I should delete the GenesisManager and substitute it with a Plugin
-    GenesisManager(config)
+    manager = GenesisManager(config)
+    # Live reload of genesis2.conf, the new users are used by the AuthManager of the next requests
+    watch_interval = config.get_int('genesis2', 'config_watch_interval', 5)
+    if watch_interval > 0:
+        manager.watch(watch_interval)
+
+    # Optional instrumentation of the locks used by ClassProxy, exposed in /middleware/locks
+    if config.get_bool('genesis2', 'lock_stats', False):
+        interlocked.enable_stats(
+            summary_interval=config.get_int('genesis2', 'lock_stats_interval', 300),
+            hold_threshold=config.get_int('genesis2', 'lock_hold_threshold', 30),
+        )
+        logger.info('Lock instrumentation enabled')
+
+    # Limits of the external commands run by the shell helpers
+    timeout = config.get('genesis2', 'process_timeout', '')
+    process.configure(max_processes=config.get_int('genesis2', 'max_processes', 8),
+                      timeout=int(timeout) if timeout else None)
+
+    # Backoff of the failed logins, see genesis2.utils.throttle
+    LoginThrottle(free_failures=config.get_int('genesis2', 'login_free_failures', 3),
+                  max_delay=config.get_int('genesis2', 'login_max_delay', 600),
+                  user_free_failures=config.get_int('genesis2', 'login_user_free_failures', 100))
+
+    # Compression of the responses, see genesis2.utils.compression
+    compression.configure(level=config.get_int('genesis2', 'compression_level', 6),
+                          min_size=config.get_int('genesis2', 'compression_min_size', 1024))
 
     platform = detect_platform()
     logger.info('Detected platform: %s' % platform)
 
     # Load plugins
-    import genesis2.plugins
+    loader = PluginLoader()
+    loader.load_plugins(config_path=config_file)
 
     # Load apps
     path_apps = config.get("genesis2", "path_apps", None)
@@ -74,6 +121,9 @@ def run_server(config_file=''):
     appmgr = AppManager(path_apps=path_apps)
     appmgr.load_apps()
 
+    # The plugins that work in the background (like the sampler of the health plugin) start once the apps are loaded
+    loader.start_plugins()
+
     # (kudrom) TODO: Register a new ComponentMgr
 
     # (kudrom) TODO: we should use an iptables plugin
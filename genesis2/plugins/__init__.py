@@ -1,3 +1,5 @@
 PLUGINS = [
-    'genesis2_server'
+    'genesis2_server',
+    'sysstat',
+    'health'
 ]
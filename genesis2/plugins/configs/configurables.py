@@ -1,10 +1,18 @@
 import os
+import fnmatch
 import logging
+import weakref
+import threading
+from contextlib import contextmanager
+from cStringIO import StringIO
 from ConfigParser import SafeConfigParser
-from types import FunctionType
 
 from genesis2.utils.filesystem import create_files
 from genesis2.core.core import Plugin
+from genesis2.core.utils import GenesisManager
+from deferred import DeferredNotifier
+from filecache import file_cache, parse_ini
+from transaction import Transaction
 from exceptions import ConfFileIsInvalid, EventIsInvalid, FileIsNotRegistered
 from genesis2.interfaces.resources import IConfManager, IConfParserManager, IConfGenesis2Manager
 from genesis2.utils.interlocked import ClassProxy
@@ -16,25 +24,50 @@ class Configurable(object):
         self.path = path
 
     def read(self):
+        """
+        :returns:   file-like object with the content of the file, served from the
+                    :class:`genesis2.plugins.configs.filecache.FileCache` while the file doesn't change
+        """
         self.manager.notify_observers(self.path, 'pre_read')
-        fd = open(self.path, 'r')
+        fd = StringIO(file_cache.read(self.path))
         self.manager.notify_observers(self.path, 'post_read')
         return fd
 
     def write(self, text, mode='a'):
+        """
+        Appends ``text`` to the file (or replaces its content if ``mode`` is 'w') atomically, see
+        :meth:`ConfManager.write`.
+        """
         self.manager.notify_observers(self.path, 'pre_write')
-        fd = open(self.path, mode)
-        self.manager.notify_observers(self.path, 'post_write')
-        return fd.write(text)
+        self.manager.write(self.path, text, mode)
 
 
 class ConfManager(Plugin):
+    """
+    Manages the configuration files and notifies their reads and writes to the observers.
+
+    The observers are indexed by (path, event), so a notification only costs the observers interested in it. The
+    path of a subscription can also be a glob (``/etc/nginx/*.conf``) or a prefix ending with a slash
+    (``/etc/nginx/``); the subscriptions matched by every path are memoized until the subscriptions change. The
+    observers are weak references, so the owner of an observer must keep a reference to it.
+    """
+    EVENTS = ('pre_read', 'post_read', 'pre_write', 'post_write')
+
     def __init__(self):
         super(ConfManager, self).__init__()
         self._implements.append(IConfManager)
         self._conf_class = Configurable
         self._configurables = {}
-        self._callbacks = {'pre_read': [], 'post_read': [], 'pre_write': [], 'post_write': []}
+        self._lock = threading.Lock()
+        # (path or pattern, event) -> list of weak references to the observers
+        self._observers = {}
+        # globs and prefixes with some subscription
+        self._patterns = set()
+        # path -> list of the patterns that match it
+        self._matches = {}
+        self._deferred_events = ()
+        self._notifier = None
+        self._local = threading.local()
 
     def _create_conf(self, path, *args, **kwargs):
         if path not in self._configurables:
@@ -49,51 +82,187 @@ class ConfManager(Plugin):
     def get_conf(self, path):
         return self._create_conf(path)
 
-    # Me falta el path, probablemente haya que cambiar la estructura de _callbacks a {path: {event: [observables]}}
+    @staticmethod
+    def _is_pattern(path):
+        return path.endswith('/') or any(char in path for char in '*?[')
+
+    @staticmethod
+    def _match(pattern, path):
+        if pattern.endswith('/'):
+            return path.startswith(pattern)
+        return fnmatch.fnmatchcase(path, pattern)
+
     def add_observer(self, observer, path):
-        namespace = dir(observer)
-        for event in self._callbacks:
-            if event in namespace and isinstance(observer.event, FunctionType):
-                self._callbacks[event].append(observer)
+        """
+        Subscribes ``observer`` to the events of the files matched by ``path``. The observer is notified of every
+        event (``pre_read``, ``post_read``, ``pre_write``, ``post_write``) for which it has a method with the same
+        name, that's called with the path of the file.
 
-    def delete_observer(self, observer):
-        for event, observers in self._callbacks.values():
-            if observer in observers:
-                self._callbacks[event].remove(observer)
+        :param  path:   path of a file, glob or prefix ending with a slash
+        :type   path:   str
+        """
+        events = [event for event in self.EVENTS if callable(getattr(observer, event, None))]
+        with self._lock:
+            for event in events:
+                refs = self._observers.setdefault((path, event), [])
+                if not any(ref() is observer for ref in refs):
+                    refs.append(weakref.ref(observer))
+            if events and self._is_pattern(path) and path not in self._patterns:
+                self._patterns.add(path)
+                self._matches = {}
 
-    def notify_observers(self, path, event):
-        logger = logging.getLogger('genesis2')
-        if event in self._callbacks:
-            if path in self._configurables:
-                for observer in self._callbacks[event]:
-                    callback = getattr(observer, event)
-                    try:
-                        callback(path)
-                    except:
-                        logger.warning('Observer %s[%s] failed while performing %s on %s.' %
-                                       (observer, observer.__module__, event, path))
-            else:
-                raise FileIsNotRegistered(path)
+    def delete_observer(self, observer, path=None):
+        """
+        Unsubscribes ``observer`` from ``path`` or from every path if ``path`` is None.
+        """
+        with self._lock:
+            for key in self._observers.keys():
+                if path is None or key[0] == path:
+                    self._prune(key, observer)
+
+    def _prune(self, key, observer=None):
+        """
+        Removes ``observer`` and the dead references from the subscriptions of ``key``. Must be called with the
+        lock acquired.
+        """
+        refs = [ref for ref in self._observers[key] if ref() is not None and ref() is not observer]
+        if refs:
+            self._observers[key] = refs
+            return
+        del self._observers[key]
+        if key[0] in self._patterns and not any(other[0] == key[0] for other in self._observers):
+            self._patterns.discard(key[0])
+            self._matches = {}
+
+    def _patterns_of(self, path):
+        patterns = self._matches.get(path)
+        if patterns is None:
+            with self._lock:
+                patterns = self._matches[path] = [pattern for pattern in self._patterns
+                                                  if self._match(pattern, path)]
+        return patterns
+
+    @contextmanager
+    def transaction(self):
+        """
+        Context manager that groups the writes made by the calling thread in a
+        :class:`genesis2.plugins.configs.transaction.Transaction`, committed when the block ends without errors and
+        discarded otherwise. A nested block joins the transaction of the outer one.
+        """
+        transaction = getattr(self._local, 'transaction', None)
+        if transaction is not None:
+            yield transaction
+            return
+        transaction = self._local.transaction = Transaction(self)
+        try:
+            yield transaction
+        finally:
+            self._local.transaction = None
+        transaction.commit()
+
+    def write(self, path, text, mode='a'):
+        """
+        Writes in a configuration file, through the transaction of the calling thread if there's one or atomically
+        right now otherwise. The ``post_write`` notification is sent once the file is written.
+
+        :param  mode:   'a' appends ``text`` to the file, 'w' replaces the content of the file
+        """
+        transaction = getattr(self._local, 'transaction', None)
+        if transaction is not None:
+            transaction.write(path, text, mode)
         else:
+            transaction = Transaction(self)
+            transaction.write(path, text, mode)
+            transaction.commit()
+
+    def defer_events(self, events=('post_write',), debounce=0.5, max_delay=5):
+        """
+        Delivers the notifications of ``events`` asynchronously and coalesced through a
+        :class:`genesis2.plugins.configs.deferred.DeferredNotifier`. The rest of events are still delivered
+        synchronously. Calling it with no events stops the asynchronous delivery.
+        """
+        if self._notifier is not None:
+            self._notifier.stop()
+            self._notifier.flush()
+            self._notifier = None
+        self._deferred_events = tuple(events)
+        if events:
+            self._notifier = DeferredNotifier(self._deliver, debounce, max_delay)
+            self._notifier.start()
+
+    def flush_observers(self):
+        """
+        Delivers now every deferred notification.
+        """
+        if self._notifier is not None:
+            self._notifier.flush()
+
+    def notify_observers(self, path, event):
+        if event not in self.EVENTS:
             raise EventIsInvalid(event)
+        if path not in self._configurables:
+            raise FileIsNotRegistered(path)
+        notifier = self._notifier
+        if notifier is not None and event in self._deferred_events:
+            notifier.put(path, event)
+        else:
+            self._deliver(path, event)
+
+    def _deliver(self, path, event):
+        logger = logging.getLogger('genesis2')
+        keys = [(path, event)] + [(pattern, event) for pattern in self._patterns_of(path)]
+        for key in keys:
+            refs = self._observers.get(key)
+            if not refs:
+                continue
+            dead = False
+            for ref in list(refs):
+                observer = ref()
+                if observer is None:
+                    dead = True
+                    continue
+                try:
+                    getattr(observer, event)(path)
+                except:
+                    logger.warning('Observer %s[%s] failed while performing %s on %s.' %
+                                   (observer, observer.__module__, event, path))
+            if dead:
+                with self._lock:
+                    if key in self._observers:
+                        self._prune(key)
 
 
 class ParserConfigurable(SafeConfigParser):
     def __init__(self, path, manager):
-        super(ParserConfigurable, self).__init__()
+        SafeConfigParser.__init__(self)
         self.manager = manager
         self.path = path
 
     def read(self):
+        """
+        Merges the content of the file in the parser, as :meth:`SafeConfigParser.read` does, but the file is
+        only parsed again when it changes.
+        """
         self.manager.notify_observers(self.path, 'pre_read')
-        super(ParserConfigurable, self).read(self.path)
+        try:
+            defaults, sections = file_cache.parsed(self.path, 'ini', parse_ini)
+        except (IOError, OSError):
+            # SafeConfigParser ignores the files that can't be read
+            pass
+        else:
+            self._defaults.update(defaults)
+            for name, options in sections.items():
+                self._sections.setdefault(name, self._dict()).update(options)
         self.manager.notify_observers(self.path, 'post_read')
 
     def write(self, mode='a'):
-        fp = open(self.path, mode)
+        """
+        Writes the parser in the file atomically, see :meth:`ConfManager.write`.
+        """
         self.manager.notify_observers(self.path, 'pre_write')
-        super(ParserConfigurable, self).write(fp)
-        self.manager.notify_observers(self.path, 'post_write')
+        fp = StringIO()
+        SafeConfigParser.write(self, fp)
+        self.manager.write(self.path, fp.getvalue(), mode)
 
 
 class ConfParserManager(ConfManager):
@@ -142,7 +311,19 @@ class Genesis2Proxy(object):
         if not os.path.exists(self.users_dir) or not os.path.isdir(self.users_dir):
             os.mkdir(self.users_dir)
 
-    def add_user(self, user):
+    def add_user(self, user, password=None):
+        """
+        Creates the user in the user store if there's one, its personal settings are kept there too. Otherwise only
+        the file of its personal config is created in the users directory.
+
+        :param  password:   hash of the password, see :func:`genesis2.utils.utils.hashpw`, required by the user store
+        """
+        store = GenesisManager().config.user_store
+        if store is not None:
+            if password is None:
+                raise ValueError('The user store needs the password of %s' % user)
+            store.set_password(user, password)
+            return
         path_user = os.path.join(self.users_dir, user)
         if not os.path.exists(path_user) or not os.path.isfile(path_user):
             open(path_user, 'w').close()
@@ -0,0 +1,97 @@
+__author__ = 'kudrom'
+import time
+import logging
+import threading
+
+from genesis2.plugins.workers.parallels import BackgroundWorker
+
+
+class DeferredNotifier(BackgroundWorker):
+    """
+    Delivers the notifications of the :class:`genesis2.plugins.configs.configurables.ConfManager` from a background
+    thread, so a slow observer (e.g. one that restarts a service) doesn't block the writer of the file.
+
+    The notifications of the same (path, event) are coalesced: a notification is delivered when no other one of the
+    same path and event has arrived during ``debounce`` seconds, or at most ``max_delay`` seconds after the first one
+    of the burst, so a batch of edits triggers a single reload.
+    """
+    def __init__(self, deliver, debounce=0.5, max_delay=5):
+        """
+        :param  deliver:    callable ``deliver(path, event)`` that calls the observers
+        """
+        BackgroundWorker.__init__(self)
+        self.deliver = deliver
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.received = 0
+        self.delivered = 0
+        self._stopped = False
+        self._condition = threading.Condition()
+        # (path, event) -> (time of the first notification of the burst, deadline)
+        self._pending = {}
+
+    def put(self, path, event):
+        now = time.time()
+        with self._condition:
+            self.received += 1
+            first = self._pending.get((path, event), (now, None))[0]
+            self._pending[(path, event)] = (first, min(now + self.debounce, first + self.max_delay))
+            self._condition.notify()
+
+    def _pop(self, now=None):
+        """
+        Removes from the pending notifications the ones due at ``now`` (every one if None). Must be called with the
+        lock of the condition acquired.
+
+        :returns:   list of (path, event) in order of deadline
+        """
+        due = sorted((deadline, key) for key, (first, deadline) in self._pending.items()
+                     if now is None or deadline <= now)
+        for deadline, key in due:
+            del self._pending[key]
+        return [key for deadline, key in due]
+
+    def _deliver(self, keys):
+        logger = logging.getLogger('genesis2')
+        for path, event in keys:
+            try:
+                self.deliver(path, event)
+            except Exception, e:
+                logger.warning('Deferred notification of %s on %s failed: %s' % (event, path, e))
+            self.delivered += 1
+
+    def run(self):
+        while not self._stopped:
+            with self._condition:
+                now = time.time()
+                due = self._pop(now)
+                if not due:
+                    timeout = None
+                    if self._pending:
+                        timeout = min(deadline for first, deadline in self._pending.values()) - now
+                    self._condition.wait(timeout)
+                    continue
+            self._deliver(due)
+
+    def flush(self):
+        """
+        Delivers now, in the calling thread, every pending notification.
+        """
+        with self._condition:
+            due = self._pop()
+        self._deliver(due)
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'received': self.received,
+            'delivered': self.delivered,
+            'pending': pending,
+            'coalesced': self.received - self.delivered - pending,
+        }
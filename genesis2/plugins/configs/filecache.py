@@ -0,0 +1,144 @@
+__author__ = 'kudrom'
+import os
+import logging
+import threading
+from cStringIO import StringIO
+from ConfigParser import RawConfigParser
+
+from genesis2.utils import metrics
+
+try:
+    import pyinotify
+except ImportError:
+    pyinotify = None
+
+
+class FileCache(object):
+    """
+    Cache of the content of the configuration files and of the objects parsed from them.
+
+    An entry is valid while the (mtime, size, inode) of the file doesn't change, so serving a read costs a stat
+    instead of an open, a read and a parse. If pyinotify is available the directories can be watched with
+    :meth:`watch`; the files of a watched directory are served without the stat and invalidated by inotify.
+
+    Instance vars:
+
+    - ``hits`` - `int`, reads served from memory
+    - ``misses`` - `int`, reads of the file
+    - ``parses`` - `int`, objects parsed
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.parses = 0
+        self._lock = threading.Lock()
+        # path -> (signature, content, dict kind -> parsed object)
+        self._entries = {}
+        self._watched = set()
+        self._notifier = None
+
+    @staticmethod
+    def signature(path):
+        st = os.stat(path)
+        return st.st_mtime, st.st_size, st.st_ino
+
+    def _entry(self, path):
+        entry = self._entries.get(path)
+        if entry is not None and os.path.dirname(path) in self._watched:
+            self.hits += 1
+            return entry
+        signature = self.signature(path)
+        if entry is not None and entry[0] == signature:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        with open(path, 'r') as fd:
+            content = fd.read()
+        entry = (signature, content, {})
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def read(self, path):
+        """
+        :returns:   the content of the file
+        :raises:    OSError or IOError if the file can't be read
+        """
+        return self._entry(path)[1]
+
+    def parsed(self, path, kind, parse):
+        """
+        :param  kind:   name of the kind of object, a file can be parsed in several ways
+        :param  parse:  callable that parses the content of the file
+        :returns:       the object returned by ``parse(content)``, which must not be modified by the caller
+        """
+        signature, content, objects = self._entry(path)
+        if kind not in objects:
+            self.parses += 1
+            objects[kind] = parse(content)
+        return objects[kind]
+
+    def invalidate(self, path=None):
+        """
+        Forgets the entry of ``path`` or every entry if None.
+        """
+        with self._lock:
+            if path is None:
+                self._entries = {}
+            else:
+                self._entries.pop(path, None)
+
+    def watch(self, directory):
+        """
+        Invalidates the entries of the files of ``directory`` through inotify.
+
+        :returns:   False if pyinotify isn't available
+        """
+        if pyinotify is None:
+            return False
+        directory = os.path.abspath(directory)
+        with self._lock:
+            if directory in self._watched:
+                return True
+            if self._notifier is None:
+                self._manager = pyinotify.WatchManager()
+                self._notifier = pyinotify.ThreadedNotifier(self._manager, self._process_event)
+                self._notifier.daemon = True
+                self._notifier.start()
+            mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MODIFY | pyinotify.IN_ATTRIB | pyinotify.IN_MOVED_TO | \
+                pyinotify.IN_MOVED_FROM | pyinotify.IN_DELETE
+            if self._manager.add_watch(directory, mask).get(directory, -1) < 0:
+                logging.getLogger('genesis2').warning('Cannot watch %s with inotify' % directory)
+                return False
+            self._watched.add(directory)
+        return True
+
+    def _process_event(self, event):
+        self.invalidate(event.pathname)
+
+    def stop(self):
+        with self._lock:
+            if self._notifier is not None:
+                self._notifier.stop()
+                self._notifier = None
+            self._watched = set()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'parses': self.parses,
+                'bytes': sum(len(entry[1]) for entry in self._entries.values())}
+
+
+def parse_ini(content):
+    """
+    Parses an INI file.
+
+    :returns:   tuple (defaults, sections) with the dicts of a :class:`ConfigParser.RawConfigParser`
+    """
+    parser = RawConfigParser()
+    parser.readfp(StringIO(content))
+    return parser._defaults, parser._sections
+
+
+file_cache = FileCache()
+metrics.register_collector('file_cache', file_cache.stats)
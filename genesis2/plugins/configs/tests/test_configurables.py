@@ -0,0 +1,185 @@
+__author__ = 'kudrom'
+import os
+import time
+import shutil
+import tempfile
+from unittest import TestCase
+
+import genesis2.apis
+from genesis2.core.core import AppManager
+from genesis2.core.utils import GenesisManager, Singleton
+from genesis2.plugins.configs.configurables import ConfManager, ConfParserManager, Genesis2Proxy
+from genesis2.plugins.configs.exceptions import EventIsInvalid, FileIsNotRegistered
+from genesis2.utils.config import Config
+from genesis2.utils.userstore import UserStore
+
+
+class Observer(object):
+    def __init__(self):
+        self.events = []
+
+    def pre_read(self, path):
+        self.events.append(('pre_read', path))
+
+    def post_write(self, path):
+        self.events.append(('post_write', path))
+
+
+class TestConfManager(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # The methods of the plugin are protected against the apps
+        AppManager(path_apps=self.dir)
+        if not hasattr(genesis2.apis, 'PConfManager'):
+            ConfManager()
+        self.manager = genesis2.apis.PConfManager
+        self.paths = []
+        for name in ('a.conf', 'b.conf', 'c.ini'):
+            path = os.path.join(self.dir, name)
+            open(path, 'w').close()
+            self.manager.get_conf(path)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_path(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.paths[0])
+        self.manager.notify_observers(self.paths[0], 'pre_read')
+        self.manager.notify_observers(self.paths[0], 'post_read')
+        self.manager.notify_observers(self.paths[1], 'pre_read')
+        self.assertEqual(observer.events, [('pre_read', self.paths[0])])
+
+    def test_patterns(self):
+        glob, prefix = Observer(), Observer()
+        self.manager.add_observer(glob, os.path.join(self.dir, '*.conf'))
+        self.manager.add_observer(prefix, self.dir + '/')
+        for path in self.paths:
+            self.manager.notify_observers(path, 'post_write')
+        self.assertEqual(glob.events, [('post_write', path) for path in self.paths[:2]])
+        self.assertEqual(prefix.events, [('post_write', path) for path in self.paths])
+
+        self.manager.delete_observer(glob)
+        self.manager.notify_observers(self.paths[0], 'post_write')
+        self.assertEqual(len(glob.events), 2)
+        self.assertEqual(len(prefix.events), 4)
+
+    def test_weak_references(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.paths[0])
+        del observer
+        self.manager.notify_observers(self.paths[0], 'pre_read')
+        self.assertNotIn((self.paths[0], 'pre_read'), self.manager._observers)
+
+    def test_errors(self):
+        self.assertRaises(EventIsInvalid, self.manager.notify_observers, self.paths[0], 'read')
+        self.assertRaises(FileIsNotRegistered, self.manager.notify_observers, '/nonexistent', 'pre_read')
+
+    def test_deferred(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.dir + '/')
+        self.manager.defer_events(debounce=0.05)
+        try:
+            for i in range(10):
+                self.manager.notify_observers(self.paths[0], 'post_write')
+            self.manager.notify_observers(self.paths[1], 'post_write')
+            self.manager.notify_observers(self.paths[0], 'pre_read')
+            # The events that aren't deferred are delivered synchronously
+            self.assertEqual(observer.events, [('pre_read', self.paths[0])])
+            time.sleep(0.3)
+            self.assertEqual(sorted(observer.events[1:]), [('post_write', path) for path in self.paths[:2]])
+            stats = self.manager._notifier.stats()
+            self.assertEqual((stats['received'], stats['delivered'], stats['coalesced']), (11, 2, 9))
+        finally:
+            self.manager.defer_events(())
+
+    def test_deferred_flush(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.paths[0])
+        self.manager.defer_events(debounce=60)
+        try:
+            self.manager.notify_observers(self.paths[0], 'post_write')
+            self.assertEqual(observer.events, [])
+            self.manager.flush_observers()
+            self.assertEqual(observer.events, [('post_write', self.paths[0])])
+        finally:
+            self.manager.defer_events(())
+
+    def test_cached_reads(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.paths[0])
+        conf = self.manager.get_conf(self.paths[0])
+        conf.write('option = 1\n')
+        self.assertEqual(conf.read().read(), 'option = 1\n')
+        conf.write('option = 2\n')
+        self.assertEqual(conf.read().read(), 'option = 1\noption = 2\n')
+        self.assertEqual(observer.events, [('post_write', self.paths[0]), ('pre_read', self.paths[0])] * 2)
+
+    def test_transaction(self):
+        observer = Observer()
+        self.manager.add_observer(observer, self.dir + '/')
+        conf = self.manager.get_conf(self.paths[0])
+        with self.manager.transaction():
+            conf.write('a = 1\n')
+            with self.manager.transaction():
+                conf.write('b = 2\n')
+                self.manager.get_conf(self.paths[1]).write('c = 3\n', 'w')
+            self.assertEqual(observer.events, [])
+        self.assertEqual(observer.events, [('post_write', self.paths[0]), ('post_write', self.paths[1])])
+        self.assertEqual(conf.read().read(), 'a = 1\nb = 2\n')
+
+
+class TestConfParserManager(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        AppManager(path_apps=self.dir)
+        if not hasattr(genesis2.apis, 'PConfParserManager'):
+            ConfParserManager()
+        self.path = os.path.join(self.dir, 'test.conf')
+        with open(self.path, 'w') as fd:
+            fd.write('[section]\noption = 1\n')
+        self.conf = genesis2.apis.PConfParserManager.get_conf(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_read(self):
+        self.conf.read()
+        self.assertEqual(self.conf.get('section', 'option'), '1')
+        self.conf.set('section', 'option', '2')
+        # As SafeConfigParser.read, the content of the file overrides the parser
+        self.conf.read()
+        self.assertEqual(self.conf.get('section', 'option'), '1')
+        self.conf.set('section', 'other', '3')
+        self.conf.write('w')
+        self.conf.remove_section('section')
+        self.conf.read()
+        self.assertEqual(self.conf.get('section', 'other'), '3')
+
+
+class TestGenesis2Proxy(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.manager = Singleton._instances.pop(GenesisManager, None)
+        self.config = Config()
+        GenesisManager(self.config)
+        self.proxy = Genesis2Proxy(os.path.join(self.dir, 'genesis2.conf'), None)
+
+    def tearDown(self):
+        Singleton._instances.pop(GenesisManager, None)
+        if self.manager is not None:
+            Singleton._instances[GenesisManager] = self.manager
+        shutil.rmtree(self.dir)
+
+    def test_add_user(self):
+        self.proxy.add_user('admin')
+        self.assertEqual(os.listdir(self.proxy.users_dir), ['admin'])
+
+    def test_user_store(self):
+        self.config.user_store = UserStore(os.path.join(self.dir, 'users.db'))
+        self.proxy.add_user('admin', '$6$hash')
+        self.assertEqual(self.config.user_store.get_password('admin'), '$6$hash')
+        self.assertEqual(os.listdir(self.proxy.users_dir), [])
+        self.assertRaises(ValueError, self.proxy.add_user, 'guest')
+        self.config.user_store.close()
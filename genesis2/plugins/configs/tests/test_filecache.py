@@ -0,0 +1,51 @@
+__author__ = 'kudrom'
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from genesis2.plugins.configs.filecache import FileCache, parse_ini
+
+
+class TestFileCache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.conf')
+        self.write('[section]\noption = 1\n')
+        self.cache = FileCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, content):
+        with open(self.path, 'w') as fd:
+            fd.write(content)
+
+    def test_read(self):
+        self.assertEqual(self.cache.read(self.path), '[section]\noption = 1\n')
+        self.assertEqual(self.cache.read(self.path), '[section]\noption = 1\n')
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_changed(self):
+        self.cache.read(self.path)
+        self.write('[section]\noption = 22\n')
+        self.assertEqual(self.cache.read(self.path), '[section]\noption = 22\n')
+        # A new inode with the same size and mtime
+        st = os.stat(self.path)
+        os.rename(self.path, self.path + '.old')
+        self.write('[section]\noption = 33\n')
+        os.utime(self.path, (st.st_atime, st.st_mtime))
+        self.assertEqual(self.cache.read(self.path), '[section]\noption = 33\n')
+        self.assertEqual(self.cache.misses, 3)
+
+    def test_parsed(self):
+        defaults, sections = self.cache.parsed(self.path, 'ini', parse_ini)
+        self.assertEqual(sections['section']['option'], '1')
+        self.assertIs(self.cache.parsed(self.path, 'ini', parse_ini)[1], sections)
+        self.assertEqual(self.cache.parses, 1)
+        self.cache.invalidate(self.path)
+        self.cache.parsed(self.path, 'ini', parse_ini)
+        self.assertEqual(self.cache.parses, 2)
+
+    def test_missing(self):
+        self.assertRaises(OSError, self.cache.read, os.path.join(self.dir, 'missing'))
@@ -0,0 +1,84 @@
+__author__ = 'kudrom'
+import os
+import stat
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+from genesis2.plugins.configs.transaction import Transaction, atomic_write, stats
+
+
+class TestTransaction(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.conf')
+        with open(self.path, 'w') as fd:
+            fd.write('a = 1\n')
+        os.chmod(self.path, 0600)
+        stats.reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def read(self):
+        with open(self.path) as fd:
+            return fd.read()
+
+    def test_atomic_write(self):
+        inode = os.stat(self.path).st_ino
+        self.assertEqual(atomic_write(self.path, 'b = 2\n'), 2)
+        self.assertEqual(self.read(), 'b = 2\n')
+        self.assertNotEqual(os.stat(self.path).st_ino, inode)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0600)
+        self.assertEqual(os.listdir(self.dir), ['test.conf'])
+
+    def test_symlink(self):
+        link = os.path.join(self.dir, 'link.conf')
+        os.symlink(self.path, link)
+        atomic_write(link, 'b = 2\n')
+        self.assertTrue(os.path.islink(link))
+        self.assertEqual(self.read(), 'b = 2\n')
+        self.assertEqual(sorted(os.listdir(self.dir)), ['link.conf', 'test.conf'])
+
+    def test_owner(self):
+        with patch('os.fchown') as fchown, patch('os.getuid', return_value=-1):
+            atomic_write(self.path, 'b = 2\n')
+        original = os.stat(self.path)
+        self.assertEqual(fchown.call_args[0][1:], (original.st_uid, original.st_gid))
+
+    def test_coalesced(self):
+        manager = MagicMock()
+        with Transaction(manager) as transaction:
+            transaction.write(self.path, 'b = 2\n')
+            transaction.write(self.path, 'c = 3\n')
+            self.assertEqual(self.read(), 'a = 1\n')
+        self.assertEqual(self.read(), 'a = 1\nb = 2\nc = 3\n')
+        manager.notify_observers.assert_called_once_with(self.path, 'post_write')
+        snapshot = stats.snapshot()
+        self.assertEqual((snapshot['writes'], snapshot['files'], snapshot['fsyncs']), (2, 1, 2))
+        self.assertEqual(snapshot['fsyncs_saved'], 2)
+        self.assertEqual(snapshot['bytes_saved'], len('a = 1\nb = 2\n'))
+
+    def test_unchanged(self):
+        manager = MagicMock()
+        with Transaction(manager) as transaction:
+            transaction.write(self.path, 'b = 2\n', 'w')
+            transaction.write(self.path, 'a = 1\n', 'w')
+        self.assertFalse(manager.notify_observers.called)
+        self.assertEqual(stats.snapshot()['fsyncs'], 0)
+
+    def test_rollback(self):
+        try:
+            with Transaction() as transaction:
+                transaction.write(self.path, 'b = 2\n')
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertEqual(self.read(), 'a = 1\n')
+
+    def test_new_file(self):
+        path = os.path.join(self.dir, 'new.conf')
+        with Transaction() as transaction:
+            transaction.write(path, 'a = 1\n')
+        self.assertEqual(open(path).read(), 'a = 1\n')
@@ -0,0 +1,175 @@
+__author__ = 'kudrom'
+import os
+import errno
+import tempfile
+import threading
+from collections import OrderedDict
+
+from genesis2.utils import metrics
+from filecache import file_cache
+
+
+class WriteStats(object):
+    """
+    Counters of the writes of configuration files.
+
+    Instance vars:
+
+    - ``writes`` - `int`, edits requested
+    - ``files`` - `int`, files actually written
+    - ``bytes`` - `int`, bytes actually written
+    - ``fsyncs`` - `int`, fsyncs made
+    - ``bytes_saved`` - `int`, bytes that writing every edit on its own would have added
+    - ``fsyncs_saved`` - `int`, fsyncs that writing every edit on its own would have added
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.writes = 0
+        self.files = 0
+        self.bytes = 0
+        self.fsyncs = 0
+        self.bytes_saved = 0
+        self.fsyncs_saved = 0
+
+    def record(self, writes, written, fsyncs, unbatched_bytes, unbatched_fsyncs):
+        with self._lock:
+            self.writes += writes
+            self.files += 1 if fsyncs else 0
+            self.bytes += written
+            self.fsyncs += fsyncs
+            self.bytes_saved += unbatched_bytes - written
+            self.fsyncs_saved += unbatched_fsyncs - fsyncs
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'writes': self.writes,
+                'files': self.files,
+                'bytes': self.bytes,
+                'fsyncs': self.fsyncs,
+                'bytes_saved': self.bytes_saved,
+                'fsyncs_saved': self.fsyncs_saved,
+            }
+
+
+stats = WriteStats()
+metrics.register_collector('config_writes', stats.snapshot)
+
+
+def atomic_write(path, content):
+    """
+    Replaces the content of ``path`` atomically: the content is written in a temporary file of the same directory,
+    flushed to the disk and renamed over the file, so a reader or a crash never sees a partial file. A symlink is
+    followed so the link itself is kept, and so are the permissions and the owner of the file.
+
+    :returns:   number of fsyncs made
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, temp = tempfile.mkstemp(prefix='.%s.' % os.path.basename(path), dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as fp:
+            try:
+                original = os.stat(path)
+            except OSError, e:
+                if e.errno != errno.ENOENT:
+                    raise
+            else:
+                os.fchmod(fd, original.st_mode & 07777)
+                if (original.st_uid, original.st_gid) != (os.getuid(), os.getgid()):
+                    try:
+                        os.fchown(fd, original.st_uid, original.st_gid)
+                    except OSError, e:
+                        # Only root can give the file away
+                        if e.errno != errno.EPERM:
+                            raise
+            fp.write(content)
+            fp.flush()
+            os.fsync(fd)
+        os.rename(temp, path)
+    except:
+        if os.path.exists(temp):
+            os.unlink(temp)
+        raise
+
+    # The rename is only durable once the directory is flushed
+    dir_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return 2
+
+
+class Transaction(object):
+    """
+    Collects the writes of configuration files and writes every file once, with :func:`atomic_write`, when it's
+    committed. The writes of the same file are applied in order on the content of the file, so several writers of
+    a file in the same transaction are coalesced in a single write; a file whose content doesn't change isn't
+    written at all.
+
+    The ``post_write`` notifications are sent once the files are written (and not sent for the files left
+    unchanged). A transaction is normally used through
+    :meth:`genesis2.plugins.configs.configurables.ConfManager.transaction`::
+
+        with manager.transaction():
+            conf.write('option = 1\\n')
+            parser.write('w')
+    """
+    def __init__(self, manager=None):
+        self.manager = manager
+        # path -> list of (text, mode)
+        self._writes = OrderedDict()
+
+    def write(self, path, text, mode='a'):
+        """
+        :param  mode:   'a' appends ``text`` to the file, 'w' replaces the content of the file
+        """
+        if mode not in ('a', 'w'):
+            raise ValueError('Invalid mode %s' % mode)
+        self._writes.setdefault(path, []).append((text, mode))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def _current(self, path):
+        try:
+            return file_cache.read(path)
+        except (IOError, OSError), e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def commit(self):
+        writes, self._writes = self._writes, OrderedDict()
+        for path, edits in writes.items():
+            current = self._current(path)
+            content = current or ''
+            unbatched = 0
+            for text, mode in edits:
+                content = content + text if mode == 'a' else text
+                unbatched += len(content)
+
+            if content == current:
+                stats.record(len(edits), 0, 0, unbatched, 2 * len(edits))
+                continue
+            fsyncs = atomic_write(path, content)
+            file_cache.invalidate(path)
+            stats.record(len(edits), len(content), fsyncs, unbatched, 2 * len(edits))
+            if self.manager is not None:
+                self.manager.notify_observers(path, 'post_write')
+
+    def rollback(self):
+        self._writes = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
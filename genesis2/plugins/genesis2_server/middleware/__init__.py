@@ -1,3 +1,4 @@
 from auth import AuthManager
 from dispatcher import Dispatcher
+from internal import InternalHandler, route
 from session import SessionManager, SessionStore
\ No newline at end of file
@@ -1,39 +1,12 @@
-from hashlib import sha1
-from base64 import b64encode
-from passlib.hash import sha512_crypt, bcrypt
+import math
 import logging
-import time
 
 # (kudrom) TODO: Maybe it should be in a utils file
 from ..urlhandler import get_environment_vars
 from genesis2.core.utils import GenesisManager
-
-
-def check_password(passw, hashpass):
-    """
-    Tests if a password is the same as the hash.
-
-    Instance vars:
-
-    - ``passw`` - ``str``, The password in it's original form
-    - ``hash`` - ``str``, The hashed version of the password to check against
-    """
-    if hashpass.startswith('{SHA}'):
-        try:
-            import warnings
-            warnings.warn(
-                'SHA1 as a password hash may be removed in a future release.')
-            passw_hash = '{SHA}' + b64encode(sha1(passw).digest())
-            if passw_hash == hashpass:
-                return True
-        except:
-            import traceback
-            traceback.print_exc()
-    elif hashpass.startswith('$2a$') and len(hashpass) == 60:
-        return bcrypt.verify(passw, hashpass)
-    elif sha512_crypt.identify(hashpass):
-        return sha512_crypt.verify(passw, hashpass)
-    return False
+from genesis2.utils.throttle import LoginThrottle
+from genesis2.utils.hashpool import HashPool, PoolBusy
+from genesis2.utils import metrics
 
 
 class AuthManager(object):
@@ -53,7 +26,11 @@ class AuthManager(object):
 
         logger = logging.getLogger('genesis2')
 
-        if self.config.has_section('users'):
+        if self.config.user_store is not None:
+            self._enabled = self.config.user_store.has_users()
+            if not self._enabled:
+                logger.error('Authentication requested, but no users in the user store')
+        elif self.config.has_section('users'):
             if len(self.config.items('users')) > 0:
                 self._enabled = True
             else:
@@ -61,6 +38,17 @@ class AuthManager(object):
         else:
             logger.error('Authentication requested, but no [users] section')
 
+    def get_password(self, user):
+        """
+        :returns:   the hash of the password of ``user``, from the user store if there's one or from the [users]
+                    section of the config otherwise, or None if the user doesn't exist
+        """
+        if self.config.user_store is not None:
+            return self.config.user_store.get_password(user)
+        if self.config.has_option('users', user):
+            return self.config.get('users', user)
+        return None
+
     def deauth(self):
         """
         Deauthenticates current user.
@@ -89,13 +77,40 @@ class AuthManager(object):
             return self._dispatcher(environ, start_response)
 
         if environ['PATH_INFO'] == '/auth':
+            metrics.set_route(environ, '/auth')
             vars_environ = get_environment_vars(environ)
             user = vars_environ.getvalue('username', '')
-            if self.config.has_option('users', user):
-                pwd = self.config.get('users', user)
+            address = environ.get('REMOTE_ADDR', '')
+            throttle = LoginThrottle()
+
+            # The blocked clients are rejected without checking the password, the request doesn't wait
+            wait = throttle.check(address, user)
+            if wait > 0:
+                logger.warning('Login throttled for user %s from %s' % (user, address))
+                start_response('429 Too Many Requests', [
+                    ('Content-type', 'text/plain'),
+                    ('Retry-After', str(int(math.ceil(wait)))),
+                    ('X-Genesis-Auth', 'fail'),
+                ])
+                return 'Too many failed logins'
+
+            pwd = self.get_password(user)
+            if pwd is not None:
                 resp = vars_environ.getvalue('response', '')
-                if check_password(resp, pwd):
-                    logger.info('Session opened for user %s from %s' % (user, environ['REMOTE_ADDR']))
+                try:
+                    # The hash is verified in the HashPool so the loop keeps serving the rest of clients
+                    valid = HashPool().verify(resp, pwd)
+                except PoolBusy:
+                    logger.warning('Login of user %s from %s shed, too many logins in progress' % (user, address))
+                    start_response('503 Service Unavailable', [
+                        ('Content-type', 'text/plain'),
+                        ('Retry-After', '5'),
+                        ('X-Genesis-Auth', 'fail'),
+                    ])
+                    return 'Too many logins in progress'
+                if valid:
+                    logger.info('Session opened for user %s from %s' % (user, address))
+                    throttle.success(address, user)
                     self.session['auth.user'] = user
                     start_response('200 OK', [
                         ('Content-type', 'text/plain'),
@@ -103,8 +118,8 @@ class AuthManager(object):
                     ])
                     return ''
 
-            logger.error('Login failed for user %s from %s' % (user, environ['REMOTE_ADDR']))
-            time.sleep(2)
+            logger.error('Login failed for user %s from %s' % (user, address))
+            throttle.failure(address, user)
 
             start_response('403 Login Failed', [
                 ('Content-type', 'text/plain'),
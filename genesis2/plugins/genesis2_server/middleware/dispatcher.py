@@ -9,6 +9,7 @@ from genesis2.core.utils import GenesisManager
 # from genesis2.utils.error import format_error
 from genesis2.interfaces.gui import IURLHandler, IXSLTFunctionProvider
 from genesis2.interfaces.resources import IModuleConfig
+from genesis2.utils import wsgi
 
 from auth import AuthManager
 
@@ -159,14 +160,13 @@ class Dispatcher (object):
         self.status = status
         self.headers = headers
 
-    def fix_length(self, content):
-        # (kudrom) TODO: maybe move this method to middleware
-        has_content_length = False
-        for header, value in self.headers:
-            if header.upper() == 'CONTENT-LENGTH':
-                has_content_length = True
-        if not has_content_length:
-            self.headers.append(('Content-Length', str(len(content))))
+    def fix_length(self, length):
+        """
+        Adds the Content-Length header if the handler didn't set it. Without it (the length of a streamed body isn't
+        known) the server sends the body chunked.
+        """
+        if length is not None and wsgi.get_header(self.headers, 'Content-Length') is None:
+            self.headers.append(('Content-Length', str(length)))
 
     def __call__(self, environ, start_response):
         """
@@ -194,9 +194,12 @@ class Dispatcher (object):
                 finally:
                     break
 
+        body, length = wsgi.response_body(content)
+        self.fix_length(length)
         start_response(self.status, self.headers)
-        self.fix_length(content)
-        content = [content]
-        logger.debug('Finishing %s' % environ['PATH_INFO'])
-        return content
+        if length is not None:
+            logger.debug('Finishing %s' % environ['PATH_INFO'])
+            return body
+        # The handler streams the body, it finishes when the server closes it
+        return wsgi.ClosingIterator(body, [lambda: logger.debug('Finishing %s' % environ['PATH_INFO'])])
 
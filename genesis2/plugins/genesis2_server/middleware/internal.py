@@ -0,0 +1,111 @@
+import json
+
+from genesis2.core.utils import GenesisManager
+from genesis2.utils import interlocked, compression, conditional, metrics, process
+from genesis2.utils.utils import shell_cache
+from genesis2.utils.throttle import LoginThrottle
+from genesis2.utils.hashpool import HashPool
+
+
+# path -> WSGI callable
+_routes = {}
+
+
+def route(path):
+    """
+    Decorator to register a WSGI callable as the handler of an internal endpoint of genesis2.
+    The endpoints under /middleware aren't protected by the AuthManager.
+    """
+    def route_decorator(func):
+        _routes[path] = func
+        return func
+
+    return route_decorator
+
+
+class InternalHandler(object):
+    """
+    Middleware that serves the internal endpoints registered with :func:`route` and passes the rest of requests to
+    the next WSGI application in chain (normally the Dispatcher).
+    """
+
+    def __init__(self, wsgi_application):
+        self._application = wsgi_application
+
+    def __call__(self, environ, start_response):
+        handler = _routes.get(environ['PATH_INFO'])
+        if handler is None:
+            return self._application(environ, start_response)
+        metrics.set_route(environ, environ['PATH_INFO'])
+        return handler(environ, start_response)
+
+
+def json_response(start_response, data, status='200 OK'):
+    content = json.dumps(data)
+    start_response(status, [
+        ('Content-type', 'application/json'),
+        ('Content-Length', str(len(content))),
+    ])
+    return [content]
+
+
+@route('/middleware/locks')
+def lock_stats(environ, start_response):
+    """
+    Exposes the :class:`genesis2.utils.interlocked.LockStats` if the instrumentation is enabled.
+    """
+    stats = interlocked.get_stats()
+    if stats is None:
+        return json_response(start_response, {'enabled': False})
+    return json_response(start_response, {
+        'enabled': True,
+        'locks': stats.snapshot(),
+        'held': [{'name': name, 'thread': ident, 'since': since} for name, ident, since in stats.held()],
+    })
+
+
+@route('/middleware/compression')
+def compression_stats(environ, start_response):
+    """
+    Exposes the :class:`genesis2.utils.compression.CompressionStats`: the responses compressed, the bytes saved and
+    the seconds spent compressing them.
+    """
+    return json_response(start_response, compression.stats.snapshot())
+
+
+@route('/middleware/conditional')
+def conditional_stats(environ, start_response):
+    """
+    Exposes the :class:`genesis2.utils.conditional.ConditionalStats`: the ETags computed and the responses answered
+    with a 304 Not Modified.
+    """
+    return json_response(start_response, conditional.stats.snapshot())
+
+
+def _lock_stats():
+    stats = interlocked.get_stats()
+    return stats.snapshot() if stats is not None else {}
+
+
+metrics.register_collector('locks', _lock_stats, label='lock')
+metrics.register_collector('process', process.stats.snapshot, label='command')
+metrics.register_collector('shell_cache', shell_cache.stats)
+metrics.register_collector('compression', compression.stats.snapshot)
+metrics.register_collector('conditional', conditional.stats.snapshot)
+metrics.register_collector('config_proxies', lambda: GenesisManager().config.proxy_stats())
+metrics.register_collector('login_throttle', lambda: LoginThrottle().stats())
+metrics.register_collector('hash_pool', lambda: HashPool().stats())
+
+
+@route('/middleware/metrics')
+def prometheus_metrics(environ, start_response):
+    """
+    Exposes the request metrics of :class:`genesis2.utils.metrics.MetricsMiddleware` and the counters of genesis2
+    in the Prometheus text format.
+    """
+    content = metrics.exposition()
+    start_response('200 OK', [
+        ('Content-type', 'text/plain; version=0.0.4'),
+        ('Content-Length', str(len(content))),
+    ])
+    return [content]
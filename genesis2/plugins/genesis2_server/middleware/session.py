@@ -9,7 +9,6 @@ You should instantiate SessionStore, and pass it to WSGI middleware along with n
 """
 import os
 import time
-import Cookie
 import hashlib
 from genesis2.utils.interlocked import ClassProxy
 
@@ -18,6 +17,23 @@ def sha1(var):
     return hashlib.sha1(str(var)).hexdigest()
 
 
+def parse_cookie(header, name):
+    """
+    Returns the value of the cookie ``name`` in a Cookie header or None. It's a plain scan of the header, much
+    cheaper than building a Cookie.SimpleCookie.
+    """
+    if not header or name not in header:
+        return None
+    for item in header.split(';'):
+        key, sep, value = item.partition('=')
+        if sep and key.strip() == name:
+            value = value.strip()
+            if len(value) > 1 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+            return value
+    return None
+
+
 class SessionProxy(object):
     """
     SessionProxy used to automatically add prefixes to keys
@@ -45,6 +61,8 @@ class Session(dict):
         super(Session, self).__init__(**kwargs)
         self._id = id
         self._creationTime = self._accessTime = time.time()
+        # Value of the Set-Cookie header of the session, it never changes
+        self.cookie_header = 'sess=%s; Path=/' % id
 
     @property
     def id(self):
@@ -77,11 +95,14 @@ class SessionStore(object):
     Manages multiple session objects
     """
     # TODO: add session deletion/invalidation
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, vacuum_interval=60):
         # Default timeout is 30 minutes
         # Use internal timeout in seconds (for easier calculations)
         self._timeout = timeout*60
         self._store = {}
+        # Seconds between two vacuums made by expire
+        self._vacuum_interval = vacuum_interval
+        self._next_vacuum = 0
 
     @staticmethod
     def init_safe():
@@ -123,6 +144,16 @@ class SessionStore(object):
             if (ctime - self._store[sessId].access_time) > self._timeout:
                 del self._store[sessId]
 
+    def expire(self):
+        """
+        Vacuums the store at most once every ``vacuum_interval`` seconds, so the requests don't go through all the
+        sessions.
+        """
+        ctime = time.time()
+        if ctime >= self._next_vacuum:
+            self._next_vacuum = ctime + self._vacuum_interval
+            self.vacuum()
+
 
 class SessionManager(object):
     """
@@ -140,57 +171,59 @@ class SessionManager(object):
         self._session_store = store
         self._application = wsgi_application
         self._session = None
+        self._cookie = None
         self._start_response_args = ('200 OK', [])
 
     def add_cookie(self, headers):
+        """
+        Adds the Set-Cookie header of the session unless the client already sent it.
+        """
         if self._session is None:
             raise RuntimeError('Attempt to save non-initialized session!')
 
-        sess_id = self._session.id
-        cookie = Cookie.SimpleCookie()
-        cookie['sess'] = sess_id
-        cookie['sess']['path'] = '/'
-
-        headers.append(('Set-Cookie', cookie['sess'].OutputString()))
+        if self._cookie != self._session.id:
+            headers.append(('Set-Cookie', self._session.cookie_header))
 
     def start_response(self, status, headers):
         self.add_cookie(headers)
         self._start_response_args = (status, headers)
 
     def _load_session_cookie(self, environ):
-        cookie = Cookie.SimpleCookie(environ.get('HTTP_COOKIE'))
-        cookie = cookie.get('sess')
-        if cookie is not None:
-            self._session = self._session_store.checkout(cookie.value)
+        self._cookie = parse_cookie(environ.get('HTTP_COOKIE'), 'sess')
+        if self._cookie is not None:
+            self._session = self._session_store.checkout(self._cookie)
+
+    def _get_fingerprint(self, environ):
+        return 'salt' + environ.get('REMOTE_ADDR', '') + environ.get('REMOTE_HOST', '') + \
+            environ.get('HTTP_USER_AGENT', '') + environ.get('HTTP_HOST', '')
 
     def _get_client_id(self, environ):
-        hash = 'salt'
-        hash += environ.get('REMOTE_ADDR', '')
-        hash += environ.get('REMOTE_HOST', '')
-        hash += environ.get('HTTP_USER_AGENT', '')
-        hash += environ.get('HTTP_HOST', '')
-        return sha1(hash)
+        return sha1(self._get_fingerprint(environ))
 
     def _get_session(self, environ):
         # Load session from cookie
         self._load_session_cookie(environ)
 
-        # Check is session exists and valid
-        client_id = self._get_client_id(environ)
-        if self._session is not None:
-            if self._session.get('client_id', '') != client_id:
+        # Check is session exists and valid, the hash of the client is only computed when its fingerprint isn't
+        # the one memoised in the session
+        fingerprint = self._get_fingerprint(environ)
+        if self._session is not None and self._session.get('client_fingerprint') != fingerprint:
+            if self._session.get('client_id', '') == sha1(fingerprint):
+                self._session['client_fingerprint'] = fingerprint
+            else:
                 self._session = None
 
         # Create session
         if self._session is None:
             self._session = self._session_store.create()
-            self._session['client_id'] = client_id
+            self._session['client_id'] = sha1(fingerprint)
+            self._session['client_fingerprint'] = fingerprint
 
         return self._session
 
     def __call__(self, environ, start_response):
         self.start_response_origin = start_response
-        self._session_store.vacuum()
+        self._session_store.expire()
         sess = self._get_session(environ)
         environ['app.session'] = sess
 
@@ -2,8 +2,12 @@ import logging
 import os
 
 from genesis2.core.core import Plugin
+from genesis2.core.utils import GenesisManager
 from genesis2.interfaces.gui import IGenesis2Server
-from middleware import SessionManager, SessionStore, AuthManager, Dispatcher
+from genesis2.utils.compression import CompressionMiddleware
+from genesis2.utils.conditional import ConditionalMiddleware
+from genesis2.utils.metrics import MetricsMiddleware
+from middleware import SessionManager, SessionStore, AuthManager, Dispatcher, InternalHandler
 
 try:
     from gevent.pywsgi import WSGIServer
@@ -13,15 +17,19 @@ except ImportError:
     WSGIServer = lambda adr, **kw: make_server(adr[0], adr[1], kw['application'])
     http_server = 'wsgiref'
 
+# The sessions outlive the requests, so every request shares the same store
+session_store = SessionStore.init_safe()
 
-def wsgi_application(environ, start_response):
-    store = SessionStore.init_safe()
 
+def wsgi_application(environ, start_response):
     dispatcher = Dispatcher()
-    auth = AuthManager(dispatcher)
-    sm = SessionManager(store, auth)
+    auth = AuthManager(InternalHandler(dispatcher))
+    sm = SessionManager(session_store, auth)
+    # The compression is the last step of the response, so it sees the headers set by every middleware. The ETags
+    # are computed before it, from the uncompressed bodies. The metrics measure the bytes sent to the client
+    application = MetricsMiddleware(CompressionMiddleware(ConditionalMiddleware(sm)))
 
-    return sm(environ, start_response)
+    return application(environ, start_response)
 
 
 class Genesis2Server(Plugin):
@@ -59,5 +67,32 @@ class Genesis2Server(Plugin):
             application=wsgi_application,
         )
 
+        # The certificates are rotated when genesis2.conf is reloaded
+        GenesisManager().add_observer(self)
+
+    def notify(self, manager, msg, *args):
+        if msg != 'config':
+            return
+        logger = logging.getLogger('genesis2')
+        diff, old, new = args
+        changes = diff.get('genesis2', {})
+
+        if 'bind_host' in changes or 'bind_port' in changes:
+            logger.warning('The new bind_host or bind_port of genesis2 will be used after a restart.')
+
+        if 'cert_key' in changes or 'cert_file' in changes:
+            keyfile = new.get('genesis2', 'cert_key')
+            certfile = new.get('genesis2', 'cert_file')
+            if not os.path.isfile(keyfile) or not os.path.isfile(certfile):
+                logger.error('The new cert_key or cert_file doesn\'t exist, keeping the current certificate.')
+                return
+            ssl_args = getattr(self.server, 'ssl_args', None)
+            if ssl_args is None:
+                logger.warning('The %s server can\'t rotate its certificate.' % http_server)
+                return
+            # Only the new connections are wrapped with the new certificate
+            ssl_args.update(keyfile=keyfile, certfile=certfile)
+            logger.info('Certificate rotated to %s' % certfile)
+
     def serve_forever(self):
         self.server.serve_forever()
@@ -3,7 +3,9 @@ from mock import patch
 import gc
 from unittest import TestCase
 
-from genesis2.plugins.genesis2_server.middleware.session import SessionStore, SessionManager, Session, sha1
+from genesis2.plugins.genesis2_server.middleware.dispatcher import Dispatcher
+from genesis2.plugins.genesis2_server.middleware.session import SessionStore, SessionManager, Session, sha1, \
+    parse_cookie
 
 
 class TestsSessionMiddleware(TestCase):
@@ -49,7 +51,8 @@ class TestsSessionMiddleware(TestCase):
         ret, headers = self.smgr(self.environ, start_response)
 
         self.assertEqual(self.environ['app.session']._id, sess._id)
-        self.assertIn(sess._id, headers[0][1])
+        # The client already has the cookie
+        self.assertNotIn('Set-Cookie', map(lambda x: x[0], headers))
 
     def test_already_cookie_bad_client(self):
         start_response = mock.MagicMock()
@@ -77,6 +80,27 @@ class TestsSessionMiddleware(TestCase):
             gc.collect()
             self.assertIsNone(self.store.checkout(sess._id))
 
+    def test_expire(self):
+        store = SessionStore(vacuum_interval=60)
+        with patch.object(store, 'vacuum') as vacuum, patch('time.time') as time:
+            for now in (1000, 1030, 1060):
+                time.return_value = now
+                store.expire()
+        self.assertEqual(vacuum.call_count, 2)
+
+    def test_new_client_with_stale_cookie(self):
+        start_response = mock.MagicMock()
+        self.environ['HTTP_COOKIE'] = 'sess=unknown; Path=/'
+        ret, headers = self.smgr(self.environ, start_response)
+
+        self.assertIn(('Set-Cookie', 'sess=%s; Path=/' % self.environ['app.session'].id), headers)
+
+    def test_parse_cookie(self):
+        self.assertEqual(parse_cookie('a=1; sess=abc; Path=/', 'sess'), 'abc')
+        self.assertEqual(parse_cookie('sess="abc"', 'sess'), 'abc')
+        self.assertIsNone(parse_cookie('nosess=abc', 'sess'))
+        self.assertIsNone(parse_cookie(None, 'sess'))
+
     def test_session_proxy(self):
         sess = Session('')
         proxy = sess.proxy('test')
@@ -87,4 +111,66 @@ class TestsSessionMiddleware(TestCase):
 
 
 class DispatcherMiddleware(TestCase):
-    pass
\ No newline at end of file
+    def setUp(self):
+        # The __init__ scans the apps, it isn't needed to dispatch
+        self.dispatcher = Dispatcher.__new__(Dispatcher)
+        self.handler = mock.Mock()
+        self.handler.match_url.return_value = True
+        patcher = patch('genesis2.plugins.genesis2_server.middleware.dispatcher.AppManager')
+        patcher.start().return_value.grab_apps.return_value = [self.handler]
+        self.addCleanup(patcher.stop)
+
+    def dispatch(self, content):
+        self.handler.url_handler.return_value = content
+        self.start_response = mock.Mock()
+        return self.dispatcher({'PATH_INFO': '/', 'app.session': {}}, self.start_response)
+
+    def headers(self):
+        return dict(self.start_response.call_args[0][1])
+
+    def test_string(self):
+        self.assertEqual(self.dispatch('content'), ['content'])
+        self.assertEqual(self.headers()['Content-Length'], '7')
+
+    def test_generator(self):
+        closed = []
+
+        def generate():
+            try:
+                yield 'con'
+                yield 'tent'
+            finally:
+                closed.append(True)
+
+        body = self.dispatch(generate())
+        self.assertNotIn('Content-Length', self.headers())
+        self.assertEqual(next(body), 'con')
+        body.close()
+        self.assertEqual(closed, [True])
+
+
+class WsgiApplication(TestCase):
+    def setUp(self):
+        def application(environ, start_response):
+            start_response('200 OK', [('Content-type', 'text/plain')])
+            return ['hello']
+
+        for name in ('Dispatcher', 'InternalHandler'):
+            patcher = patch('genesis2.plugins.genesis2_server.server.%s' % name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = patch('genesis2.plugins.genesis2_server.server.AuthManager', return_value=application)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, **environ):
+        from genesis2.plugins.genesis2_server.server import wsgi_application
+        start_response = mock.Mock()
+        environ.update(PATH_INFO='/', REQUEST_METHOD='GET')
+        wsgi_application(environ, start_response)
+        return dict(start_response.call_args[0][1])
+
+    def test_shared_store(self):
+        cookie = self.request()['Set-Cookie']
+        # The session of the first request is found by the next one, so its cookie isn't sent again
+        self.assertNotIn('Set-Cookie', self.request(HTTP_COOKIE=cookie.split(';')[0]))
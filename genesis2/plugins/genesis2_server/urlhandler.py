@@ -4,6 +4,7 @@ import inspect
 
 from genesis2.interfaces.gui import IURLHandler
 from genesis2.core.core import Plugin
+from genesis2.utils import metrics
 
 
 def url(uri):
@@ -37,13 +38,19 @@ class URLHandler(Plugin):
         super(URLHandler, self).__init__()
         self._implements.append(IURLHandler)
 
-    def _get_url_handler(self, uri):
+    def _get_route(self, uri):
+        """
+        :returns:   tuple (compiled pattern, name of the method) of the handler of ``uri`` or (None, None)
+        """
         for cls in self.__class__.mro():
             if '_urls' in dir(cls):
                 for uri_re in cls._urls.keys():
                     if uri_re.match(uri):
-                        return cls._urls[uri_re]
-        return None
+                        return uri_re, cls._urls[uri_re]
+        return None, None
+
+    def _get_url_handler(self, uri):
+        return self._get_route(uri)[1]
 
     def match_url(self, req):
         """ Returns True if class (or any parent class) could handle URL
@@ -53,7 +60,7 @@ class URLHandler(Plugin):
         return False
 
     def url_handler(self, req, start_response):
-        handler = self._get_url_handler(req.get('PATH_INFO'))
+        uri_re, handler = self._get_route(req.get('PATH_INFO'))
         if handler is None:
             return
         try:
@@ -61,6 +68,7 @@ class URLHandler(Plugin):
         except AttributeError:
             return
 
+        metrics.set_route(req, uri_re.pattern)
         return handler(req, start_response)
 
 
@@ -1 +1,17 @@
 __author__ = 'kudrom'
+# The endpoints register their routes in the InternalHandler of genesis2_server when they're imported
+import endpoint
+from genesis2.core.utils import GenesisManager
+from monitor import HealthMonitor
+from sampler import MeterSampler
+
+
+def start():
+    """
+    Starts sampling the meters and feeding the consumers configured in the [health] section. The launcher calls it
+    once the apps are loaded.
+    """
+    HealthMonitor().configure(GenesisManager().config)
+    sampler = MeterSampler()
+    sampler.rescan()
+    sampler.start()
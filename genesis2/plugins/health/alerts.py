@@ -0,0 +1,278 @@
+__author__ = 'kudrom'
+import logging
+import threading
+from collections import deque
+
+from genesis2.core.utils import Observable
+
+
+class Rule(object):
+    """
+    Condition evaluated on every sample of a meter variant. The rules keep only the state they need from the
+    previous sample, so evaluating a sample is O(1).
+
+    :param  name:       unique name of the rule, used to de-duplicate its alerts
+    :param  meter:      name of the meter
+    :param  variant:    variant of the meter
+    :param  level:      class of the message put when the rule fires, one of 'info', 'warn', 'err'
+    :param  message:    text of the alert, formatted with the ``name``, ``meter``, ``variant`` and ``value`` keys
+    :param  cooldown:   seconds an alert has to be cleared before it can fire again
+    """
+    message = '%(meter)s[%(variant)s] is %(value)s'
+
+    def __init__(self, name, meter, variant='None', level='warn', message=None, cooldown=0):
+        self.name = name
+        self.meter = meter
+        self.variant = str(variant)
+        self.level = level
+        if message is not None:
+            self.message = message
+        self.cooldown = cooldown
+
+    @property
+    def key(self):
+        return self.meter, self.variant
+
+    def evaluate(self, timestamp, value, firing):
+        """
+        :param  firing: whether the rule is currently firing
+        :returns:       True if the rule fires with this sample
+        """
+        raise NotImplementedError()
+
+    def format(self, value):
+        return self.message % {'name': self.name, 'meter': self.meter, 'variant': self.variant, 'value': value}
+
+
+class ThresholdRule(Rule):
+    """
+    Fires while the value is above ``above`` or below ``below``.
+    """
+    def __init__(self, name, meter, variant='None', above=None, below=None, **kwargs):
+        Rule.__init__(self, name, meter, variant, **kwargs)
+        self.above = above
+        self.below = below
+
+    def evaluate(self, timestamp, value, firing):
+        return (self.above is not None and value > self.above) or (self.below is not None and value < self.below)
+
+
+class HysteresisRule(Rule):
+    """
+    Fires when the value reaches ``high`` and keeps firing until it drops to ``low``, so a value oscillating
+    around a single threshold doesn't raise an alert on every sample.
+    """
+    def __init__(self, name, meter, variant='None', high=None, low=None, **kwargs):
+        Rule.__init__(self, name, meter, variant, **kwargs)
+        self.high = high
+        self.low = low if low is not None else high
+
+    def evaluate(self, timestamp, value, firing):
+        if firing:
+            return value > self.low
+        return value >= self.high
+
+
+class RateRule(Rule):
+    """
+    Fires while the value changes faster than ``limit`` units per second (in absolute value).
+    """
+    def __init__(self, name, meter, variant='None', limit=None, **kwargs):
+        Rule.__init__(self, name, meter, variant, **kwargs)
+        self.limit = limit
+        self._previous = None
+
+    def evaluate(self, timestamp, value, firing):
+        previous, self._previous = self._previous, (timestamp, value)
+        if previous is None or timestamp <= previous[0]:
+            return firing
+        return abs(value - previous[1]) / (timestamp - previous[0]) > self.limit
+
+
+RULE_TYPES = {
+    'threshold': ThresholdRule,
+    'hysteresis': HysteresisRule,
+    'rate': RateRule,
+}
+
+# Options of the rules that are numbers
+_NUMERIC_OPTIONS = ('above', 'below', 'high', 'low', 'limit', 'cooldown')
+
+
+def load_rules(config):
+    """
+    Creates the rules of the [alert:<name>] sections of genesis2.conf, e.g.::
+
+        [alert:high load]
+        type = hysteresis
+        meter = load
+        variant = 1
+        high = 4
+        low = 2
+        level = err
+
+    The ``type`` is one of :data:`RULE_TYPES` (threshold by default) and the rest of options are the arguments of
+    its class. The sections with errors are logged and skipped.
+
+    :returns:   list of :class:`Rule`
+    """
+    logger = logging.getLogger('genesis2')
+    rules = []
+    for section in config.sections():
+        if not section.startswith('alert:'):
+            continue
+        # The messages have %(...)s placeholders of their own
+        options = dict(config.items(section, raw=True))
+        try:
+            rule_class = RULE_TYPES[options.pop('type', 'threshold')]
+            kwargs = dict((option, float(value) if option in _NUMERIC_OPTIONS else value)
+                          for option, value in options.items())
+            rules.append(rule_class(section[len('alert:'):], **kwargs))
+        except (KeyError, TypeError, ValueError), e:
+            logger.warning('Alert rule %s ignored: %r' % (section, e))
+    return rules
+
+
+class Alert(object):
+    def __init__(self, rule, timestamp, value):
+        self.rule = rule
+        self.since = timestamp
+        self.value = value
+        self.cleared = None
+
+    def to_dict(self):
+        return {'rule': self.rule.name, 'meter': self.rule.meter, 'variant': self.rule.variant,
+                'level': self.rule.level, 'since': self.since, 'value': self.value, 'cleared': self.cleared}
+
+
+class AlertEngine(Observable):
+    """
+    Evaluates the alerting rules on the samples notified by the
+    :class:`genesis2.plugins.health.sampler.MeterSampler`. The rules are indexed by meter variant, so a sample
+    only costs the evaluation of its own rules.
+
+    An alert is emitted once, when its rule starts firing, and once more when it's cleared; the samples in
+    between don't repeat it. The alerts are logged, put with ``put_message`` in every sink (e.g. a
+    :class:`genesis2.plugins.genesis2_server.helpers.CategoryPlugin`) and notified to the observers as
+    ``notify(engine, 'alert', alert)`` and ``notify(engine, 'clear', alert)``.
+
+    As the observers of the sampler are weak references, the owner of the engine must keep a reference to it::
+
+        engine = AlertEngine()
+        engine.add_rule(HysteresisRule('high load', 'load', '1', high=4, low=2))
+        MeterSampler().add_observer(engine)
+    """
+    def __init__(self, history=100):
+        Observable.__init__(self)
+        self._lock = threading.Lock()
+        # (meter, variant) -> list of rules
+        self._rules = {}
+        # rule name -> Alert
+        self._active = {}
+        # rule name -> time the last alert of the rule was cleared
+        self._cleared = {}
+        self._sinks = []
+        self.recent = deque(maxlen=history)
+        self.evaluations = 0
+
+    def add_rule(self, rule):
+        """
+        Adds a rule, replacing the rule with the same name if any.
+        """
+        with self._lock:
+            self._remove(rule.name)
+            self._rules.setdefault(rule.key, []).append(rule)
+
+    def remove_rule(self, name):
+        with self._lock:
+            self._remove(name)
+
+    def _remove(self, name):
+        for key, rules in self._rules.items():
+            rules = [rule for rule in rules if rule.name != name]
+            if rules:
+                self._rules[key] = rules
+            else:
+                del self._rules[key]
+        self._active.pop(name, None)
+        self._cleared.pop(name, None)
+
+    def rules(self):
+        return [rule for rules in self._rules.values() for rule in rules]
+
+    def add_sink(self, sink):
+        """
+        :param  sink:   object with a ``put_message(cls, msg)`` method
+        """
+        self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def notify(self, sampler, msg, *args):
+        if msg == 'sample':
+            key, timestamp, data = args
+            self.feed(key, timestamp, data.get('value'))
+
+    def feed(self, key, timestamp, value):
+        """
+        Evaluates the rules of a meter variant with a new sample.
+
+        :param  key:    (meter name, variant)
+        """
+        rules = self._rules.get((key[0], str(key[1])))
+        if not rules or value is None:
+            return
+        value = float(value)
+        if value != value:
+            return
+
+        events = []
+        with self._lock:
+            for rule in rules:
+                self.evaluations += 1
+                alert = self._active.get(rule.name)
+                firing = rule.evaluate(timestamp, value, alert is not None)
+                if firing and alert is None:
+                    if timestamp - self._cleared.get(rule.name, float('-inf')) < rule.cooldown:
+                        continue
+                    alert = self._active[rule.name] = Alert(rule, timestamp, value)
+                    self.recent.append(alert)
+                    events.append(('alert', alert))
+                elif not firing and alert is not None:
+                    del self._active[rule.name]
+                    alert.cleared = self._cleared[rule.name] = timestamp
+                    events.append(('clear', alert))
+                elif alert is not None:
+                    alert.value = value
+
+        for event, alert in events:
+            self._emit(event, alert, value)
+
+    def _emit(self, event, alert, value):
+        logger = logging.getLogger('genesis2')
+        rule = alert.rule
+        text = rule.format(value)
+        if event == 'alert':
+            level = rule.level
+            logger.log(logging.ERROR if level == 'err' else logging.WARNING, 'Alert %s: %s' % (rule.name, text))
+        else:
+            level = 'info'
+            logger.info('Alert %s cleared: %s' % (rule.name, text))
+            text = 'Cleared: %s' % text
+        for sink in self._sinks:
+            try:
+                sink.put_message(level, text)
+            except Exception, e:
+                logger.warning('Alert sink %r failed: %s' % (sink, e))
+        self.notify_observers(event, alert)
+
+    def active(self):
+        """
+        :returns:   list of the alerts currently firing
+        """
+        return self._active.values()
+
+    def stats(self):
+        return {'rules': len(self.rules()), 'active': len(self._active), 'evaluations': self.evaluations}
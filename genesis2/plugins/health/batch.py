@@ -0,0 +1,115 @@
+__author__ = 'kudrom'
+import time
+import logging
+import threading
+
+from genesis2.core.utils import Singleton
+from genesis2.utils import metrics
+from genesis2.utils.cooperative import Task, TaskTimeout
+from sampler import MeterSampler
+
+
+class MeterReader(object):
+    """
+    Reads many meters at once for the batch endpoint.
+
+    - A value is served from the last sample of the :class:`MeterSampler` or from the reader's cache while it's
+      younger than the ``ttl`` attribute of the meter (its ``interval`` by default).
+    - Concurrent readers of the same meter share a single evaluation (single-flight).
+    - Every meter is evaluated in its own thread and waited for at most its ``timeout`` attribute (``timeout`` of
+      the reader by default), so a slow meter can't stall the response; its evaluation keeps running and fills the
+      cache for the next read.
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, timeout=2):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+        # (name, variant) -> (timestamp, data)
+        self._values = {}
+        # (name, variant) -> Task
+        self._tasks = {}
+        metrics.register_collector('meter_reader', self.stats)
+
+    def _ttl(self, meter):
+        return getattr(meter, 'ttl', None) or getattr(meter, 'interval', 5)
+
+    def _evaluate(self, key, meter):
+        logger = logging.getLogger('genesis2')
+        try:
+            data = meter.format_value()
+            with self._lock:
+                self._values[key] = (time.time(), data)
+            return data
+        except Exception, e:
+            logger.warning('Meter %s[%s] failed while reading: %s' % (key[0], key[1], e))
+            raise
+        finally:
+            with self._lock:
+                self._tasks.pop(key, None)
+
+    def _fresh(self, key, meter):
+        """
+        :returns:   the (timestamp, data) of a value of the meter younger than its TTL or None
+        """
+        limit = time.time() - self._ttl(meter)
+        sample = MeterSampler().get(*key)
+        cached = self._values.get(key)
+        for value in (sample, cached):
+            if value is not None and value[0] >= limit:
+                return value
+        return None
+
+    def read(self, keys):
+        """
+        :param  keys:   list of (name, variant), every sampled meter if None
+        :returns:       dict name -> dict variant -> dict with the value of the meter and its 'time' or an 'error'
+        """
+        sampler = MeterSampler()
+        if keys is None:
+            keys = sampler.meters()
+
+        result = {}
+        pending = []
+        start = time.time()
+        for name, variant in keys:
+            key = (name, str(variant))
+            entry = result.setdefault(name, {})
+            meter = sampler.prepared(*key)
+            if meter is None:
+                entry[key[1]] = {'error': 'unknown meter'}
+                continue
+
+            with self._lock:
+                value = self._fresh(key, meter)
+                if value is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    task = self._tasks.get(key)
+                    if task is None:
+                        task = self._tasks[key] = Task(self._evaluate, key, meter)
+            if value is not None:
+                entry[key[1]] = dict(value[1], time=value[0])
+            else:
+                pending.append((key, meter, task))
+
+        for key, meter, task in pending:
+            deadline = start + (getattr(meter, 'timeout', None) or self.timeout)
+            try:
+                data = task.get(max(deadline - time.time(), 0))
+                entry = dict(data, time=time.time())
+            except TaskTimeout:
+                self.timeouts += 1
+                entry = {'error': 'timeout'}
+            except Exception:
+                entry = {'error': 'failed'}
+            result[key[0]][key[1]] = entry
+
+        return result
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'timeouts': self.timeouts}
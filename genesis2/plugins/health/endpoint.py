@@ -0,0 +1,117 @@
+__author__ = 'kudrom'
+import time
+from array import array
+from urlparse import parse_qs
+
+from genesis2.plugins.genesis2_server.middleware.internal import route, json_response
+from batch import MeterReader
+from monitor import HealthMonitor
+from stream import StreamHub, TooManyConnections, event_stream, long_poll
+
+
+def parse_meters(query):
+    """
+    Parses the ``meter`` arguments of a query string, each one is ``name`` or ``name:variant``.
+
+    :returns:   list of (name, variant) or None if no meter was requested
+    """
+    meters = parse_qs(query).get('meter')
+    if not meters:
+        return None
+    keys = []
+    for meter in meters:
+        name, _, variant = meter.partition(':')
+        keys.append((name, variant or 'None'))
+    return keys
+
+
+@route('/api/meters')
+def meters(environ, start_response):
+    """
+    Returns in a single JSON document the values of the requested meters (every sampled meter by default), e.g.
+    ``/api/meters?meter=load:1&meter=ram``.
+    """
+    keys = parse_meters(environ.get('QUERY_STRING', ''))
+    return json_response(start_response, MeterReader().read(keys))
+
+
+@route('/api/stream')
+def stream(environ, start_response):
+    """
+    Push channel with the session messages, the progress updates and the changes of the meters requested as in
+    :func:`meters`. It's a Server-Sent Events stream if the client accepts ``text/event-stream``, otherwise a long
+    poll that returns the pending events in a JSON document, e.g. ``/api/stream?meter=ram&since=1400000000.0``.
+    """
+    query = environ.get('QUERY_STRING', '')
+    hub = StreamHub()
+    sse = 'text/event-stream' in environ.get('HTTP_ACCEPT', '')
+    since = parse_qs(query).get('since')
+    try:
+        since = float(since[0]) if since else None
+    except ValueError:
+        since = None
+    if sse and since is None:
+        # A new stream starts with the last values of the meters
+        since = 0
+    try:
+        connection = hub.open(environ.get('app.session'), parse_meters(query) or [], since)
+    except TooManyConnections:
+        start_response('503 Service Unavailable', [('Content-type', 'text/plain'), ('Retry-After', '10')])
+        return ['Too many connections']
+
+    if not sse:
+        return json_response(start_response, long_poll(hub, connection))
+    start_response('200 OK', [
+        ('Content-type', 'text/event-stream'),
+        ('Cache-Control', 'no-cache'),
+        ('X-Accel-Buffering', 'no'),
+    ])
+    return event_stream(hub, connection)
+
+
+def _json_column(column):
+    # The meters without a value are stored as NaN, which isn't valid JSON
+    return [None if value != value else value for value in column]
+
+
+@route('/api/history')
+def history(environ, start_response):
+    """
+    History of a meter variant kept in the :class:`genesis2.plugins.health.timeseries.TimeSeriesStore` as columns of
+    the same length, e.g. ``/api/history?meter=load:1&start=1400000000&end=1400086400&resolution=minute``. By default
+    the range is the last hour and the resolution is the finest one that still covers its start.
+    """
+    store = HealthMonitor().store
+    if store is None:
+        start_response('404 Not Found', [('Content-type', 'text/plain')])
+        return ['The history of the meters is disabled']
+    query = parse_qs(environ.get('QUERY_STRING', ''))
+    keys = parse_meters(environ.get('QUERY_STRING', ''))
+    resolution = query.get('resolution', [None])[0]
+    try:
+        end = float(query['end'][0]) if 'end' in query else time.time()
+        start = float(query['start'][0]) if 'start' in query else end - 3600
+    except ValueError:
+        start = end = None
+    if not keys or end is None or resolution not in (None, 'raw', 'minute', 'hour'):
+        start_response('400 Bad Request', [('Content-type', 'text/plain')])
+        return ['A meter, numeric start and end and a resolution raw, minute or hour are expected']
+
+    name, variant = keys[0]
+    result = store.query(name, variant, start, end, resolution)
+    return json_response(start_response, dict((key, _json_column(value) if isinstance(value, array) else value)
+                                              for key, value in result.items()))
+
+
+@route('/api/alerts')
+def alerts(environ, start_response):
+    """
+    The alerts firing, the recent ones (cleared or not) and the counters of the
+    :class:`genesis2.plugins.health.alerts.AlertEngine`.
+    """
+    engine = HealthMonitor().engine
+    return json_response(start_response, {
+        'active': [alert.to_dict() for alert in engine.active()],
+        'recent': [alert.to_dict() for alert in list(engine.recent)],
+        'stats': engine.stats(),
+    })
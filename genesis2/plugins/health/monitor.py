@@ -0,0 +1,45 @@
+__author__ = 'kudrom'
+import os
+import logging
+
+from genesis2.core.utils import Singleton
+from alerts import AlertEngine, load_rules
+from sampler import MeterSampler
+from stream import MessageSink
+from timeseries import TimeSeriesStore
+
+
+class HealthMonitor(object):
+    """
+    Owns the consumers of the samples of the :class:`MeterSampler` configured in the [health] section of
+    genesis2.conf. The observers of the sampler are weak references, so the singleton keeps them alive.
+
+    Instance vars:
+
+    - ``store`` - :class:`TimeSeriesStore` with the history of the meters, None unless ``history_dir`` is set
+    - ``engine`` - :class:`AlertEngine` with the rules of the [alert:<name>] sections, its alerts are logged and
+      sent to the connected clients
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self):
+        self.store = None
+        self.engine = AlertEngine()
+        self.engine.add_sink(MessageSink())
+        MeterSampler().add_observer(self.engine)
+
+    def configure(self, config):
+        """
+        :param  config: :class:`genesis2.utils.config.Config`, the relative paths are relative to its file
+        """
+        logger = logging.getLogger('genesis2')
+        directory = config.get('health', 'history_dir', '')
+        if directory and self.store is None:
+            directory = os.path.join(os.path.dirname(config.filename), directory)
+            self.store = TimeSeriesStore(directory)
+            MeterSampler().add_observer(self.store)
+            logger.info('Keeping the history of the meters in %s' % directory)
+
+        for rule in load_rules(config):
+            self.engine.add_rule(rule)
+        logger.info('%d alert rules loaded' % len(self.engine.rules()))
@@ -14,6 +14,8 @@ class BaseMeter (Plugin):
     - ``type`` - `str`, one of 'binary', 'linear', 'decimal'
     - ``transform`` - `str`, value->text transform applied to meter. One of
       'float', 'fsize', 'percent', 'fsize_percent', 'yesno', 'onoff', 'running'
+    - ``interval`` - `int`, seconds between two samples taken by the
+      :class:`genesis2.plugins.health.sampler.MeterSampler`
     """
     implements(IMeter)
     abstract = True
@@ -24,6 +26,7 @@ class BaseMeter (Plugin):
     category = ''
     type = None
     transform = None
+    interval = 5
 
     def prepare(self, variant=None):
         self = self.__class__(self.app)
@@ -0,0 +1,237 @@
+__author__ = 'kudrom'
+import copy
+import heapq
+import logging
+import threading
+import time
+from array import array
+
+from genesis2.core.core import Plugin
+from genesis2.core.utils import Singleton, Observable
+from genesis2.interfaces.gui import IMeter
+from genesis2.plugins.workers.parallels import BackgroundWorker
+
+
+class RingBuffer(object):
+    """
+    Fixed-size history of (timestamp, value) samples stored in two arrays of doubles, the oldest sample is
+    overwritten when the buffer is full.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._times = array('d', [0.0]) * capacity
+        self._values = array('d', [0.0]) * capacity
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self):
+        """
+        :returns:   the last (timestamp, value) or None if the buffer is empty
+        """
+        if self._count == 0:
+            return None
+        last = self._next - 1
+        return self._times[last], self._values[last]
+
+    def _chronological(self, data):
+        if self._count < self.capacity:
+            return data[:self._count]
+        return data[self._next:] + data[:self._next]
+
+    def times(self):
+        """
+        :returns:   array with the timestamps, oldest first
+        """
+        return self._chronological(self._times)
+
+    def values(self):
+        """
+        :returns:   array with the values, oldest first
+        """
+        return self._chronological(self._values)
+
+    def samples(self):
+        """
+        :returns:   list of (timestamp, value), oldest first
+        """
+        return zip(self.times(), self.values())
+
+
+class SampledMeter(object):
+    """
+    A meter prepared for one of its variants and the samples taken from it.
+    """
+    def __init__(self, meter, variant, capacity):
+        self.meter = meter
+        self.variant = variant
+        self.interval = getattr(meter, 'interval', 5)
+        self.buffer = RingBuffer(capacity)
+        self.last = None
+        self.errors = 0
+
+    @property
+    def key(self):
+        return self.meter.name, self.variant
+
+
+def numeric(meter, data):
+    """
+    Converts the value formatted by a meter to the float stored in the ring buffers.
+    """
+    value = data.get('value')
+    if value is None:
+        return float('nan')
+    if meter.type == 'binary':
+        return 1.0 if value else 0.0
+    return float(value)
+
+
+def meter_plugins():
+    """
+    :returns:   the instances of the plugins that implement :class:`IMeter`, every plugin is a singleton
+    """
+    return [instance for instance in Singleton._instances.values()
+            if isinstance(instance, Plugin) and any(issubclass(interface, IMeter)
+                                                    for interface in getattr(instance, '_implements', []))]
+
+
+class MeterSampler(Observable, BackgroundWorker):
+    """
+    Component that evaluates every variant of the registered meters on its own cadence (``interval`` attribute of
+    the meter) and keeps their last values and their recent history in memory, so the clients never trigger the
+    probes of the meters.
+
+    Each sample is notified to the observers as ``notify(sampler, 'sample', key, timestamp, data)`` where ``key``
+    is (meter name, variant) and ``data`` the dict returned by ``format_value``.
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, capacity=120):
+        Observable.__init__(self)
+        BackgroundWorker.__init__(self)
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        # (name, variant) -> SampledMeter
+        self._meters = {}
+        # Heap of (next sample time, (name, variant))
+        self._schedule = []
+
+    def register(self, meter):
+        """
+        Prepares every variant of ``meter`` and schedules its sampling.
+        """
+        now = time.time()
+        with self._lock:
+            for variant in meter.get_variants():
+                sampled = SampledMeter(meter.prepare(variant), str(variant), self.capacity)
+                if sampled.key in self._meters:
+                    continue
+                self._meters[sampled.key] = sampled
+                heapq.heappush(self._schedule, (now, sampled.key))
+        self._wakeup.set()
+
+    def unregister(self, name):
+        """
+        Stops sampling every variant of the meter ``name``.
+        """
+        with self._lock:
+            for key in [key for key in self._meters if key[0] == name]:
+                del self._meters[key]
+
+    def rescan(self):
+        """
+        Registers the meters of every plugin that implements :class:`IMeter` and isn't registered yet.
+        """
+        registered = set(sampled.meter.__class__ for sampled in self._meters.values())
+        for meter in meter_plugins():
+            if meter.__class__ not in registered:
+                self.register(meter)
+
+    def sample(self, sampled):
+        """
+        Evaluates a prepared meter and stores its value.
+        """
+        logger = logging.getLogger('genesis2')
+        timestamp = time.time()
+        try:
+            data = sampled.meter.format_value()
+            value = numeric(sampled.meter, data)
+        except Exception, e:
+            sampled.errors += 1
+            logger.warning('Meter %s[%s] failed while sampling: %s' % (sampled.key[0], sampled.key[1], e))
+            return
+        sampled.last = (timestamp, data)
+        sampled.buffer.append(timestamp, value)
+        # Every observer is notified on its own, so a broken one can't stop the sampling nor the rest of observers
+        for observer in self.get_observers():
+            try:
+                observer.notify(self, 'sample', sampled.key, timestamp, data)
+            except Exception:
+                logger.exception('Observer %r of the meter %s[%s] failed' % ((observer,) + sampled.key))
+
+    def run(self):
+        while not self._stopped:
+            with self._lock:
+                now = time.time()
+                due = []
+                while self._schedule and self._schedule[0][0] <= now:
+                    due.append(heapq.heappop(self._schedule)[1])
+                due = [self._meters[key] for key in due if key in self._meters]
+
+            for sampled in due:
+                self.sample(sampled)
+                with self._lock:
+                    if sampled.key in self._meters:
+                        heapq.heappush(self._schedule, (time.time() + sampled.interval, sampled.key))
+
+            with self._lock:
+                delay = self._schedule[0][0] - time.time() if self._schedule else None
+            if delay is None or delay > 0:
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+
+    def stop(self):
+        self._stopped = True
+        self._wakeup.set()
+
+    def meters(self):
+        """
+        :returns:   list of (name, variant) of the sampled meters
+        """
+        return self._meters.keys()
+
+    def prepared(self, name, variant='None'):
+        """
+        :returns:   the meter prepared for the variant or None if the meter isn't registered
+        """
+        sampled = self._meters.get((name, str(variant)))
+        return sampled.meter if sampled is not None else None
+
+    def get(self, name, variant='None'):
+        """
+        :returns:   tuple (timestamp, data) of the last sample of the meter or None if it hasn't been sampled yet
+        """
+        sampled = self._meters.get((name, str(variant)))
+        if sampled is None or sampled.last is None:
+            return None
+        return sampled.last[0], copy.copy(sampled.last[1])
+
+    def history(self, name, variant='None'):
+        """
+        :returns:   list of (timestamp, value) of the recent samples of the meter, oldest first
+        """
+        sampled = self._meters.get((name, str(variant)))
+        if sampled is None:
+            return []
+        return sampled.buffer.samples()
@@ -0,0 +1,201 @@
+__author__ = 'kudrom'
+import json
+import time
+import threading
+from collections import deque
+
+from genesis2.core.utils import Singleton
+from genesis2.utils import cooperative, metrics
+from sampler import MeterSampler
+
+
+class TooManyConnections(Exception):
+    """
+    Raised by :meth:`StreamHub.open` when the connection cap has been reached.
+    """
+
+
+class Connection(object):
+    """
+    State of a client of the push channel: its session, the meters it's subscribed to and the events not yet
+    delivered.
+
+    The backpressure is applied per kind of event: a meter only keeps its newest pending value (a slow client skips
+    the intermediate samples) and the rest of events are kept in a bounded queue that drops the oldest ones.
+    """
+    def __init__(self, session, meters, size=100):
+        self.session = session
+        self.meters = set((name, str(variant)) for name, variant in meters)
+        self.dropped = 0
+        self._events = deque(maxlen=size)
+        # (name, variant) -> (timestamp, data)
+        self._pending = {}
+        # (name, variant) -> data sent in the last event of the meter
+        self._sent = {}
+        self._lock = threading.Lock()
+
+    def push(self, event, data):
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append((event, data))
+
+    def meter(self, key, timestamp, data):
+        with self._lock:
+            if key in self.meters and self._sent.get(key) != data:
+                self._pending[key] = (timestamp, data)
+
+    def _drain_session(self):
+        """
+        Moves the messages put in the session by ``put_message`` and ``put_statusmsg`` to the queue of events.
+        """
+        if self.session is None:
+            return
+        for key, event in (('messages', 'message'), ('statusmsg', 'status')):
+            messages = self.session.pop(key, None)
+            for message in messages or []:
+                self.push(event, message)
+
+    def poll(self):
+        """
+        :returns:   list of (event, data) pending for delivery, in order
+        """
+        self._drain_session()
+        with self._lock:
+            events = list(self._events)
+            self._events.clear()
+            for key, (timestamp, data) in sorted(self._pending.items()):
+                self._sent[key] = data
+                events.append(('meter', {'name': key[0], 'variant': key[1], 'time': timestamp, 'data': data}))
+            self._pending = {}
+        return events
+
+
+class StreamHub(object):
+    """
+    Delivers to the connected clients the session messages, the progress updates and the changes of the meters
+    they're subscribed to, so an open tab doesn't need to poll for them.
+
+    The hub observes the :class:`MeterSampler` and is kept alive by the singleton, the number of simultaneous
+    connections is capped by ``max_connections``.
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, max_connections=50, queue_size=100):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._connections = set()
+        MeterSampler().add_observer(self)
+        metrics.register_collector('stream', self.stats)
+
+    def open(self, session, meters=(), since=None):
+        """
+        Registers a new connection.
+
+        :param  meters: list of (name, variant) the client is subscribed to
+        :param  since:  if not None, the last samples of the meters taken after this timestamp are pending in the
+                        new connection
+        :raises:        :class:`TooManyConnections`
+        """
+        connection = Connection(session, meters, self.queue_size)
+        with self._lock:
+            if len(self._connections) >= self.max_connections:
+                self.rejected += 1
+                raise TooManyConnections()
+            self._connections.add(connection)
+        if since is not None:
+            sampler = MeterSampler()
+            for key in connection.meters:
+                sample = sampler.get(*key)
+                if sample is not None and sample[0] > since:
+                    connection.meter(key, *sample)
+        return connection
+
+    def close(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+
+    def notify(self, sampler, msg, *args):
+        if msg == 'sample':
+            key, timestamp, data = args
+            with self._lock:
+                connections = list(self._connections)
+            for connection in connections:
+                connection.meter(key, timestamp, data)
+
+    def broadcast(self, event, data):
+        """
+        Pushes an event to every connected client.
+        """
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            connection.push(event, data)
+
+    def stats(self):
+        with self._lock:
+            connections = list(self._connections)
+        return {
+            'connections': len(connections),
+            'rejected': self.rejected,
+            'dropped': sum(connection.dropped for connection in connections),
+        }
+
+
+class MessageSink(object):
+    """
+    Sink of the :class:`genesis2.plugins.health.alerts.AlertEngine` that puts its messages in every connected client,
+    as :meth:`genesis2.plugins.genesis2_server.helpers.CategoryPlugin.put_message` does in a single session.
+    """
+    def put_message(self, cls, msg):
+        StreamHub().broadcast('message', (cls, msg))
+
+
+def format_event(event, data):
+    """
+    Formats an event of the Server-Sent Events protocol.
+    """
+    return 'event: %s\ndata: %s\n\n' % (event, json.dumps(data))
+
+
+def event_stream(hub, connection, interval=0.5, keepalive=15, lifetime=300):
+    """
+    Generator with the body of a Server-Sent Events response. The connection is polled every ``interval`` seconds
+    without blocking the gevent loop, a comment is sent every ``keepalive`` seconds without events and the stream
+    ends after ``lifetime`` seconds, when the browser reconnects.
+    """
+    try:
+        yield 'retry: %d\n\n' % (interval * 2000)
+        start = last = time.time()
+        while time.time() - start < lifetime:
+            events = connection.poll()
+            if events:
+                last = time.time()
+                yield ''.join(format_event(event, data) for event, data in events)
+            elif time.time() - last >= keepalive:
+                last = time.time()
+                yield ': keepalive\n\n'
+            cooperative.sleep(interval)
+    finally:
+        hub.close(connection)
+
+
+def long_poll(hub, connection, interval=0.5, timeout=25):
+    """
+    Waits at most ``timeout`` seconds for events in the connection and closes it.
+
+    :returns:   dict with the list of 'events' and the 'time' to pass as ``since`` in the next request
+    """
+    try:
+        deadline = time.time() + timeout
+        while True:
+            now = time.time()
+            events = connection.poll()
+            if events or now >= deadline:
+                break
+            cooperative.sleep(interval)
+        return {'time': now, 'events': [{'event': event, 'data': data} for event, data in events]}
+    finally:
+        hub.close(connection)
@@ -0,0 +1,82 @@
+__author__ = 'kudrom'
+from unittest import TestCase
+from mock import MagicMock, patch
+
+from genesis2.utils.config import Config
+from genesis2.plugins.health.alerts import AlertEngine, ThresholdRule, HysteresisRule, RateRule, load_rules
+
+
+class TestAlertEngine(TestCase):
+    def setUp(self):
+        self.engine = AlertEngine()
+        self.sink = MagicMock()
+        self.engine.add_sink(self.sink)
+        self.observer = MagicMock()
+        self.engine.add_observer(self.observer)
+
+    def feed(self, *values):
+        for i, value in enumerate(values):
+            self.engine.feed(('load', '1'), i, value)
+
+    def test_threshold_deduplicated(self):
+        self.engine.add_rule(ThresholdRule('load', 'load', 1, above=2, level='err'))
+        self.feed(1, 3, 4, 5)
+        self.assertEqual(self.sink.put_message.call_count, 1)
+        self.assertEqual(self.sink.put_message.call_args[0][0], 'err')
+        self.assertEqual(len(self.engine.active()), 1)
+        self.feed(1)
+        self.assertEqual(self.sink.put_message.call_args[0][0], 'info')
+        self.assertEqual(self.engine.active(), [])
+        self.assertEqual([call[0][1] for call in self.observer.notify.call_args_list], ['alert', 'clear'])
+
+    def test_hysteresis(self):
+        self.engine.add_rule(HysteresisRule('load', 'load', 1, high=4, low=2))
+        self.feed(4, 3.9, 4.1, 3, 2.5)
+        self.assertEqual(self.sink.put_message.call_count, 1)
+        self.feed(2)
+        self.assertEqual(self.sink.put_message.call_count, 2)
+
+    def test_rate(self):
+        self.engine.add_rule(RateRule('load', 'load', 1, limit=5))
+        self.feed(0, 1, 10, 11)
+        self.assertEqual(self.sink.put_message.call_count, 2)
+        self.assertIsNotNone(self.engine.recent[0].cleared)
+
+    def test_cooldown(self):
+        self.engine.add_rule(ThresholdRule('load', 'load', 1, above=2, cooldown=10))
+        self.feed(3, 1, 3, 3)
+        self.assertEqual(self.sink.put_message.call_count, 2)
+
+    def test_other_meters(self):
+        self.engine.add_rule(ThresholdRule('load', 'load', 5, above=2))
+        self.feed(3, None, float('nan'))
+        self.engine.notify(None, 'sample', ('load', '5'), 0, {'value': 3})
+        self.assertEqual(self.sink.put_message.call_count, 1)
+        self.assertEqual(self.engine.stats()['evaluations'], 1)
+
+    def test_replace_rule(self):
+        self.engine.add_rule(ThresholdRule('load', 'load', 1, above=2))
+        self.engine.add_rule(ThresholdRule('load', 'load', 1, above=20))
+        self.assertEqual(len(self.engine.rules()), 1)
+        self.feed(3)
+        self.assertFalse(self.sink.put_message.called)
+
+
+class TestLoadRules(TestCase):
+    def test_sections(self):
+        config = Config()
+        for section, options in (('alert:disk', {'meter': 'disk', 'above': '90', 'message': '%(meter)s full'}),
+                                 ('alert:swap', {'type': 'rate', 'meter': 'swap', 'limit': '1', 'level': 'err'}),
+                                 ('alert:typo', {'type': 'threshold', 'meter': 'ram', 'abov': '1'}),
+                                 ('alert:unknown', {'type': 'average', 'meter': 'ram'}),
+                                 ('health', {'history_dir': 'history'})):
+            config.add_section(section)
+            for option, value in options.items():
+                config.set(section, option, value)
+        with patch('genesis2.plugins.health.alerts.logging') as logging:
+            rules = sorted(load_rules(config), key=lambda rule: rule.name)
+        self.assertEqual(logging.getLogger.return_value.warning.call_count, 2)
+        self.assertEqual([(rule.__class__, rule.name) for rule in rules], [(ThresholdRule, 'disk'), (RateRule, 'swap')])
+        self.assertEqual(rules[0].above, 90.0)
+        self.assertEqual(rules[0].format(95), 'disk full')
+        self.assertEqual((rules[1].limit, rules[1].level), (1.0, 'err'))
@@ -0,0 +1,57 @@
+__author__ = 'kudrom'
+import threading
+import time
+from unittest import TestCase
+
+from genesis2.plugins.health.batch import MeterReader
+from genesis2.plugins.health.sampler import MeterSampler
+
+
+class SlowMeter(object):
+    name = 'slow'
+    type = 'decimal'
+    interval = 60
+    timeout = 0.05
+
+    def __init__(self, variant=None):
+        self.variant = variant
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get_variants(self):
+        return ['None']
+
+    def prepare(self, variant=None):
+        return self
+
+    def format_value(self):
+        self.calls += 1
+        self.release.wait()
+        return {'value': 42}
+
+
+class TestMeterReader(TestCase):
+    def setUp(self):
+        self.meter = SlowMeter()
+        MeterSampler().register(self.meter)
+        self.reader = MeterReader()
+        self.reader._values = {}
+
+    def tearDown(self):
+        self.meter.release.set()
+        MeterSampler().unregister('slow')
+
+    def test_unknown(self):
+        self.assertEqual(self.reader.read([('nope', 'None')]), {'nope': {'None': {'error': 'unknown meter'}}})
+
+    def test_timeout_and_cache(self):
+        self.assertEqual(self.reader.read([('slow', 'None')])['slow']['None'], {'error': 'timeout'})
+        # A concurrent read shares the evaluation in progress
+        self.reader.read([('slow', 'None')])
+        self.assertEqual(self.meter.calls, 1)
+
+        self.meter.release.set()
+        time.sleep(0.05)
+        value = self.reader.read([('slow', 'None')])['slow']['None']
+        self.assertEqual(value['value'], 42)
+        self.assertEqual(self.meter.calls, 1)
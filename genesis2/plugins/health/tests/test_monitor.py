@@ -0,0 +1,74 @@
+__author__ = 'kudrom'
+import os
+import json
+import shutil
+import tempfile
+from unittest import TestCase
+from mock import MagicMock, patch
+
+from genesis2.core.utils import Singleton
+from genesis2.utils.config import Config
+from genesis2.plugins.health.monitor import HealthMonitor
+from genesis2.plugins.health.endpoint import alerts, history
+
+
+class TestHealthMonitor(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.config = Config()
+        self.config.filename = os.path.join(self.dir, 'genesis2.conf')
+        Singleton._instances.pop(HealthMonitor, None)
+        patcher = patch('genesis2.plugins.health.monitor.MeterSampler')
+        self.sampler = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        monitor = Singleton._instances.pop(HealthMonitor, None)
+        if monitor is not None and monitor.store is not None:
+            monitor.store.close()
+        shutil.rmtree(self.dir)
+
+    def request(self, query, handler=history):
+        start_response = MagicMock()
+        body = handler({'QUERY_STRING': query}, start_response)
+        return start_response.call_args[0][0], ''.join(body)
+
+    def test_disabled(self):
+        HealthMonitor().configure(self.config)
+        self.assertIsNone(HealthMonitor().store)
+        self.assertEqual(self.request('meter=load:1')[0], '404 Not Found')
+
+    def test_history(self):
+        self.config.add_section('health')
+        self.config.set('health', 'history_dir', 'history')
+        HealthMonitor().configure(self.config)
+        store = HealthMonitor().store
+        self.assertEqual(store.directory, os.path.join(self.dir, 'history'))
+        self.sampler.add_observer.assert_any_call(store)
+
+        store.append('load', '1', 1000, 0.5)
+        store.append('load', '1', 1005, float('nan'))
+        status, body = self.request('meter=load:1&start=900&end=1100&resolution=raw')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(json.loads(body), {'resolution': 'raw', 'time': [1000, 1005], 'value': [0.5, None]})
+        self.assertEqual(self.request('meter=load:1&start=yesterday')[0], '400 Bad Request')
+        self.assertEqual(self.request('start=900')[0], '400 Bad Request')
+
+    def test_alerts(self):
+        self.config.add_section('alert:high load')
+        self.config.set('alert:high load', 'type', 'hysteresis')
+        self.config.set('alert:high load', 'meter', 'load')
+        self.config.set('alert:high load', 'variant', '1')
+        self.config.set('alert:high load', 'high', '4')
+        self.config.set('alert:high load', 'low', '2')
+        HealthMonitor().configure(self.config)
+        engine = HealthMonitor().engine
+        self.sampler.add_observer.assert_called_once_with(engine)
+
+        with patch('genesis2.plugins.health.stream.StreamHub') as hub, patch('genesis2.plugins.health.alerts.logging'):
+            engine.notify(self.sampler, 'sample', ('load', '1'), 1000, {'value': 5})
+        hub.return_value.broadcast.assert_called_once_with('message', ('warn', 'load[1] is 5.0'))
+        status, body = self.request('', alerts)
+        body = json.loads(body)
+        self.assertEqual([alert['rule'] for alert in body['active']], ['high load'])
+        self.assertEqual(body['stats']['rules'], 1)
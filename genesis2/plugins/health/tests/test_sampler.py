@@ -0,0 +1,107 @@
+__author__ = 'kudrom'
+import time
+from unittest import TestCase
+from mock import MagicMock, patch
+
+from genesis2.core.core import Plugin
+from genesis2.core.utils import Singleton
+from genesis2.interfaces.gui import IMeter
+from genesis2.plugins.health.sampler import RingBuffer, MeterSampler
+
+
+class FakeMeter(object):
+    name = 'load'
+    type = 'decimal'
+    interval = 0.01
+
+    def __init__(self, variant=None):
+        self.variant = variant
+        self.calls = 0
+
+    def get_variants(self):
+        return ['1', '5']
+
+    def prepare(self, variant=None):
+        return FakeMeter(variant)
+
+    def format_value(self):
+        self.calls += 1
+        return {'value': self.calls}
+
+
+class MeterPlugin(Plugin, FakeMeter):
+    name = 'uptime'
+
+
+class TestRingBuffer(TestCase):
+    def test_wrap(self):
+        buf = RingBuffer(3)
+        self.assertIsNone(buf.latest())
+        for i in range(5):
+            buf.append(i, i * 10)
+        self.assertEqual(len(buf), 3)
+        self.assertEqual(buf.latest(), (4, 40))
+        self.assertEqual(list(buf.times()), [2, 3, 4])
+        self.assertEqual(buf.samples(), [(2, 20), (3, 30), (4, 40)])
+
+
+class TestMeterSampler(TestCase):
+    def setUp(self):
+        self.sampler = MeterSampler()
+        self.sampler.register(FakeMeter())
+
+    def tearDown(self):
+        self.sampler.unregister('load')
+
+    def test_register(self):
+        self.assertIn(('load', '1'), self.sampler.meters())
+        self.assertIn(('load', '5'), self.sampler.meters())
+        self.assertIsNone(self.sampler.get('load', 1))
+
+    def test_sample(self):
+        observer = MagicMock()
+        self.sampler.add_observer(observer)
+        sampled = self.sampler._meters[('load', '1')]
+        self.sampler.sample(sampled)
+        self.sampler.sample(sampled)
+
+        self.assertEqual(self.sampler.get('load', 1)[1], {'value': 2})
+        self.assertEqual([value for ts, value in self.sampler.history('load', 1)], [1, 2])
+        self.assertEqual(observer.notify.call_count, 2)
+
+    def test_observer_error(self):
+        broken, observer = MagicMock(), MagicMock()
+        broken.notify.side_effect = ValueError()
+        self.sampler.add_observer(broken)
+        self.sampler.add_observer(observer)
+        sampled = self.sampler._meters[('load', '1')]
+        with patch('genesis2.plugins.health.sampler.logging'):
+            self.sampler.sample(sampled)
+        self.assertEqual(self.sampler.get('load', 1)[1], {'value': 1})
+        self.assertEqual(observer.notify.call_count, 1)
+
+    def test_rescan(self):
+        # The plugin isn't instantiated, MetaPlugin would publish it in genesis2.apis
+        plugin = MeterPlugin.__new__(MeterPlugin)
+        plugin._implements = [IMeter]
+        self.sampler.unregister('load')
+        with patch.dict(Singleton._instances, {MeterPlugin: plugin}):
+            self.sampler.rescan()
+        self.assertIn(('load', '1'), self.sampler.meters())
+
+    def test_run(self):
+        self.sampler.start()
+        time.sleep(0.1)
+        self.sampler.stop()
+        self.assertGreater(len(self.sampler.history('load', 5)), 2)
+
+
+class TestStart(TestCase):
+    def test_start(self):
+        import genesis2.plugins.health as health
+        with patch.object(health, 'MeterSampler') as sampler, patch.object(health, 'HealthMonitor') as monitor, \
+                patch.object(health, 'GenesisManager') as manager:
+            health.start()
+        monitor.return_value.configure.assert_called_once_with(manager.return_value.config)
+        sampler.return_value.rescan.assert_called_once_with()
+        sampler.return_value.start.assert_called_once_with()
@@ -0,0 +1,78 @@
+__author__ = 'kudrom'
+import json
+from unittest import TestCase
+
+from genesis2.plugins.health.sampler import MeterSampler
+from genesis2.plugins.health.stream import StreamHub, TooManyConnections, event_stream, long_poll
+from genesis2.plugins.health.tests.test_sampler import FakeMeter
+
+
+class TestStreamHub(TestCase):
+    def setUp(self):
+        self.hub = StreamHub()
+        self.sampler = MeterSampler()
+        self.sampler.register(FakeMeter())
+        self.session = {}
+        self.connection = self.hub.open(self.session, [('load', 1)])
+
+    def tearDown(self):
+        self.hub.close(self.connection)
+        self.sampler.unregister('load')
+
+    def sample(self, variant='1'):
+        self.sampler.sample(self.sampler._meters[('load', variant)])
+
+    def test_meter_deltas(self):
+        self.sample()
+        self.sample()
+        self.sample('5')
+        events = self.connection.poll()
+        # Only the newest value of the subscribed meter is delivered
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0][0], 'meter')
+        self.assertEqual(events[0][1]['data'], {'value': 2})
+        self.assertEqual(self.connection.poll(), [])
+        # An unchanged value isn't sent again
+        self.connection.meter(('load', '1'), 0, {'value': 2})
+        self.assertEqual(self.connection.poll(), [])
+
+    def test_session_messages(self):
+        self.session['messages'] = [('info', 'hello')]
+        self.session['statusmsg'] = [('Plugins', 'Downloading...')]
+        events = self.connection.poll()
+        self.assertEqual(events, [('message', ('info', 'hello')), ('status', ('Plugins', 'Downloading...'))])
+        self.assertNotIn('messages', self.session)
+
+    def test_bounded_queue(self):
+        for i in range(self.hub.queue_size + 5):
+            self.connection.push('message', i)
+        events = self.connection.poll()
+        self.assertEqual(len(events), self.hub.queue_size)
+        self.assertEqual(events[0][1], 5)
+        self.assertEqual(self.hub.stats()['dropped'], 5)
+
+    def test_connection_cap(self):
+        max_connections = self.hub.max_connections
+        self.hub.max_connections = 1
+        try:
+            self.assertRaises(TooManyConnections, self.hub.open, {})
+            self.assertEqual(self.hub.stats()['rejected'], 1)
+        finally:
+            self.hub.max_connections = max_connections
+
+    def test_since(self):
+        self.sample()
+        connection = self.hub.open({}, [('load', '1')], since=0)
+        result = long_poll(self.hub, connection, timeout=0)
+        self.assertEqual(result['events'][0]['data']['data'], {'value': 1})
+        self.assertEqual(self.hub.stats()['connections'], 1)
+
+    def test_event_stream(self):
+        stream = event_stream(self.hub, self.connection, interval=0, lifetime=1)
+        self.assertTrue(next(stream).startswith('retry:'))
+        self.sample()
+        chunk = next(stream)
+        self.assertTrue(chunk.startswith('event: meter\ndata: '))
+        self.assertEqual(json.loads(chunk.split('data: ')[1])['data'], {'value': 1})
+        stream.close()
+        self.assertEqual(self.hub.stats()['connections'], 0)
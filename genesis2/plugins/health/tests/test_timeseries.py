@@ -0,0 +1,68 @@
+__author__ = 'kudrom'
+import shutil
+import tempfile
+from unittest import TestCase
+
+from genesis2.plugins.health.timeseries import Segment, TimeSeriesStore
+
+
+class TestSegment(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = self.dir + '/segment'
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_ring(self):
+        segment = Segment(self.path, 2, 4)
+        for i in range(6):
+            segment.append((i, i * 10))
+        self.assertEqual(len(segment), 4)
+        self.assertEqual(segment.first_time(), 2)
+        times, values = segment.range(3, 4)
+        self.assertEqual(list(times), [3, 4])
+        self.assertEqual(list(values), [30, 40])
+
+    def test_persistence(self):
+        segment = Segment(self.path, 2, 4)
+        segment.append((1, 10))
+        segment.close()
+        segment = Segment(self.path, 2, 4)
+        self.assertEqual(segment.last(), (1, 10))
+        # A different layout resets the segment
+        segment.close()
+        self.assertEqual(len(Segment(self.path, 2, 8)), 0)
+
+
+class TestTimeSeriesStore(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = TimeSeriesStore(self.dir, raw_capacity=10)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.dir)
+
+    def test_rollups(self):
+        for i in range(120):
+            self.store.notify(None, 'sample', ('load', 'None'), 3600 + i, {'value': i})
+
+        raw = self.store.query('load', 'None', 0, 10000, 'raw')
+        self.assertEqual(list(raw['value']), range(110, 120))
+
+        minutes = self.store.query('load', 'None', 0, 10000, 'minute')
+        self.assertEqual(list(minutes['time']), [3600, 3660])
+        self.assertEqual(list(minutes['min']), [0, 60])
+        self.assertEqual(list(minutes['max']), [59, 119])
+        self.assertEqual(list(minutes['avg']), [29.5, 89.5])
+
+        hours = self.store.query('load', 'None', 0, 10000, 'hour')
+        self.assertEqual(list(hours['avg']), [59.5])
+
+    def test_resolution(self):
+        for i in range(20):
+            self.store.append('load', 'None', 3600 + i, i)
+        self.assertEqual(self.store.query('load', 'None', 3615, 4000)['resolution'], 'raw')
+        self.assertEqual(self.store.query('load', 'None', 3600, 4000)['resolution'], 'minute')
+        self.assertEqual(len(self.store.query('unknown', 'None', 0, 1)['time']), 0)
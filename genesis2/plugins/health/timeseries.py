@@ -0,0 +1,259 @@
+__author__ = 'kudrom'
+import os
+import mmap
+import struct
+import urllib
+import threading
+from array import array
+
+
+class Segment(object):
+    """
+    A file of fixed size, memory-mapped, holding a ring of fixed-size records whose first field is a timestamp.
+    The records are appended in chronological order and the oldest one is overwritten when the ring is full.
+
+    The file starts with a header (magic, record size, capacity, next slot, count) followed by the records.
+    """
+    MAGIC = 'GTS1'
+    HEADER = struct.Struct('<4sIIII')
+
+    def __init__(self, path, fields, capacity):
+        """
+        :param  path:       path of the segment file
+        :type   path:       str
+        :param  fields:     number of doubles of a record
+        :type   fields:     int
+        :param  capacity:   number of records
+        :type   capacity:   int
+        """
+        self.path = path
+        self.fields = fields
+        self.record = struct.Struct('<%dd' % fields)
+        self.capacity = capacity
+        size = self.HEADER.size + self.record.size * capacity
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, record_size, capacity, self._next, self._count = self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or record_size != self.record.size or capacity != self.capacity:
+            # New file or a file created with another layout
+            self._next = self._count = 0
+            self._mm[:] = '\0' * size
+            self._write_header()
+
+    def __len__(self):
+        return self._count
+
+    def _write_header(self):
+        self.HEADER.pack_into(self._mm, 0, self.MAGIC, self.record.size, self.capacity, self._next, self._count)
+
+    def _offset(self, slot):
+        return self.HEADER.size + slot * self.record.size
+
+    def _slot(self, index):
+        """
+        Translates the chronological index of a record (0 is the oldest) to its slot in the ring.
+        """
+        return (self._next - self._count + index) % self.capacity
+
+    def append(self, values):
+        self.record.pack_into(self._mm, self._offset(self._next), *values)
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        self._write_header()
+
+    def replace_last(self, values):
+        self.record.pack_into(self._mm, self._offset(self._slot(self._count - 1)), *values)
+
+    def last(self):
+        """
+        :returns:   the newest record or None if the segment is empty
+        """
+        if self._count == 0:
+            return None
+        return self.record.unpack_from(self._mm, self._offset(self._slot(self._count - 1)))
+
+    def first_time(self):
+        if self._count == 0:
+            return None
+        return self._time(0)
+
+    def _time(self, index):
+        return struct.unpack_from('<d', self._mm, self._offset(self._slot(index)))[0]
+
+    def _bisect(self, timestamp):
+        """
+        :returns:   the chronological index of the first record newer or equal than ``timestamp``
+        """
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._time(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def range(self, start, end):
+        """
+        Reads the records with start <= timestamp <= end. Only the records in the range are unpacked.
+
+        :returns:   list of arrays of doubles, one per field
+        """
+        columns = [array('d') for i in range(self.fields)]
+        index = self._bisect(start)
+        while index < self._count:
+            values = self.record.unpack_from(self._mm, self._offset(self._slot(index)))
+            if values[0] > end:
+                break
+            for column, value in zip(columns, values):
+                column.append(value)
+            index += 1
+        return columns
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.close()
+
+
+class Series(object):
+    """
+    History of a meter variant stored in three segments: the raw samples and the 1-minute and 1-hour rollups
+    with the min, max and average of the samples taken in each period.
+    """
+    RESOLUTIONS = (('minute', 60), ('hour', 3600))
+
+    def __init__(self, path, raw_capacity=3600, minute_capacity=7 * 24 * 60, hour_capacity=90 * 24):
+        self._lock = threading.Lock()
+        self.raw = Segment(path + '.raw', 2, raw_capacity)
+        # Rollup records are (period start, min, max, sum, count)
+        self.rollups = {
+            'minute': Segment(path + '.minute', 5, minute_capacity),
+            'hour': Segment(path + '.hour', 5, hour_capacity),
+        }
+
+    def append(self, timestamp, value):
+        with self._lock:
+            self.raw.append((timestamp, value))
+            if value != value:
+                # NaN, the meter didn't return a value
+                return
+            for name, period in self.RESOLUTIONS:
+                segment = self.rollups[name]
+                start = timestamp - timestamp % period
+                last = segment.last()
+                if last is not None and last[0] == start:
+                    segment.replace_last((start, min(last[1], value), max(last[2], value),
+                                          last[3] + value, last[4] + 1))
+                else:
+                    segment.append((start, value, value, value, 1))
+
+    def resolution_for(self, start):
+        """
+        :returns:   the finest resolution whose segment still covers ``start``
+        """
+        for name, segment in (('raw', self.raw), ('minute', self.rollups['minute'])):
+            first = segment.first_time()
+            if first is not None and first <= start:
+                return name
+        return 'hour'
+
+    def query(self, start, end, resolution=None):
+        """
+        :param  resolution: 'raw', 'minute' or 'hour', the finest one covering ``start`` if None
+        :type   resolution: str
+        :returns:           dict with the columns 'time' and 'value' (raw) or 'time', 'min', 'max' and 'avg'
+        """
+        with self._lock:
+            if resolution is None:
+                resolution = self.resolution_for(start)
+            if resolution == 'raw':
+                times, values = self.raw.range(start, end)
+                return {'resolution': 'raw', 'time': times, 'value': values}
+            times, mins, maxs, sums, counts = self.rollups[resolution].range(start, end)
+        avgs = array('d', [total / count for total, count in zip(sums, counts)])
+        return {'resolution': resolution, 'time': times, 'min': mins, 'max': maxs, 'avg': avgs}
+
+    def flush(self):
+        with self._lock:
+            self.raw.flush()
+            for segment in self.rollups.values():
+                segment.flush()
+
+    def close(self):
+        with self._lock:
+            self.raw.close()
+            for segment in self.rollups.values():
+                segment.close()
+
+
+class TimeSeriesStore(object):
+    """
+    Persistent history of the values of the meters of type binary, decimal and linear. Its size is fixed by the
+    capacity of the segments, so a week-long chart is a bounded read.
+
+    The store is fed by the :class:`genesis2.plugins.health.sampler.MeterSampler`; as the observers are weak
+    references, the owner of the store must keep a reference to it (the
+    :class:`genesis2.plugins.health.monitor.HealthMonitor` does it when ``history_dir`` is set in [health])::
+
+        store = TimeSeriesStore('/var/lib/genesis/meters')
+        MeterSampler().add_observer(store)
+    """
+    def __init__(self, directory, **capacities):
+        self.directory = directory
+        self.capacities = capacities
+        self._lock = threading.Lock()
+        # (name, variant) -> Series
+        self._series = {}
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _get_series(self, name, variant, create=True):
+        key = (name, str(variant))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                path = os.path.join(self.directory, '%s.%s' % (urllib.quote(key[0], ''), urllib.quote(key[1], '')))
+                if not create and not os.path.exists(path + '.raw'):
+                    return None
+                series = self._series[key] = Series(path, **self.capacities)
+            return series
+
+    def append(self, name, variant, timestamp, value):
+        self._get_series(name, variant).append(timestamp, value)
+
+    def notify(self, sampler, msg, *args):
+        if msg == 'sample':
+            (name, variant), timestamp, data = args
+            value = data.get('value')
+            if isinstance(value, bool):
+                value = 1.0 if value else 0.0
+            self.append(name, variant, timestamp, float(value) if value is not None else float('nan'))
+
+    def query(self, name, variant, start, end, resolution=None):
+        """
+        Returns the history of a meter variant between ``start`` and ``end`` as columnar arrays, see
+        :meth:`Series.query`. The columns are empty if the meter has no history.
+        """
+        series = self._get_series(name, variant, create=False)
+        if series is None:
+            return {'resolution': resolution or 'raw', 'time': array('d'), 'value': array('d')}
+        return series.query(start, end, resolution)
+
+    def flush(self):
+        for series in self._series.values():
+            series.flush()
+
+    def close(self):
+        with self._lock:
+            for series in self._series.values():
+                series.close()
+            self._series = {}
@@ -1,3 +1,6 @@
+import os
+
+from genesis2.utils.utils import command
 
 
 class RepositoryManager:
@@ -137,7 +140,7 @@ class RepositoryManager:
         if cat:
             cat.put_statusmsg('Removing plugin...')
         dir = self.config.get('genesis', 'plugins')
-        shell('rm -r %s/%s' % (dir, id))
+        command(['rm', '-r', os.path.join(dir, id)])
 
         if id in PluginLoader.list_plugins():
             depends = []
@@ -155,9 +158,9 @@ class RepositoryManager:
                     if thing[1] <= 1 and not thing[0][1] in exclude:
                         if cat:
                             cat.put_statusmsg('Removing dependency %s...' % thing[0][1])
-                        shell('systemctl stop ' + thing[0][2])
-                        shell('systemctl disable ' + thing[0][2])
-                        shell('pacman -%s --noconfirm ' % ('Rn' if self.purge is '1' else 'R') + thing[0][1])
+                        command(['systemctl', 'stop', thing[0][2]])
+                        command(['systemctl', 'disable', thing[0][2]])
+                        command(['pacman', '-Rn' if self.purge is '1' else '-R', '--noconfirm', thing[0][1]])
             except KeyError:
                 pass
             PluginLoader.unload(id)
@@ -207,10 +210,11 @@ class RepositoryManager:
 
         if cat:
             cat.put_statusmsg('Extracting plugin package...')
-        id = shell('tar tzf %s/plugin.tar.gz' % dir).split('\n')[0].strip('/')
+        package = os.path.join(dir, 'plugin.tar.gz')
+        id = command(['tar', 'tzf', package]).split('\n')[0].strip('/')
 
-        shell('cd %s; tar xf plugin.tar.gz' % dir)
-        shell('rm %s/plugin.tar.gz' % dir)
+        command(['tar', 'xf', package, '-C', dir])
+        command(['rm', package])
 
         if load:
             PluginLoader.load(id, cat=cat)
@@ -0,0 +1,3 @@
+from provider import ProcSysStat
+
+ProcSysStat()
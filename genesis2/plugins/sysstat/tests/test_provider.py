@@ -0,0 +1,81 @@
+__author__ = 'kudrom'
+import os
+import tempfile
+from unittest import TestCase
+
+import genesis2.apis
+from genesis2.core.core import AppManager
+from genesis2.plugins.sysstat.provider import ProcFile, ProcSysStat, parse_stat, parse_meminfo, parse_loadavg, \
+    parse_diskstats
+
+
+STAT = """cpu  100 0 50 800 50 0 0 0 0 0
+cpu0 60 0 20 400 20 0 0 0 0 0
+intr 123 0 0
+"""
+
+MEMINFO = """MemTotal:        1000 kB
+MemFree:          200 kB
+MemAvailable:     400 kB
+SwapTotal:        500 kB
+SwapFree:         300 kB
+HugePages_Total:    0
+"""
+
+DISKSTATS = """   8       0 sda 100 0 2000 50 10 0 400 20 0 60 70
+ 179       0 mmcblk0 10 0 80 5 1 0 8 2 0 7 7 0 0 0 0
+"""
+
+
+class TestParsers(TestCase):
+    def test_parse_stat(self):
+        self.assertEqual(parse_stat(STAT), {'cpu': (1000, 850), 'cpu0': (500, 420)})
+
+    def test_parse_meminfo(self):
+        info = parse_meminfo(MEMINFO)
+        self.assertEqual(info['MemTotal'], 1000 * 1024)
+        self.assertEqual(info['HugePages_Total'], 0)
+
+    def test_parse_loadavg(self):
+        self.assertEqual(parse_loadavg('0.50 0.25 0.10 1/123 4567\n'), (0.5, 0.25, 0.1))
+
+    def test_parse_diskstats(self):
+        self.assertEqual(parse_diskstats(DISKSTATS), {'sda': (2000, 400, 60), 'mmcblk0': (80, 8, 7)})
+
+
+class TestProcSysStat(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        # The methods of the plugin are protected against the apps
+        AppManager(path_apps=self.dir)
+        self.stat = genesis2.apis.PSysStat
+        for name, data in (('stat', STAT), ('meminfo', MEMINFO), ('loadavg', '1.0 2.0 3.0 1/1 1\n')):
+            self.write(name, data)
+            setattr(self.stat, '_' + name, ProcFile(os.path.join(self.dir, name)))
+
+    def write(self, name, data):
+        with open(os.path.join(self.dir, name), 'w') as f:
+            f.write(data)
+
+    def tearDown(self):
+        self.stat.unload()
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def test_plugin(self):
+        self.assertIsInstance(self.stat, ProcSysStat)
+        self.assertEqual(self.stat.get_load(), (1.0, 2.0, 3.0))
+        self.assertEqual(self.stat.get_ram(), (600 * 1024, 1000 * 1024))
+        self.assertEqual(self.stat.get_swap(), (200 * 1024, 500 * 1024))
+
+    def test_cpu_delta(self):
+        self.stat._last_cpus = {}
+        self.stat.get_cpu()
+        self.stat.get_cpu('sampler')
+        self.write('stat', 'cpu  150 0 50 850 50 0 0 0 0 0\n')
+        # The descriptor stays open, ProcFile seeks it back to the start and reads the new content
+        self.assertEqual(self.stat.get_cpu()['cpu'], 50.0)
+        # Every caller has its own baseline
+        self.assertEqual(self.stat.get_cpu('sampler')['cpu'], 50.0)
+        self.assertEqual(self.stat.get_cpu()['cpu'], 0.0)
@@ -64,7 +64,7 @@ class BackgroundProcess (BackgroundWorker):
     - ``output`` - `str`, process' stdout data
     - ``errors`` - `str`, process' stderr data
     - ``exitcode`` - `int`, process' exit code
-    - ``cmdline`` - `str`, process' commandline
+    - ``cmdline`` - `str` or `list`, process' commandline or argv
     """
     def __init__(self, cmd, runas=None):
         BackgroundWorker.__init__(self, cmd, runas)
@@ -76,27 +76,26 @@ class BackgroundProcess (BackgroundWorker):
 
     def run(self, c, runas):
         """
-        Runs the process in foreground
+        Runs the process in foreground. ``c`` can be a commandline run by the
+        shell or an argv list executed without it.
         """
-        if runas is None and runas != 'anonymous':
+        kwargs = {}
+        if runas is not None and runas != 'anonymous':
             env = os.environ.copy()
             env['USER'] = runas
             env['LOGNAME'] = runas
             cwd = os.path.expanduser('~'+runas)
             env['HOME'] = cwd
             env['PWD'] = cwd
-            self.process = subprocess.Popen(c, shell=True,
-                                            stderr=subprocess.PIPE,
-                                            stdout=subprocess.PIPE,
-                                            stdin=subprocess.PIPE,
-                                            preexec_fn=self.as_user(runas),
-                                            cwd=cwd,
-                                            env=env)
-        else:
-            self.process = subprocess.Popen(c, shell=True,
-                                            stderr=subprocess.PIPE,
-                                            stdout=subprocess.PIPE,
-                                            stdin=subprocess.PIPE)
+            kwargs = {'preexec_fn': self.as_user(runas), 'cwd': cwd, 'env': env}
+
+        # The process can outlive the request, it mustn't inherit the sockets of the server
+        self.process = subprocess.Popen(c, shell=isinstance(c, basestring),
+                                        stderr=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        stdin=subprocess.PIPE,
+                                        close_fds=True,
+                                        **kwargs)
 
         # Workaround; waiting first causes a deadlock
         self.output += self.process.stdout.readline()
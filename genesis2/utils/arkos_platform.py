@@ -1,5 +1,11 @@
 import platform
-from genesis2.utils.utils import shell, shell_status
+from genesis2.utils.utils import command, command_status, shell_cacheable
+
+
+# These probes don't change during the process lifetime
+shell_cacheable(['strings', '-4', '/etc/issue'])
+shell_cacheable(['lsb_release', '-sd'])
+shell_cacheable(['uname', '-mrs'])
 
 
 def detect_platform(mapping=True):
@@ -33,7 +39,7 @@ def detect_platform(mapping=True):
 
     if dist == '':
         try:
-            dist = shell('strings -4 /etc/issue').split()[0]
+            dist = command(['strings', '-4', '/etc/issue']).split()[0]
         except:
             dist = 'unknown'
 
@@ -50,8 +56,8 @@ def detect_distro():
     """
     Returns human-friendly OS name.
     """
-    if shell_status('lsb_release -sd') == 0:
-        return shell('lsb_release -sd')
-    return shell('uname -mrs')
+    if command_status(['lsb_release', '-sd']) == 0:
+        return command(['lsb_release', '-sd'])
+    return command(['uname', '-mrs'])
 
 
@@ -0,0 +1,114 @@
+import sys
+import time
+import threading
+
+from genesis2.utils.cooperative import Event
+
+
+class _Flight(object):
+    """
+    A computation in progress whose result is shared by every caller that asked for the same key.
+    """
+    def __init__(self):
+        # The followers in the gevent loop wait without taking a thread of the threadpool
+        self._event = Event()
+        self._value = None
+        self._exc_info = None
+
+    def done(self, value):
+        self._value = value
+        self._event.set()
+
+    def fail(self, exc_info):
+        self._exc_info = exc_info
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+
+class TTLCache(object):
+    """
+    Memoises the results of expensive calls during a TTL.
+
+    Concurrent calls with the same key are deduplicated (single-flight): only the first caller computes the value,
+    the others wait cooperatively for its result.
+
+    Instance vars:
+
+    - ``hits`` - `int`, calls served from the cache
+    - ``misses`` - `int`, calls that computed the value
+    - ``shared`` - `int`, calls that waited for the computation of a concurrent call
+    """
+    def __init__(self, ttl=None):
+        """
+        :param  ttl:    default seconds a value is valid, None to keep it forever
+        :type   ttl:    int
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        # key -> (expiration time or None, value)
+        self._values = {}
+        # key -> _Flight
+        self._flights = {}
+
+    def get(self, key, func, ttl=None):
+        """
+        Returns the cached value of ``key`` or computes it calling ``func`` without arguments.
+
+        :param  ttl:    seconds the computed value is valid, the default TTL is used if None
+        :type   ttl:    int
+        """
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is not None and (entry[0] is None or entry[0] > time.time()):
+                self.hits += 1
+                return entry[1]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+            else:
+                self.shared += 1
+        if not leader:
+            return flight.wait()
+
+        try:
+            value = func()
+        except:
+            flight.fail(sys.exc_info())
+            raise
+        else:
+            ttl = ttl if ttl is not None else self.ttl
+            with self._lock:
+                self._values[key] = (time.time() + ttl if ttl is not None else None, value)
+            flight.done(value)
+            return value
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    def invalidate(self, key=None):
+        """
+        Forgets the value of ``key`` or all of them if None.
+        """
+        with self._lock:
+            if key is None:
+                self._values = {}
+            else:
+                self._values.pop(key, None)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'size': len(self._values),
+        }
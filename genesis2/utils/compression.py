@@ -0,0 +1,243 @@
+"""
+WSGI middleware that compresses the responses with gzip or deflate when the client accepts it.
+"""
+import time
+import zlib
+import threading
+
+from genesis2.utils.wsgi import ClosingIterator, get_header
+from genesis2.utils.conditional import weaken
+
+
+# Prefixes of the content types worth compressing. The images, archives and fonts are already compressed and the
+# event streams must reach the client as soon as they're written.
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/javascript', 'text/csv',
+    'application/json', 'application/javascript', 'application/xml', 'application/xhtml+xml',
+    'image/svg+xml',
+)
+
+# encoding -> wbits of zlib: gzip has its own header, deflate is the zlib format as HTTP defines it
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+_level = 6
+_min_size = 1024
+
+
+def configure(level=None, min_size=None):
+    """
+    :param  level:      compression level from 1 (fastest) to 9 (smallest), 0 disables the compression
+    :type   level:      int
+    :param  min_size:   bodies of a known size smaller than this number of bytes are sent as they are
+    :type   min_size:   int
+    """
+    global _level, _min_size
+    if level is not None:
+        _level = level
+    if min_size is not None:
+        _min_size = min_size
+
+
+def negotiate(accept_encoding):
+    """
+    Chooses the encoding of the response from the Accept-Encoding header of the request, gzip is preferred over
+    deflate when both have the same quality.
+
+    :returns:   'gzip', 'deflate' or None if the response must not be compressed
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(','):
+        params = item.strip().split(';')
+        coding = params[0].strip().lower()
+        quality = 1.0
+        for param in params[1:]:
+            name, _, value = param.strip().partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    best, best_quality = None, 0.0
+    for coding in ('gzip', 'deflate'):
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def is_compressible(content_type):
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionStats(object):
+    """
+    Counters of the :class:`CompressionMiddleware`: the responses compressed, the ones sent as they were per reason,
+    the bytes before and after the compression and the seconds spent compressing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.compressed = {}
+            self.skipped = {}
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.seconds = 0.0
+
+    def skip(self, reason):
+        with self._lock:
+            self.skipped[reason] = self.skipped.get(reason, 0) + 1
+
+    def add(self, encoding, bytes_in, bytes_out, seconds):
+        with self._lock:
+            self.compressed[encoding] = self.compressed.get(encoding, 0) + 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.seconds += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'compressed': dict(self.compressed),
+                'skipped': dict(self.skipped),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': float(self.bytes_out) / self.bytes_in if self.bytes_in else 1.0,
+                'seconds': self.seconds,
+            }
+
+
+stats = CompressionStats()
+
+
+class CompressionMiddleware(object):
+    """
+    Compresses the responses of ``application`` whose content type is in :data:`COMPRESSIBLE_TYPES`. The responses
+    that already have a Content-Encoding (like the precompressed static files served by
+    :func:`genesis2.utils.utils.wsgi_serve_file`) are sent as they are.
+
+    The bodies of a known size are compressed at once and keep their Content-Length; the streamed ones are compressed
+    chunk by chunk as the server consumes them.
+    """
+
+    def __init__(self, application, level=None, min_size=None):
+        """
+        :param  level:      compression level, see :func:`configure` for the default
+        :param  min_size:   minimum size of the compressed bodies, see :func:`configure` for the default
+        """
+        self._application = application
+        self.level = _level if level is None else level
+        self.min_size = _min_size if min_size is None else min_size
+
+    def __call__(self, environ, start_response):
+        if self.level <= 0:
+            return self._application(environ, start_response)
+        encoding = negotiate(environ.get('HTTP_ACCEPT_ENCODING'))
+        response = []
+
+        def _start_response(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+
+        body = self._application(environ, _start_response)
+        status, headers, exc_info = response
+        if status.startswith('304') and encoding is not None:
+            # A 304 has no Content-Type, but it validates the compressed response the client holds
+            stats.skip('status')
+            start_response(status, self._vary(self._weakened(headers)), exc_info)
+            return body
+        reason = self._skip_reason(environ, status, headers, encoding)
+        if reason is not None:
+            stats.skip(reason)
+            start_response(status, headers, exc_info)
+            return body
+
+        if isinstance(body, basestring):
+            body = [body]
+        if isinstance(body, (list, tuple)):
+            content = ''.join(body)
+            if len(content) < self.min_size:
+                stats.skip('size')
+                start_response(status, self._vary(headers), exc_info)
+                return [content]
+            content = ''.join(self._compress([content], encoding))
+            start_response(status, self._encoded(headers, encoding, len(content)), exc_info)
+            return [content]
+
+        start_response(status, self._encoded(headers, encoding), exc_info)
+        return ClosingIterator(self._compress(body, encoding), [getattr(body, 'close', lambda: None)])
+
+    @staticmethod
+    def _weakened(headers):
+        return [(name, weaken(value) if name.lower() == 'etag' else value) for name, value in headers]
+
+    def _encoded(self, headers, encoding, length=None):
+        """
+        :returns:   the headers of the response compressed with ``encoding``
+        """
+        headers = [(name, value) for name, value in self._weakened(headers) if name.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        if length is not None:
+            headers.append(('Content-Length', str(length)))
+        return self._vary(headers)
+
+    def _skip_reason(self, environ, status, headers, encoding):
+        """
+        :returns:   why the response isn't compressed or None if it must be compressed
+        """
+        if not is_compressible(get_header(headers, 'Content-Type')):
+            return 'type'
+        if encoding is None:
+            # The response would have been compressed for another client
+            self._vary(headers)
+            return 'encoding'
+        if get_header(headers, 'Content-Encoding') is not None:
+            return 'encoded'
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not status.startswith('200'):
+            return 'status'
+        length = get_header(headers, 'Content-Length')
+        if length is not None and int(length) < self.min_size:
+            self._vary(headers)
+            return 'size'
+        return None
+
+    @staticmethod
+    def _vary(headers):
+        """
+        Adds Accept-Encoding to the Vary header so the caches keep a response per encoding.
+        """
+        for i, (name, value) in enumerate(headers):
+            if name.lower() == 'vary':
+                if 'accept-encoding' not in value.lower():
+                    headers[i] = (name, value + ', Accept-Encoding')
+                return headers
+        headers.append(('Vary', 'Accept-Encoding'))
+        return headers
+
+    def _compress(self, body, encoding):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+        bytes_in = bytes_out = 0
+        seconds = 0.0
+        for chunk in body:
+            start = time.time()
+            data = compressor.compress(chunk)
+            seconds += time.time() - start
+            bytes_in += len(chunk)
+            bytes_out += len(data)
+            if data:
+                yield data
+        start = time.time()
+        data = compressor.flush()
+        seconds += time.time() - start
+        bytes_out += len(data)
+        stats.add(encoding, bytes_in, bytes_out, seconds)
+        yield data
@@ -0,0 +1,169 @@
+"""
+Validators of the responses (ETag and Last-Modified) and the conditional GET: a client that already has the current
+version of a response gets a 304 Not Modified without the body.
+"""
+import hashlib
+import threading
+
+from genesis2.utils.wsgi import ClosingIterator, get_header, parse_http_date
+
+# Headers of the 200 response kept in the 304, RFC 7232 section 4.1
+NOT_MODIFIED_HEADERS = ('cache-control', 'content-location', 'date', 'etag', 'expires', 'last-modified', 'vary',
+                        'set-cookie')
+
+
+def make_etag(content, weak=False):
+    """
+    :param  content:    body of the response
+    :param  weak:       if True the tag is weak (W/"..."), the body may change without changing its meaning
+    :returns:           the ETag of the body
+    """
+    tag = '"%s"' % hashlib.sha1(content).hexdigest()
+    return 'W/' + tag if weak else tag
+
+
+def weaken(etag):
+    """
+    :returns:   the weak version of an ETag, for the transformations of the body (like the compression) that keep
+                its meaning but not its bytes
+    """
+    if etag.startswith('W/'):
+        return etag
+    return 'W/' + etag
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an ETag with the tags of an If-None-Match header, as RFC 7232 requires for the GET requests.
+    """
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == opaque:
+            return True
+    return False
+
+
+def is_fresh(environ, etag=None, last_modified=None):
+    """
+    Checks the validators of the request against the ones of the current response, so a handler that knows them
+    beforehand (from a version or a modification time) can answer 304 without building the body. If-None-Match takes
+    precedence over If-Modified-Since.
+
+    :param  etag:           ETag of the current response
+    :param  last_modified:  timestamp of the last modification of the current response
+    :returns:               True if the client already has the current response
+    """
+    if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if last_modified is None:
+        return False
+    since = parse_http_date(environ.get('HTTP_IF_MODIFIED_SINCE'))
+    return since is not None and int(last_modified) <= since
+
+
+def not_modified_headers(headers):
+    """
+    :returns:   the headers of a response that are sent in its 304 Not Modified
+    """
+    return [(name, value) for name, value in headers if name.lower() in NOT_MODIFIED_HEADERS]
+
+
+class ConditionalStats(object):
+    """
+    Counters of the :class:`ConditionalMiddleware`: the ETags computed and the responses answered with a 304 and the
+    bytes of their bodies that weren't sent (when their size is known).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.computed = 0
+            self.not_modified = 0
+            self.bytes_saved = 0
+
+    def add(self, computed=0, not_modified=0, bytes_saved=0):
+        with self._lock:
+            self.computed += computed
+            self.not_modified += not_modified
+            self.bytes_saved += bytes_saved
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'computed': self.computed,
+                'not_modified': self.not_modified,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+stats = ConditionalStats()
+
+
+class ConditionalMiddleware(object):
+    """
+    Adds an ETag to the successful GET responses of ``application`` and answers 304 Not Modified when it matches the
+    If-None-Match of the request.
+
+    The ETag set by the handler is used if there's one; in that case a streamed body is closed without consuming it.
+    Otherwise the ETag is the hash of the body, computed only when its size is known and smaller than ``max_size``
+    bytes: the streamed bodies are sent as they are.
+    """
+
+    def __init__(self, application, weak=False, max_size=1024 * 1024):
+        """
+        :param  weak:       compute weak ETags instead of strong ones
+        :param  max_size:   biggest body whose ETag is computed
+        """
+        self._application = application
+        self.weak = weak
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD', 'GET') not in ('GET', 'HEAD'):
+            return self._application(environ, start_response)
+        response = []
+
+        def _start_response(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+
+        body = self._application(environ, _start_response)
+        status, headers, exc_info = response
+        if not status.startswith('200'):
+            start_response(status, headers, exc_info)
+            return body
+
+        etag = get_header(headers, 'ETag')
+        if etag is None:
+            if isinstance(body, basestring):
+                body = [body]
+            if not isinstance(body, (list, tuple)):
+                start_response(status, headers, exc_info)
+                return body
+            content = ''.join(body)
+            if len(content) > self.max_size:
+                start_response(status, headers, exc_info)
+                return body
+            etag = make_etag(content, self.weak)
+            headers.append(('ETag', etag))
+            stats.add(computed=1)
+
+        if not etag_matches(environ.get('HTTP_IF_NONE_MATCH'), etag):
+            start_response(status, headers, exc_info)
+            return body
+
+        length = get_header(headers, 'Content-Length')
+        stats.add(not_modified=1, bytes_saved=int(length) if length is not None else 0)
+        start_response('304 Not Modified', not_modified_headers(headers))
+        # The body isn't consumed, but whatever it holds must be released
+        return ClosingIterator([], [getattr(body, 'close', lambda: None)])
@@ -3,24 +3,119 @@ Tools for manipulating Genesis configuration files
 """
 
 import os
-from ConfigParser import ConfigParser
+import threading
+from collections import OrderedDict
+from ConfigParser import ConfigParser, NoSectionError, NoOptionError, InterpolationError
 
 from genesis2.utils.arkos_platform import detect_platform
 
 
-class Config(ConfigParser):
+def _lookup(snapshot, section, val, default):
     """
-    A wrapper around ConfigParser
+    Looks up a value in a snapshot built by :meth:`Config.snapshot`, raising the errors of ConfigParser.
+    """
+    try:
+        return snapshot[section][val]
+    except KeyError:
+        if default is not None:
+            return default
+        if section not in snapshot:
+            raise NoSectionError(section)
+        raise NoOptionError(val, section)
+
+
+class TypedGetters(object):
+    """
+    Typed accessors over the ``get`` method of :class:`Config` and :class:`ConfigProxy`.
+    """
+    def get_int(self, section, val, default=None):
+        return int(self.get(section, val, default))
+
+    def get_float(self, section, val, default=None):
+        return float(self.get(section, val, default))
+
+    def get_bool(self, section, val, default=None):
+        """
+        :returns:   True for '1', 'yes', 'true' and 'on', False for '0', 'no', 'false' and 'off'
+        :raises:    ValueError for other values
+        """
+        value = self.get(section, val, default)
+        if isinstance(value, bool):
+            return value
+        if value.lower() not in ConfigParser._boolean_states:
+            raise ValueError('Not a boolean: %s' % value)
+        return ConfigParser._boolean_states[value.lower()]
+
+
+class Config(ConfigParser, TypedGetters):
+    """
+    A wrapper around ConfigParser.
+
+    The reads are served from a snapshot of the parsed and interpolated values, rebuilt after every change of the
+    configuration, so a ``get`` costs two dict lookups.
     """
     internal = {}
     filename = ''
-    proxies = {}
+    # :class:`genesis2.utils.userstore.UserStore` with the users and their settings, if any
+    user_store = None
 
-    def __init__(self):
+    def __init__(self, max_proxies=64):
+        """
+        :param  max_proxies:    number of :class:`ConfigProxy` kept by :meth:`get_proxy`
+        :type   max_proxies:    int
+        """
         ConfigParser.__init__(self)
+        self.max_proxies = max_proxies
+        # user -> ConfigProxy, least recently used first
+        self.proxies = OrderedDict()
+        self._proxies_lock = threading.Lock()
+        self.proxy_hits = 0
+        self.proxy_misses = 0
+        self.proxy_evictions = 0
+        # Incremented on every change, the snapshot is rebuilt when it doesn't match
+        self.version = 0
+        self._snapshot = (None, None)
         # TODO: move this out; (kudrom) -> it should be in the installer
         self.set('platform', detect_platform())
 
+    def _changed(self):
+        self.version += 1
+
+    def _read(self, fp, fpname):
+        ConfigParser._read(self, fp, fpname)
+        self._changed()
+
+    def add_section(self, section):
+        ConfigParser.add_section(self, section)
+        self._changed()
+
+    def remove_section(self, section):
+        self._changed()
+        return ConfigParser.remove_section(self, section)
+
+    def remove_option(self, section, option):
+        self._changed()
+        return ConfigParser.remove_option(self, section, option)
+
+    def snapshot(self):
+        """
+        :returns:   dict section -> dict option -> value with the interpolated values, which must not be modified
+        """
+        version, snapshot = self._snapshot
+        if version == self.version:
+            return snapshot
+        version = self.version
+        snapshot = {}
+        for section in self.sections():
+            values = snapshot[section] = {}
+            for option in self.options(section):
+                try:
+                    values[option] = ConfigParser.get(self, section, option)
+                except InterpolationError:
+                    values[option] = ConfigParser.get(self, section, option, raw=True)
+        self._snapshot = (version, snapshot)
+        return snapshot
+
     def load(self, fn):
         """
         Loads configuration data from the specified file
@@ -37,15 +132,68 @@ class Config(ConfigParser):
         with open(self.filename, 'w') as f:
             self.write(f)
 
+    def as_dict(self):
+        """
+        :returns:   dict section -> dict option -> raw value
+        """
+        return dict((section, dict((option, value) for option, value in options.items() if option != '__name__'))
+                    for section, options in self._sections.items())
+
     def get_proxy(self, user):
         """
         :param  user: User
         :type   user: str
         :returns:   :class:`ConfigProxy` for the specified :param:user
         """
-        if not user in self.proxies:
-            self.proxies[user] = ConfigProxy(self, user)
-        return self.proxies[user]
+        with self._proxies_lock:
+            proxy = self.proxies.pop(user, None)
+            if proxy is not None:
+                self.proxy_hits += 1
+            else:
+                self.proxy_misses += 1
+                proxy = ConfigProxy(self, user)
+            self.proxies[user] = proxy
+            if len(self.proxies) > self.max_proxies:
+                self._evict_proxies()
+            return proxy
+
+    def _evict_proxies(self):
+        """
+        Forgets the least recently used proxies over ``max_proxies``. The proxies with changes not saved yet are
+        kept, so no change is lost. Must be called with the lock of the proxies acquired.
+        """
+        excess = len(self.proxies) - self.max_proxies
+        for user, proxy in self.proxies.items():
+            if excess <= 0:
+                break
+            if not proxy.dirty:
+                del self.proxies[user]
+                self.proxy_evictions += 1
+                excess -= 1
+
+    def proxy_stats(self):
+        """
+        :returns:   dict with the counters of the cache of proxies and the approximate bytes held by the loaded
+                    user configs
+        """
+        with self._proxies_lock:
+            proxies = self.proxies.values()
+        return {
+            'proxies': len(proxies),
+            'max_proxies': self.max_proxies,
+            'loaded': sum(1 for proxy in proxies if proxy.loaded),
+            'hits': self.proxy_hits,
+            'misses': self.proxy_misses,
+            'evictions': self.proxy_evictions,
+            'bytes': sum(proxy.size() for proxy in proxies),
+        }
+
+    def size(self):
+        """
+        :returns:   approximate number of bytes of the sections, options and values
+        """
+        return sum(len(section) + sum(len(option) + len(str(value)) for option, value in options.items())
+                   for section, options in self._sections.items())
 
     def get(self, section, val=None, default=None):
         """
@@ -60,13 +208,7 @@ class Config(ConfigParser):
         """
         if val is None:
             return self.internal[section]
-        else:
-            try:
-                return ConfigParser.get(self, section, val)
-            except:
-                if default is not None:
-                    return default
-                raise
+        return _lookup(self.snapshot(), section, self.optionxform(val), default)
 
     def set(self, section, val, value=None):
         """
@@ -84,13 +226,18 @@ class Config(ConfigParser):
             if not self.has_section(section):
                 self.add_section(section)
             ConfigParser.set(self, section, val, value)
+            self._changed()
 
 
-class ConfigProxy:
+class ConfigProxy(TypedGetters):
     """
     A proxy class that directs all writes into user's personal config file
     while reading from both personal and common configs.
 
+    The reads are served from a merged snapshot of both configs, rebuilt when one of them changes.
+
+    The personal config is loaded the first time it's needed.
+
     - *cfg* - :class:`Config` common for all users,
     - *user* - user name
     """
@@ -99,20 +246,62 @@ class ConfigProxy:
         self.base = cfg
         self.user = user
         self.filename = None
-        if user is None:
-            return
-        self.cfg = Config()
-        path = os.path.split(self.base.filename)[0] + '/users/%s.conf' % user
-        if not os.path.exists(path):
-            open(path, 'w').close()
-        self.filename = path
-        self.cfg.load(path)
-
-        # Proxy methods
-        self.save = self.cfg.save
-        self.add_section = self.cfg.add_section
-        self.has_section = self.cfg.has_section
-        self.remove_section = self.cfg.remove_section
+        self._cfg = None
+        self._saved = None
+        self._merged = (None, None)
+        if user is not None:
+            self.filename = os.path.split(self.base.filename)[0] + '/users/%s.conf' % user
+
+    @property
+    def cfg(self):
+        """
+        :class:`Config` of the user, None for the anonymous user
+        """
+        if self._cfg is None and self.user is not None:
+            cfg = Config(max_proxies=0)
+            store = self.base.user_store
+            if store is not None:
+                for section, options in store.get_settings(self.user).items():
+                    for option, value in options.items():
+                        cfg.set(section, option, value)
+            else:
+                if not os.path.exists(self.filename):
+                    open(self.filename, 'w').close()
+                cfg.load(self.filename)
+            self._saved = cfg.version
+            self._cfg = cfg
+        return self._cfg
+
+    @property
+    def loaded(self):
+        return self._cfg is not None
+
+    @property
+    def dirty(self):
+        """
+        True if the personal config has changes not saved yet
+        """
+        return self._cfg is not None and self._cfg.version != self._saved
+
+    def size(self):
+        return self._cfg.size() if self._cfg is not None else 0
+
+    # Proxy methods
+    def save(self):
+        """
+        Saves the personal config in the user store if there's one or in its file otherwise.
+        """
+        if self.base.user_store is not None:
+            self.base.user_store.set_settings(self.user, self.cfg.as_dict(), replace=True)
+        else:
+            self.cfg.save()
+        self._saved = self.cfg.version
+
+    def add_section(self, section):
+        return self.cfg.add_section(section)
+
+    def has_section(self, section):
+        return self.cfg.has_section(section)
 
     def get(self, section, val=None, default=None):
         """
@@ -125,10 +314,29 @@ class ConfigProxy:
         :type   section:    str
         :returns:           value or default value if value was not found
         """
-        if self.user is not None and self.cfg.has_option(section, val):
-            return self.cfg.get(section, val)
-        else:
-            return self.base.get(section, val, default)
+        if val is None:
+            return self.base.get(section)
+        return _lookup(self.snapshot(), section, self.base.optionxform(val), default)
+
+    def snapshot(self):
+        """
+        :returns:   the snapshot of the common config overlaid with the snapshot of the user's config
+        """
+        if self.cfg is None:
+            return self.base.snapshot()
+        versions, merged = self._merged
+        if versions == (self.base.version, self.cfg.version):
+            return merged
+        versions = (self.base.version, self.cfg.version)
+        merged = dict(self.base.snapshot())
+        for section, values in self.cfg.snapshot().items():
+            if section in merged:
+                section_values = merged[section] = dict(merged[section])
+                section_values.update(values)
+            else:
+                merged[section] = values
+        self._merged = (versions, merged)
+        return merged
 
     def set(self, section, val, value=None):
         """
@@ -153,11 +361,7 @@ class ConfigProxy:
         :type   name:        str
         :returns:           bool
         """
-        if self.base.has_option(section, name):
-            return True
-        if self.user is None:
-            return False
-        return self.cfg.has_option(section, name)
+        return self.base.optionxform(name) in self.snapshot().get(section, ())
 
     def options(self, section):
         """
@@ -0,0 +1,152 @@
+"""
+Helpers to wait for blocking operations without freezing the gevent loop that serves the requests.
+
+The server doesn't monkey-patch the standard library, so a blocking call made by a request handler stops every
+connected client. These helpers move the blocking call to the threadpool of the gevent hub and make the calling
+greenlet wait cooperatively. Outside the gevent loop (background threads, wsgiref or no gevent at all) they simply
+call the function.
+"""
+import sys
+import time
+import threading
+
+try:
+    import gevent
+    import gevent.event
+    from gevent.hub import get_hub
+except ImportError:
+    gevent = None
+
+
+def in_loop():
+    """
+    :returns:   True if the caller runs in the thread of the gevent loop
+    """
+    return gevent is not None and isinstance(threading.current_thread(), threading._MainThread)
+
+
+def blocking(func, *args, **kwargs):
+    """
+    Calls ``func`` with the given arguments, in a thread of the gevent threadpool if the caller is in the gevent
+    loop, and returns its result (or raises its exception).
+    """
+    if not in_loop():
+        return func(*args, **kwargs)
+    return get_hub().threadpool.apply(func, args, kwargs)
+
+
+def sleep(seconds):
+    """
+    Sleeps without blocking the gevent loop.
+    """
+    if in_loop():
+        gevent.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+class Event(object):
+    """
+    An event that can be set from any thread. The greenlets of the gevent loop wait for it on a gevent event, so
+    unlike :func:`blocking` they don't take a thread of the threadpool while they wait; the rest of threads wait on a
+    :class:`threading.Event`.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        # gevent events of the greenlets waiting in the loop
+        self._waiters = []
+        # Async watcher of the loop that wakes the waiters when the event is set from another thread
+        self._watcher = None
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            watcher = self._watcher
+        if watcher is None:
+            return
+        if in_loop():
+            self._wake()
+        else:
+            watcher.send()
+
+    def _wake(self):
+        with self._lock:
+            waiters, self._waiters = self._waiters, []
+            watcher, self._watcher = self._watcher, None
+        if watcher is not None:
+            watcher.stop()
+        for waiter in waiters:
+            waiter.set()
+
+    def wait(self, timeout=None):
+        """
+        :returns:   True if the event is set, False if the wait timed out
+        """
+        if not in_loop():
+            return self._event.wait(timeout)
+        with self._lock:
+            if self._event.is_set():
+                return True
+            if self._watcher is None:
+                loop = get_hub().loop
+                # The watcher is called async_ since gevent 1.3
+                watcher = getattr(loop, 'async_', None) or getattr(loop, 'async')
+                self._watcher = watcher()
+                self._watcher.start(self._wake)
+            waiter = gevent.event.Event()
+            self._waiters.append(waiter)
+        waiter.wait(timeout)
+        return self._event.is_set()
+
+
+class TaskTimeout(Exception):
+    """
+    Raised by :meth:`Task.get` when the task hasn't finished in time.
+    """
+
+
+class Task(object):
+    """
+    A blocking call running in its own thread (of the gevent threadpool if it has been created from the gevent
+    loop) whose result can be waited for with a timeout. The call isn't interrupted when the wait times out.
+    """
+    def __init__(self, func, *args, **kwargs):
+        if in_loop():
+            self._result = get_hub().threadpool.spawn(func, *args, **kwargs)
+        else:
+            self._result = None
+            self._done = threading.Event()
+            self._value = None
+            self._exc_info = None
+            thread = threading.Thread(target=self._run, args=(func, args, kwargs))
+            thread.daemon = True
+            thread.start()
+
+    def _run(self, func, args, kwargs):
+        try:
+            self._value = func(*args, **kwargs)
+        except:
+            self._exc_info = sys.exc_info()
+        finally:
+            self._done.set()
+
+    def get(self, timeout=None):
+        """
+        Waits for the result of the call and returns it (or raises its exception).
+
+        :raises:    :class:`TaskTimeout` if the call hasn't finished in ``timeout`` seconds
+        """
+        if self._result is not None:
+            try:
+                return self._result.get(timeout=timeout)
+            except gevent.Timeout:
+                raise TaskTimeout()
+        if not self._done.wait(timeout):
+            raise TaskTimeout()
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
@@ -4,6 +4,10 @@ from genesis2.ui import UI
 
 import arkos_platform
 import traceback
+from genesis2.utils.utils import command, shell_cacheable
+
+
+shell_cacheable(['uname', '-a'])
 
 
 class BackendRequirementError(Exception):
@@ -97,7 +101,7 @@ def make_report(app, err):
              'Log:\n%s\n'
              )
             % (version(),
-               shell('uname -a'),
+               command(['uname', '-a']),
                detect_platform(),
                detect_distro(),
                '.'.join([str(x) for x in arkos_platform.python_version_tuple()]),
@@ -0,0 +1,156 @@
+"""
+Pool of workers for the password hashes. Verifying a sha512_crypt or bcrypt hash takes from tens to hundreds of
+milliseconds of CPU on the boards where genesis runs, which would freeze the gevent loop that serves every client.
+"""
+import time
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+from genesis2.core.utils import Singleton
+from genesis2.utils import cooperative
+from genesis2.utils.utils import check_password, hashpw
+
+
+class PoolBusy(Exception):
+    """
+    Raised when the queue of the :class:`HashPool` is full or the result didn't arrive in time, the caller should
+    shed the request.
+    """
+
+
+def _guarded(func, *args):
+    """
+    Runs in the worker: the callbacks of :meth:`multiprocessing.pool.Pool.apply_async` are only called for the
+    results, so the exceptions are returned as results too.
+    """
+    try:
+        return True, func(*args)
+    except Exception, e:
+        return False, e
+
+
+class HashPool(object):
+    """
+    Runs the password hashing functions in a pool of processes (or threads) while the caller waits cooperatively on
+    a :class:`genesis2.utils.cooperative.Event`, set by the pool when the result arrives, so a waiting login doesn't
+    take a thread of the gevent threadpool.
+
+    At most ``max_pending`` calls can be queued or running, the next ones raise :class:`PoolBusy` immediately so an
+    excess of logins can't pile up. A call is pending until its worker finishes, even if its caller gave up waiting.
+
+    The workers are forked, so the pool must be created with :meth:`start` before any thread is started: a worker
+    forked while another thread holds a lock (like the one of logging) would deadlock. Otherwise it's created on its
+    first use.
+
+    Instance vars:
+
+    - ``submitted`` - `int`, calls accepted
+    - ``rejected`` - `int`, calls rejected because the queue was full
+    - ``timeouts`` - `int`, calls whose result didn't arrive in ``timeout`` seconds
+    - ``wait`` - `float`, total seconds the callers have waited for their results
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, processes=None, max_pending=16, threads=False, timeout=30):
+        """
+        :param  processes:      number of workers, the number of CPUs by default
+        :param  max_pending:    calls that can be queued or running at once
+        :param  threads:        use threads instead of processes
+        :param  timeout:        seconds a caller waits for its result
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.max_pending = max_pending
+        self.threads = threads
+        self.timeout = timeout
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait = 0.0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def start(self):
+        """
+        Creates the pool of workers.
+        """
+        self._get_pool()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                pool_class = ThreadPool if self.threads else multiprocessing.Pool
+                self._pool = pool_class(self.processes)
+            return self._pool
+
+    def run(self, func, *args):
+        """
+        Calls ``func(*args)`` in a worker and returns its result. ``func`` must be a function of a module, so it can
+        be sent to a process.
+
+        :raises:    :class:`PoolBusy` if the queue is full or the result takes more than ``timeout`` seconds
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PoolBusy()
+            self._pending += 1
+            self.submitted += 1
+        start = time.time()
+        done = cooperative.Event()
+        outcome = []
+
+        def finished(result):
+            # Called from a thread of the pool
+            with self._lock:
+                self._pending -= 1
+                self.wait += time.time() - start
+            outcome.append(result)
+            done.set()
+
+        try:
+            self._get_pool().apply_async(_guarded, (func,) + args, callback=finished)
+        except:
+            with self._lock:
+                self._pending -= 1
+            raise
+        if not done.wait(self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolBusy()
+        success, value = outcome[0]
+        if not success:
+            raise value
+        return value
+
+    def verify(self, passw, hashpass):
+        """
+        :returns:   True if ``passw`` matches ``hashpass``, see :func:`genesis2.utils.utils.check_password`
+        """
+        return self.run(check_password, passw, hashpass)
+
+    def hash(self, passw, scheme='sha512_crypt'):
+        """
+        :returns:   the hash of ``passw``, see :func:`genesis2.utils.utils.hashpw`
+        """
+        return self.run(hashpw, passw, scheme)
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+
+    def stats(self):
+        with self._lock:
+            completed = self.submitted - self._pending
+            return {
+                'workers': self.processes,
+                'pending': self._pending,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'average_wait': self.wait / completed if completed else 0.0,
+            }
@@ -1,4 +1,12 @@
+import sys
+import time
+import logging
 import threading
+import traceback
+
+
+# The LockStats instance used by every MethodProxy, None while the instrumentation is disabled
+_stats = None
 
 
 class ClassProxy (object):
@@ -16,7 +24,8 @@ class ClassProxy (object):
         if not attr in self.locks:
             self.locks[attr] = threading.Lock()
 
-        return MethodProxy(getattr(self.inner, attr), self.locks[attr])
+        return MethodProxy(getattr(self.inner, attr), self.locks[attr],
+                           '%s.%s' % (self.inner.__class__.__name__, attr))
 
     def deproxy(self):
         return self.inner
@@ -34,14 +43,19 @@ class MethodProxy (object):
     """
     Prevents a method from being called by two threads simultaneously.
     """
-    def __init__(self, method, lock):
+    def __init__(self, method, lock, name=None):
         self.lock = lock
         self.method = method
+        self.name = name if name is not None else getattr(method, '__name__', repr(method))
 
     def __call__(self, *args, **kwargs):
         if hasattr(self.method, 'nonblocking'):
             return self.method(*args, **kwargs)
 
+        stats = _stats
+        if stats is not None:
+            return self._instrumented_call(stats, *args, **kwargs)
+
         self.lock.acquire()
 
         res = None
@@ -52,3 +66,181 @@ class MethodProxy (object):
             self.lock.release()
 
         return res
+
+    def _instrumented_call(self, stats, *args, **kwargs):
+        requested = time.time()
+        contended = not self.lock.acquire(False)
+        if contended:
+            self.lock.acquire()
+        acquired = time.time()
+        stats.acquired(self.lock, self.name)
+
+        try:
+            return self.method(*args, **kwargs)
+        finally:
+            released = time.time()
+            stats.released(self.lock)
+            self.lock.release()
+            stats.record(self.name, contended, acquired - requested, released - acquired)
+
+
+class LockStats (object):
+    """
+    Accumulates the acquire-wait time, the hold time and the contention of the locks used by :class:`MethodProxy`,
+    indexed by the name of the proxied class and method ("Class.method").
+
+    It also keeps track of the locks that are currently held to allow a watchdog to report the stack of their owners.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> [calls, contended, total wait, max wait, total hold, max hold]
+        self._entries = {}
+        # id(lock) -> (name, thread ident, acquire time)
+        self._held = {}
+
+    def acquired(self, lock, name):
+        self._held[id(lock)] = (name, threading.current_thread().ident, time.time())
+
+    def released(self, lock):
+        self._held.pop(id(lock), None)
+
+    def record(self, name, contended, wait, hold):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = [0, 0, 0.0, 0.0, 0.0, 0.0]
+            entry[0] += 1
+            if contended:
+                entry[1] += 1
+            entry[2] += wait
+            entry[3] = max(entry[3], wait)
+            entry[4] += hold
+            entry[5] = max(entry[5], hold)
+
+    def held(self):
+        """
+        :returns:   list of (name, thread ident, acquire time) for every lock currently held
+        """
+        return self._held.values()
+
+    def snapshot(self):
+        """
+        :returns:   dict name -> dict with the accumulated counters of the lock
+        """
+        with self._lock:
+            entries = dict((name, list(entry)) for name, entry in self._entries.items())
+        result = {}
+        for name, (calls, contended, wait, max_wait, hold, max_hold) in entries.items():
+            result[name] = {
+                'calls': calls,
+                'contended': contended,
+                'wait_total': wait,
+                'wait_max': max_wait,
+                'wait_avg': wait / calls,
+                'hold_total': hold,
+                'hold_max': max_hold,
+                'hold_avg': hold / calls,
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+
+
+class LockMonitor (threading.Thread):
+    """
+    Background thread that periodically logs a summary of the :class:`LockStats` and acts as a deadlock watchdog,
+    dumping the stack of the owner of any lock held longer than ``hold_threshold`` seconds.
+    """
+    def __init__(self, stats, summary_interval=300, hold_threshold=30, top=10):
+        threading.Thread.__init__(self, name='LockMonitor')
+        self.daemon = True
+        self.stats = stats
+        self.summary_interval = summary_interval
+        self.hold_threshold = hold_threshold
+        self.top = top
+        self._stop_event = threading.Event()
+        # Locks already reported by the watchdog, to report each stall only once
+        self._reported = set()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        tick = min(self.summary_interval, max(self.hold_threshold / 2.0, 1))
+        last_summary = time.time()
+        while not self._stop_event.wait(tick):
+            self.check_held()
+            if time.time() - last_summary >= self.summary_interval:
+                self.log_summary()
+                last_summary = time.time()
+
+    def check_held(self):
+        logger = logging.getLogger('genesis2')
+        now = time.time()
+        frames = sys._current_frames()
+        stalled = set()
+        for name, ident, since in self.stats.held():
+            if now - since < self.hold_threshold:
+                continue
+            key = (name, ident, since)
+            stalled.add(key)
+            if key in self._reported:
+                continue
+            stack = ''.join(traceback.format_stack(frames[ident])) if ident in frames else '<unknown>\n'
+            logger.warning('Lock of %s held by thread %s for %.1f seconds, possible deadlock. Owner stack:\n%s' %
+                           (name, ident, now - since, stack))
+        # Forget the locks that have been released in the meantime
+        self._reported = stalled
+
+    def log_summary(self):
+        logger = logging.getLogger('genesis2')
+        snapshot = self.stats.snapshot()
+        if not snapshot:
+            return
+        ranking = sorted(snapshot.items(), key=lambda item: item[1]['wait_total'], reverse=True)[:self.top]
+        lines = ['%s: calls=%d contended=%d wait_avg=%.4fs wait_max=%.4fs hold_avg=%.4fs hold_max=%.4fs' %
+                 (name, s['calls'], s['contended'], s['wait_avg'], s['wait_max'], s['hold_avg'], s['hold_max'])
+                 for name, s in ranking]
+        logger.info('Lock contention summary:\n  %s' % '\n  '.join(lines))
+
+
+_monitor = None
+
+
+def enable_stats(summary_interval=300, hold_threshold=30):
+    """
+    Enables the instrumentation of every :class:`MethodProxy` and starts the :class:`LockMonitor`.
+
+    :param  summary_interval:   seconds between two summaries written to the log
+    :type   summary_interval:   int
+    :param  hold_threshold:     seconds a lock can be held before the watchdog dumps the stack of its owner
+    :type   hold_threshold:     int
+    """
+    global _stats, _monitor
+    if _stats is None:
+        _stats = LockStats()
+    if _monitor is None:
+        _monitor = LockMonitor(_stats, summary_interval, hold_threshold)
+        _monitor.start()
+    return _stats
+
+
+def disable_stats():
+    """
+    Disables the instrumentation and stops the :class:`LockMonitor`.
+    """
+    global _stats, _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor.join(5)
+        _monitor = None
+    _stats = None
+
+
+def get_stats():
+    """
+    :returns:   the :class:`LockStats` in use or None if the instrumentation is disabled
+    """
+    return _stats
@@ -0,0 +1,313 @@
+"""
+Request metrics of the server and exposition of every counter of genesis2 in the Prometheus text format.
+"""
+import time
+import logging
+import threading
+
+from genesis2.utils.wsgi import ClosingIterator
+
+# Label of the requests that no route has handled (yet)
+UNMATCHED = 'unmatched'
+
+# Upper bounds of the buckets of the histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (function, label)
+_collectors = {}
+
+
+def register_collector(name, func, label=None):
+    """
+    Registers a function that returns counters to be exposed in the Prometheus format with the prefix
+    ``genesis2_<name>_``. The values that aren't numbers are skipped.
+
+    :param  func:   function without arguments that returns a dict counter -> number or dict of numbers (exposed
+                    with the label ``key``), or a dict entity -> dict counter -> number if ``label`` is given
+    :param  label:  name of the label of the entities
+    """
+    _collectors[name] = (func, label)
+
+
+def unregister_collector(name):
+    _collectors.pop(name, None)
+
+
+def set_route(environ, route):
+    """
+    Labels the request with its route, the pattern that matched its path, instead of the path itself which would
+    make a series per URL. The routers call it before running the handler.
+    """
+    previous = environ.get('genesis2.route', UNMATCHED)
+    environ['genesis2.route'] = route
+    metrics = environ.get('genesis2.metrics')
+    if metrics is not None:
+        metrics.moved(previous, route)
+
+
+class _Histogram(object):
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+class _Shard(object):
+    """
+    Counters written by a single thread.
+    """
+    __slots__ = ('requests', 'latency', 'sizes', 'in_flight')
+
+    def __init__(self):
+        # (route, method, code) -> count
+        self.requests = {}
+        # route -> _Histogram
+        self.latency = {}
+        self.sizes = {}
+        # route -> requests started minus finished by this thread
+        self.in_flight = {}
+
+
+class RequestMetrics(object):
+    """
+    Per route counters of the requests, their status codes, latencies and response sizes, and the requests in
+    flight.
+
+    The counters don't take any lock: every thread writes in its own shard and the shards are added up when they're
+    read, so recording a request costs a few dict updates however many threads serve requests.
+    """
+
+    def __init__(self, latency_buckets=LATENCY_BUCKETS, size_buckets=SIZE_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.size_buckets = size_buckets
+        self._local = threading.local()
+        self._shards = []
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            # list.append is atomic
+            self._shards.append(shard)
+        return shard
+
+    def started(self, route=UNMATCHED):
+        in_flight = self._shard().in_flight
+        in_flight[route] = in_flight.get(route, 0) + 1
+
+    def moved(self, previous, route):
+        in_flight = self._shard().in_flight
+        in_flight[previous] = in_flight.get(previous, 0) - 1
+        in_flight[route] = in_flight.get(route, 0) + 1
+
+    def finished(self, route, method, code, seconds, size):
+        """
+        :param  code:       status code of the response
+        :param  seconds:    time from the start of the request until its body was sent
+        :param  size:       bytes of the body
+        """
+        shard = self._shard()
+        shard.in_flight[route] = shard.in_flight.get(route, 0) - 1
+        key = (route, method, code)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        histogram = shard.latency.get(route)
+        if histogram is None:
+            histogram = shard.latency[route] = _Histogram(self.latency_buckets)
+        histogram.observe(self.latency_buckets, seconds)
+        histogram = shard.sizes.get(route)
+        if histogram is None:
+            histogram = shard.sizes[route] = _Histogram(self.size_buckets)
+        histogram.observe(self.size_buckets, size)
+
+    def snapshot(self):
+        """
+        :returns:   dict with the counters of every shard added up: ``requests`` (route, method, code) -> count,
+                    ``in_flight`` route -> count and ``latency`` and ``sizes`` route -> histogram
+        """
+        requests, in_flight, latency, sizes = {}, {}, {}, {}
+        for shard in list(self._shards):
+            # items() copies the dicts at once, they may be growing in other threads
+            for key, count in shard.requests.items():
+                requests[key] = requests.get(key, 0) + count
+            for route, count in shard.in_flight.items():
+                in_flight[route] = in_flight.get(route, 0) + count
+            for histograms, buckets, result in ((shard.latency, self.latency_buckets, latency),
+                                                (shard.sizes, self.size_buckets, sizes)):
+                for route, histogram in histograms.items():
+                    if route not in result:
+                        result[route] = _Histogram(buckets)
+                    result[route].merge(histogram)
+        return {'requests': requests, 'in_flight': in_flight, 'latency': latency, 'sizes': sizes}
+
+    def reset(self):
+        self._local = threading.local()
+        self._shards = []
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware(object):
+    """
+    Records the requests served by ``application`` in ``metrics``. The request ends when the server closes its
+    body, so the latency and the size of the streamed responses are the ones seen by the client.
+    """
+
+    def __init__(self, application, metrics=None):
+        self._application = application
+        self.metrics = request_metrics if metrics is None else metrics
+
+    def __call__(self, environ, start_response):
+        start = time.time()
+        metrics = self.metrics
+        method = environ.get('REQUEST_METHOD', 'GET')
+        response = ['500']
+
+        def _start_response(status, headers, exc_info=None):
+            response[0] = status[:3]
+            return start_response(status, headers, exc_info)
+
+        environ['genesis2.metrics'] = metrics
+        metrics.started(environ.setdefault('genesis2.route', UNMATCHED))
+        try:
+            body = self._application(environ, _start_response)
+        except:
+            metrics.finished(environ['genesis2.route'], method, '500', time.time() - start, 0)
+            raise
+
+        if isinstance(body, basestring):
+            body = [body]
+        if isinstance(body, (list, tuple)):
+            metrics.finished(environ['genesis2.route'], method, response[0], time.time() - start,
+                             sum(len(chunk) for chunk in body))
+            return body
+
+        sent = [0]
+
+        def count(chunks):
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                yield chunk
+
+        def finish():
+            metrics.finished(environ['genesis2.route'], method, response[0], time.time() - start, sent[0])
+
+        return ClosingIterator(count(body), [getattr(body, 'close', lambda: None), finish])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (name, _escape(labels[name])) for name in sorted(labels))
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _histogram_lines(name, label, histograms, buckets):
+    lines = []
+    for route in sorted(histograms):
+        histogram = histograms[route]
+        cumulative = 0
+        for bound, count in zip(buckets, histogram.counts):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (name, _labels(le=_format_number(bound), **{label: route}), cumulative))
+        lines.append('%s_bucket%s %d' % (name, _labels(le='+Inf', **{label: route}), histogram.count))
+        lines.append('%s_sum%s %s' % (name, _labels(**{label: route}), _format_number(histogram.sum)))
+        lines.append('%s_count%s %d' % (name, _labels(**{label: route}), histogram.count))
+    return lines
+
+
+def _is_number(value):
+    return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+
+def _collector_lines(name, func, label):
+    """
+    :returns:   dict metric name -> list of samples of a collector
+    """
+    samples = {}
+    values = func()
+    if label is not None:
+        for entity, counters in values.items():
+            for counter, value in counters.items():
+                if _is_number(value):
+                    samples.setdefault('genesis2_%s_%s' % (name, counter), []).append(
+                        (_labels(**{label: entity}), value))
+    else:
+        for counter, value in values.items():
+            metric = 'genesis2_%s_%s' % (name, counter)
+            if _is_number(value):
+                samples.setdefault(metric, []).append(('', value))
+            elif isinstance(value, dict):
+                for key, item in value.items():
+                    if _is_number(item):
+                        samples.setdefault(metric, []).append((_labels(key=key), item))
+    return samples
+
+
+def exposition(metrics=None):
+    """
+    :returns:   the request metrics and the counters of the registered collectors in the Prometheus text format
+    """
+    metrics = request_metrics if metrics is None else metrics
+    snapshot = metrics.snapshot()
+    lines = [
+        '# HELP genesis2_http_requests_total Requests served by route, method and status code.',
+        '# TYPE genesis2_http_requests_total counter',
+    ]
+    for (route, method, code), count in sorted(snapshot['requests'].items()):
+        lines.append('genesis2_http_requests_total%s %d' % (_labels(route=route, method=method, code=code), count))
+    lines.extend([
+        '# HELP genesis2_http_requests_in_flight Requests being served by route.',
+        '# TYPE genesis2_http_requests_in_flight gauge',
+    ])
+    for route, count in sorted(snapshot['in_flight'].items()):
+        lines.append('genesis2_http_requests_in_flight%s %d' % (_labels(route=route), count))
+    lines.extend([
+        '# HELP genesis2_http_request_duration_seconds Time until the body of the response was sent by route.',
+        '# TYPE genesis2_http_request_duration_seconds histogram',
+    ])
+    lines.extend(_histogram_lines('genesis2_http_request_duration_seconds', 'route', snapshot['latency'],
+                                  metrics.latency_buckets))
+    lines.extend([
+        '# HELP genesis2_http_response_size_bytes Bytes of the bodies of the responses by route.',
+        '# TYPE genesis2_http_response_size_bytes histogram',
+    ])
+    lines.extend(_histogram_lines('genesis2_http_response_size_bytes', 'route', snapshot['sizes'],
+                                  metrics.size_buckets))
+
+    for name, (func, label) in sorted(_collectors.items()):
+        try:
+            samples = _collector_lines(name, func, label)
+        except Exception:
+            # A broken collector can't take the rest of metrics down
+            logging.getLogger('genesis2').exception('The metrics collector %s failed' % name)
+            continue
+        for metric in sorted(samples):
+            lines.append('# TYPE %s untyped' % metric)
+            for labels, value in sorted(samples[metric]):
+                lines.append('%s%s %s' % (metric, labels, _format_number(value)))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,185 @@
+"""
+Execution of external commands that doesn't block the server.
+
+A command can be a commandline run by the default shell or an argv list executed directly, which avoids spawning
+/bin/sh and any quoting problem of its arguments. Every command runs in a thread of the gevent threadpool (see
+:mod:`genesis2.utils.cooperative`), the number of processes spawned at the same time is capped and the latency of
+every command is recorded in :data:`stats`.
+"""
+import os
+import time
+import signal
+import threading
+import subprocess
+
+from genesis2.utils.cooperative import blocking
+
+
+class ProcessTimeout(Exception):
+    """
+    Raised when a command has been killed because it ran longer than its timeout.
+    """
+    def __init__(self, cmd, timeout):
+        super(ProcessTimeout, self).__init__()
+        self.cmd = cmd
+        self.timeout = timeout
+
+    def __str__(self):
+        return 'Command "%s" killed after %s seconds.' % (self.cmd, self.timeout)
+
+
+class ProcessStats(object):
+    """
+    Latency statistics of the executed commands, indexed by the name of the executable.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> [calls, failures, timeouts, total time, max time]
+        self._entries = {}
+        self.running = 0
+
+    def started(self):
+        with self._lock:
+            self.running += 1
+
+    def record(self, name, elapsed, returncode, timed_out):
+        with self._lock:
+            self.running -= 1
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = [0, 0, 0, 0.0, 0.0]
+            entry[0] += 1
+            if returncode != 0:
+                entry[1] += 1
+            if timed_out:
+                entry[2] += 1
+            entry[3] += elapsed
+            entry[4] = max(entry[4], elapsed)
+
+    def snapshot(self):
+        """
+        :returns:   dict name -> dict with the counters of the command
+        """
+        with self._lock:
+            entries = dict((name, list(entry)) for name, entry in self._entries.items())
+        result = {}
+        for name, (calls, failures, timeouts, total, max_time) in entries.items():
+            result[name] = {
+                'calls': calls,
+                'failures': failures,
+                'timeouts': timeouts,
+                'time_total': total,
+                'time_max': max_time,
+                'time_avg': total / calls,
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._entries = {}
+
+
+stats = ProcessStats()
+
+_slots = threading.BoundedSemaphore(8)
+_timeout = None
+_close_fds = False
+
+
+def configure(max_processes=None, timeout=None, close_fds=None):
+    """
+    :param  max_processes:  maximum number of processes running at the same time
+    :type   max_processes:  int
+    :param  timeout:        default timeout in seconds of every command, None to wait forever
+    :type   timeout:        int
+    :param  close_fds:      default close_fds of every command. Closing the inherited descriptors keeps the children
+                            away from the sockets of the server but costs a syscall per possible descriptor, which
+                            is noticeable with a high RLIMIT_NOFILE
+    :type   close_fds:      bool
+    """
+    global _slots, _timeout, _close_fds
+    if max_processes is not None:
+        _slots = threading.BoundedSemaphore(max_processes)
+    if close_fds is not None:
+        _close_fds = close_fds
+    _timeout = timeout
+
+
+def command_name(cmd):
+    """
+    Returns the name of the executable of a command, skipping the environment assignments of a commandline.
+    """
+    if not isinstance(cmd, basestring):
+        return os.path.basename(cmd[0])
+    for word in cmd.split():
+        if '=' not in word:
+            return os.path.basename(word)
+    return cmd
+
+
+def _kill(process, killed):
+    killed.append(True)
+    try:
+        # Kill the whole group, the children of the shell would keep the pipes open
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        # The process has already finished
+        pass
+
+
+def _run(cmd, input, timeout, env, close_fds):
+    with _slots:
+        stats.started()
+        start = time.time()
+        killed = []
+        p = None
+        try:
+            p = subprocess.Popen(cmd, shell=isinstance(cmd, basestring),
+                                 stdin=subprocess.PIPE if input is not None else None,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE,
+                                 preexec_fn=os.setpgrp,
+                                 close_fds=close_fds,
+                                 env=env)
+            timer = None
+            if timeout is not None:
+                timer = threading.Timer(timeout, _kill, (p, killed))
+                timer.start()
+            try:
+                out, err = p.communicate(input)
+            finally:
+                if timer is not None:
+                    timer.cancel()
+        finally:
+            returncode = p.returncode if p is not None else -1
+            stats.record(command_name(cmd), time.time() - start, returncode, bool(killed))
+
+        if killed:
+            raise ProcessTimeout(cmd, timeout)
+        return p.returncode, out, err
+
+
+def execute(cmd, input=None, timeout=None, env=None, close_fds=None):
+    """
+    Runs a command without blocking the gevent loop.
+
+    :param  cmd:        commandline run by the default shell or argv list executed without shell
+    :type   cmd:        str or list
+    :param  input:      if not None, data fed to the process' stdin
+    :type   input:      str
+    :param  timeout:    seconds after which the process is killed and :class:`ProcessTimeout` raised, the value
+                        set with :func:`configure` is used if None
+    :type   timeout:    int
+    :param  env:        variables added to the environment of the process
+    :type   env:        dict
+    :param  close_fds:  if the inherited descriptors must be closed, the value set with :func:`configure` is used
+                        if None
+    :type   close_fds:  bool
+    :returns:           tuple (exitcode, stdout, stderr)
+    """
+    if env:
+        environment = os.environ.copy()
+        environment.update(env)
+        env = environment
+    return blocking(_run, cmd, input, timeout if timeout is not None else _timeout, env,
+                    close_fds if close_fds is not None else _close_fds)
@@ -0,0 +1,80 @@
+__author__ = 'kudrom'
+import threading
+import time
+from mock import patch
+from unittest import TestCase
+
+from genesis2.utils.cache import TTLCache
+from genesis2.utils import utils
+
+
+class TestTTLCache(TestCase):
+    def setUp(self):
+        self.cache = TTLCache()
+        self.calls = []
+
+    def compute(self):
+        self.calls.append(True)
+        return len(self.calls)
+
+    def test_hit_miss(self):
+        self.assertEqual(self.cache.get('key', self.compute), 1)
+        self.assertEqual(self.cache.get('key', self.compute), 1)
+        self.assertEqual(self.cache.get('other', self.compute), 2)
+        self.assertEqual(self.cache.stats(), {'hits': 1, 'misses': 2, 'shared': 0, 'size': 2})
+
+    def test_ttl(self):
+        self.cache.get('key', self.compute, ttl=10)
+        later = time.time() + 20
+        with patch('time.time') as now:
+            now.return_value = later
+            self.assertEqual(self.cache.get('key', self.compute), 2)
+
+    def test_invalidate(self):
+        self.cache.get('key', self.compute)
+        self.cache.invalidate('key')
+        self.assertEqual(self.cache.get('key', self.compute), 2)
+
+    def test_exception(self):
+        def fail():
+            raise ValueError()
+        self.assertRaises(ValueError, self.cache.get, 'key', fail)
+        self.assertEqual(self.cache.get('key', self.compute), 1)
+
+    def test_single_flight(self):
+        release = threading.Event()
+        results = []
+
+        def slow():
+            release.wait()
+            return self.compute()
+
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get('key', slow))) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.cache.shared, 4)
+
+
+class TestShellCache(TestCase):
+    def test_shell_cacheable(self):
+        utils.shell_cacheable('echo cached')
+        utils.shell_cache.invalidate()
+        misses = utils.shell_cache.misses
+        self.assertEqual(utils.shell('echo cached'), 'cached\n')
+        self.assertEqual(utils.shell_cs('echo cached'), (0, 'cached\n'))
+        self.assertEqual(utils.shell_status('echo cached'), 0)
+        self.assertEqual(utils.shell_cache.misses, misses + 1)
+
+    def test_env_in_key(self):
+        utils.shell_cacheable(['sh', '-c', 'echo $GENESIS_TEST'])
+        utils.shell_cache.invalidate()
+        self.assertEqual(utils.command(['sh', '-c', 'echo $GENESIS_TEST'], env={'GENESIS_TEST': 'a'}), 'a\n')
+        self.assertEqual(utils.command(['sh', '-c', 'echo $GENESIS_TEST'], env={'GENESIS_TEST': 'b'}), 'b\n')
+        self.assertEqual(utils.command(['sh', '-c', 'echo $GENESIS_TEST'], env={'GENESIS_TEST': 'a'}), 'a\n')
@@ -0,0 +1,137 @@
+import os
+import gzip
+import zlib
+import shutil
+import tempfile
+from unittest import TestCase
+
+from genesis2.utils import compression
+from genesis2.utils.compression import CompressionMiddleware, negotiate
+from genesis2.utils.utils import wsgi_serve_file
+from genesis2.utils.wsgi import get_header
+
+
+def application(content, content_type='text/html', status='200 OK', length=True, extra=()):
+    def app(environ, start_response):
+        headers = [('Content-type', content_type)] + list(extra)
+        if length:
+            headers.append(('Content-Length', str(sum(len(chunk) for chunk in content))))
+        start_response(status, headers)
+        return content
+    return app
+
+
+class Response(object):
+    def __init__(self, app, accept='gzip, deflate', method='GET'):
+        environ = {'REQUEST_METHOD': method, 'HTTP_ACCEPT_ENCODING': accept}
+        self.body = app(environ, self.start_response)
+        self.content = ''.join(self.body)
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status = status
+        self.headers = headers
+
+    def header(self, name):
+        return get_header(self.headers, name)
+
+
+class TestNegotiate(TestCase):
+    def test_negotiate(self):
+        self.assertEqual(negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate('deflate'), 'deflate')
+        self.assertEqual(negotiate('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(negotiate('gzip;q=0, *'), 'deflate')
+        self.assertEqual(negotiate('*'), 'gzip')
+        self.assertIsNone(negotiate('identity'))
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate(None))
+
+
+class TestCompressionMiddleware(TestCase):
+    def setUp(self):
+        compression.stats.reset()
+        self.html = ['<html>' + 'genesis ' * 500, '</html>']
+
+    def test_gzip(self):
+        response = Response(CompressionMiddleware(application(self.html)))
+        self.assertEqual(response.header('Content-Encoding'), 'gzip')
+        self.assertEqual(response.header('Vary'), 'Accept-Encoding')
+        self.assertEqual(int(response.header('Content-Length')), len(response.content))
+        self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), ''.join(self.html))
+        stats = compression.stats.snapshot()
+        self.assertEqual(stats['compressed'], {'gzip': 1})
+        self.assertEqual(stats['bytes_in'], len(''.join(self.html)))
+        self.assertLess(stats['ratio'], 0.1)
+
+    def test_deflate(self):
+        response = Response(CompressionMiddleware(application(self.html)), accept='deflate')
+        self.assertEqual(response.header('Content-Encoding'), 'deflate')
+        self.assertEqual(zlib.decompress(response.content), ''.join(self.html))
+
+    def test_stream(self):
+        closed = []
+
+        def generate():
+            try:
+                for chunk in self.html:
+                    yield chunk
+            finally:
+                closed.append(True)
+
+        response = Response(CompressionMiddleware(application(generate(), length=False)))
+        self.assertEqual(response.header('Content-Encoding'), 'gzip')
+        self.assertIsNone(response.header('Content-Length'))
+        self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), ''.join(self.html))
+        response.body.close()
+        self.assertEqual(closed, [True])
+
+    def test_skipped(self):
+        cases = [
+            ('type', application(self.html, content_type='image/png'), 'gzip'),
+            ('type', application(self.html, content_type='text/event-stream'), 'gzip'),
+            ('encoding', application(self.html), 'identity'),
+            ('encoded', application(self.html, extra=[('Content-Encoding', 'gzip')]), 'gzip'),
+            ('status', application(self.html, status='404 Not Found'), 'gzip'),
+            ('size', application(['small']), 'gzip'),
+            ('size', application(['small'], length=False), 'gzip'),
+        ]
+        for reason, app, accept in cases:
+            response = Response(CompressionMiddleware(app, min_size=100), accept=accept)
+            self.assertNotEqual(response.header('Content-Encoding'), 'deflate')
+            self.assertIn(response.content, (''.join(self.html), 'small'))
+        self.assertEqual(compression.stats.snapshot()['skipped'],
+                         {'type': 2, 'encoding': 1, 'encoded': 1, 'status': 1, 'size': 2})
+        self.assertEqual(compression.stats.snapshot()['compressed'], {})
+
+    def test_disabled(self):
+        response = Response(CompressionMiddleware(application(self.html), level=0))
+        self.assertIsNone(response.header('Content-Encoding'))
+
+
+class TestPrecompressed(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'app.js')
+        with open(self.path, 'w') as f:
+            f.write('var genesis;')
+        self.gz = gzip.open(self.path + '.gz', 'wb')
+        self.gz.write('var genesis;')
+        self.gz.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_gzipped_copy(self):
+        response = Response(lambda environ, start_response: wsgi_serve_file(environ, start_response, self.path))
+        self.assertEqual(response.header('Content-Encoding'), 'gzip')
+        self.assertEqual(response.header('Content-type'), 'application/javascript')
+        self.assertEqual(int(response.header('Content-length')), os.path.getsize(self.path + '.gz'))
+        self.assertEqual(zlib.decompress(response.content, 16 + zlib.MAX_WBITS), 'var genesis;')
+
+    def test_not_accepted(self):
+        response = Response(lambda environ, start_response: wsgi_serve_file(environ, start_response, self.path),
+                            accept='identity')
+        self.assertIsNone(response.header('Content-Encoding'))
+        self.assertEqual(response.header('Vary'), 'Accept-Encoding')
+        self.assertEqual(response.content, 'var genesis;')
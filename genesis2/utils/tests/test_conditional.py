@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from genesis2.utils import conditional
+from genesis2.utils.conditional import ConditionalMiddleware, etag_matches, is_fresh, make_etag
+from genesis2.utils.compression import CompressionMiddleware
+from genesis2.utils.utils import wsgi_serve_file
+from genesis2.utils.wsgi import get_header, http_date, parse_http_date
+
+
+class Response(object):
+    def __init__(self, app, **environ):
+        environ.setdefault('REQUEST_METHOD', 'GET')
+        self.body = app(environ, self.start_response)
+        self.content = ''.join(self.body)
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status = status
+        self.headers = headers
+
+    def header(self, name):
+        return get_header(self.headers, name)
+
+
+def application(content, headers=(), status='200 OK'):
+    def app(environ, start_response):
+        start_response(status, [('Content-type', 'text/html'), ('Set-Cookie', 'sess=1')] + list(headers))
+        return content
+    return app
+
+
+class TestValidators(TestCase):
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a"', '"a"'))
+        self.assertTrue(etag_matches('"b", W/"a"', '"a"'))
+        self.assertTrue(etag_matches('"a"', 'W/"a"'))
+        self.assertTrue(etag_matches('*', '"a"'))
+        self.assertFalse(etag_matches('"b"', '"a"'))
+        self.assertFalse(etag_matches(None, '"a"'))
+        self.assertFalse(etag_matches('"a"', None))
+
+    def test_make_etag(self):
+        self.assertEqual(make_etag('genesis'), make_etag('genesis'))
+        self.assertNotEqual(make_etag('genesis'), make_etag('genesis2'))
+        self.assertTrue(make_etag('genesis', weak=True).startswith('W/"'))
+
+    def test_http_dates(self):
+        self.assertEqual(http_date(784111777), 'Sun, 06 Nov 1994 08:49:37 GMT')
+        self.assertEqual(parse_http_date('Sun, 06 Nov 1994 08:49:37 GMT'), 784111777)
+        self.assertEqual(parse_http_date('Sunday, 06-Nov-94 08:49:37 GMT'), 784111777)
+        self.assertEqual(parse_http_date('Sun Nov  6 08:49:37 1994 GMT'), 784111777)
+        self.assertIsNone(parse_http_date('yesterday'))
+        self.assertIsNone(parse_http_date(None))
+
+    def test_is_fresh(self):
+        self.assertTrue(is_fresh({'HTTP_IF_MODIFIED_SINCE': http_date(1000)}, last_modified=1000.5))
+        self.assertFalse(is_fresh({'HTTP_IF_MODIFIED_SINCE': http_date(1000)}, last_modified=1001))
+        self.assertFalse(is_fresh({'HTTP_IF_MODIFIED_SINCE': 'garbage'}, last_modified=1000))
+        # If-None-Match takes precedence
+        self.assertFalse(is_fresh({'HTTP_IF_NONE_MATCH': '"b"', 'HTTP_IF_MODIFIED_SINCE': http_date(1000)},
+                                  etag='"a"', last_modified=1000))
+
+
+class TestConditionalMiddleware(TestCase):
+    def setUp(self):
+        conditional.stats.reset()
+
+    def test_computed_etag(self):
+        app = ConditionalMiddleware(application(['<html>', '</html>']))
+        response = Response(app)
+        self.assertEqual(response.status, '200 OK')
+        etag = response.header('ETag')
+        self.assertEqual(etag, make_etag('<html></html>'))
+
+        response = Response(app, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status, '304 Not Modified')
+        self.assertEqual(response.content, '')
+        self.assertEqual(response.header('ETag'), etag)
+        self.assertEqual(response.header('Set-Cookie'), 'sess=1')
+        self.assertIsNone(response.header('Content-type'))
+        self.assertEqual(conditional.stats.snapshot()['not_modified'], 1)
+
+        response = Response(app, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status, '200 OK')
+        self.assertEqual(response.content, '<html></html>')
+
+    def test_handler_etag(self):
+        closed = []
+
+        def generate():
+            try:
+                yield 'never sent'
+            finally:
+                closed.append(True)
+
+        body = generate()
+        app = ConditionalMiddleware(application(body, [('ETag', '"v1"')]))
+        response = Response(app, HTTP_IF_NONE_MATCH='"v1"')
+        self.assertEqual(response.status, '304 Not Modified')
+        response.body.close()
+        self.assertEqual(conditional.stats.snapshot(), {'computed': 0, 'not_modified': 1, 'bytes_saved': 0})
+        self.assertEqual(closed, [])
+        self.assertRaises(StopIteration, next, body)
+
+    def test_skipped(self):
+        def stream():
+            yield 'chunk'
+
+        cases = [
+            (ConditionalMiddleware(application(['body'], status='404 Not Found')), {}),
+            (ConditionalMiddleware(application(['body'])), {'REQUEST_METHOD': 'POST'}),
+            (ConditionalMiddleware(application(stream())), {}),
+            (ConditionalMiddleware(application(['body']), max_size=2), {}),
+        ]
+        for app, environ in cases:
+            response = Response(app, HTTP_IF_NONE_MATCH='*', **environ)
+            self.assertNotEqual(response.status, '304 Not Modified')
+            self.assertIsNone(response.header('ETag'))
+
+    def test_compressed_etag_is_weak(self):
+        content = ['genesis ' * 500]
+        app = CompressionMiddleware(ConditionalMiddleware(application(content)))
+        response = Response(app, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.header('ETag'), 'W/' + make_etag(content[0]))
+        response = Response(app, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response.header('ETag'))
+        self.assertEqual(response.status, '304 Not Modified')
+        self.assertEqual(response.header('ETag'), 'W/' + make_etag(content[0]))
+        self.assertEqual(response.header('Vary'), 'Accept-Encoding')
+        # The client without compression gets the strong ETag of the identity body
+        response = Response(app, HTTP_IF_NONE_MATCH=make_etag(content[0]))
+        self.assertEqual(response.status, '304 Not Modified')
+        self.assertEqual(response.header('ETag'), make_etag(content[0]))
+
+
+class TestServeFile(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'style.css')
+        with open(self.path, 'w') as f:
+            f.write('body {}')
+        os.utime(self.path, (784111777, 784111777))
+        self.app = lambda environ, start_response: wsgi_serve_file(environ, start_response, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_validators(self):
+        response = Response(self.app)
+        self.assertEqual(response.status, '200 OK')
+        self.assertEqual(response.header('Last-modified'), 'Sun, 06 Nov 1994 08:49:37 GMT')
+        self.assertEqual(response.content, 'body {}')
+
+        response = Response(self.app, HTTP_IF_MODIFIED_SINCE='Sun, 06 Nov 1994 08:49:37 GMT')
+        self.assertEqual(response.status, '304 Not Modified')
+        response = Response(self.app, HTTP_IF_MODIFIED_SINCE='Sat, 05 Nov 1994 08:49:37 GMT')
+        self.assertEqual(response.status, '200 OK')
+        response = Response(self.app, HTTP_IF_MODIFIED_SINCE='not a date')
+        self.assertEqual(response.status, '200 OK')
+
+        etag = Response(self.app).header('ETag')
+        response = Response(self.app, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status, '304 Not Modified')
+        self.assertEqual(response.header('ETag'), etag)
@@ -0,0 +1,89 @@
+__author__ = 'kudrom'
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from ConfigParser import NoSectionError, NoOptionError
+
+from genesis2.utils.config import Config, ConfigProxy
+
+
+class TestConfig(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, 'users'))
+        self.path = os.path.join(self.dir, 'genesis2.conf')
+        with open(self.path, 'w') as fd:
+            fd.write('[genesis2]\nport = 8000\nssl = yes\nHost = localhost\nurl = http://%(host)s:%(port)s\n'
+                     'raw = 100%\n')
+        self.config = Config()
+        self.config.load(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get(self):
+        self.assertEqual(self.config.get('genesis2', 'port'), '8000')
+        self.assertEqual(self.config.get('genesis2', 'HOST'), 'localhost')
+        self.assertEqual(self.config.get('genesis2', 'url'), 'http://localhost:8000')
+        self.assertEqual(self.config.get('genesis2', 'raw'), '100%')
+        self.assertEqual(self.config.get('genesis2', 'missing', 'default'), 'default')
+        self.assertRaises(NoOptionError, self.config.get, 'genesis2', 'missing')
+        self.assertRaises(NoSectionError, self.config.get, 'missing', 'port')
+        self.assertEqual(self.config.get('platform'), self.config.internal['platform'])
+
+    def test_typed(self):
+        self.assertEqual(self.config.get_int('genesis2', 'port'), 8000)
+        self.assertEqual(self.config.get_float('genesis2', 'port'), 8000.0)
+        self.assertTrue(self.config.get_bool('genesis2', 'ssl'))
+        self.assertFalse(self.config.get_bool('genesis2', 'missing', False))
+        self.assertRaises(ValueError, self.config.get_bool, 'genesis2', 'port')
+
+    def test_snapshot_rebuilt(self):
+        snapshot = self.config.snapshot()
+        self.assertIs(self.config.snapshot(), snapshot)
+        self.config.set('genesis2', 'port', '9000')
+        self.assertEqual(self.config.get('genesis2', 'url'), 'http://localhost:9000')
+        self.config.remove_option('genesis2', 'port')
+        self.assertRaises(NoOptionError, self.config.get, 'genesis2', 'port')
+
+    def test_proxy(self):
+        proxy = ConfigProxy(self.config, 'user')
+        self.assertEqual(proxy.get('genesis2', 'port'), '8000')
+        proxy.set('genesis2', 'port', '9000')
+        self.assertEqual(proxy.get_int('genesis2', 'port'), 9000)
+        self.assertEqual(self.config.get('genesis2', 'port'), '8000')
+        self.assertTrue(proxy.has_option('genesis2', 'port'))
+        self.config.set('genesis2', 'ssl', 'no')
+        self.assertFalse(proxy.get_bool('genesis2', 'ssl'))
+        proxy.save()
+        self.assertIn('9000', open(os.path.join(self.dir, 'users', 'user.conf')).read())
+
+    def test_anonymous_proxy(self):
+        proxy = ConfigProxy(self.config, None)
+        self.assertEqual(proxy.get('genesis2', 'port'), '8000')
+        self.assertRaises(Exception, proxy.set, 'genesis2', 'port', '9000')
+
+    def test_proxy_lru(self):
+        config = Config(max_proxies=2)
+        config.load(self.path)
+        users = [config.get_proxy(user) for user in ('a', 'b')]
+        self.assertFalse(users[0].loaded)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'users', 'a.conf')))
+        self.assertIs(config.get_proxy('a'), users[0])
+        users[0].set('genesis2', 'port', '1')
+        config.get_proxy('c')
+        # b is the least recently used, a has unsaved changes
+        self.assertEqual(config.proxies.keys(), ['a', 'c'])
+        config.get_proxy('d')
+        self.assertEqual(config.proxies.keys(), ['a', 'd'])
+        users[0].save()
+        config.get_proxy('e')
+        self.assertEqual(config.proxies.keys(), ['d', 'e'])
+
+        stats = config.proxy_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 5, 3))
+        self.assertEqual(stats['loaded'], 0)
+        config.get_proxy('e').get('genesis2', 'port')
+        self.assertEqual(config.proxy_stats()['loaded'], 1)
+        self.assertIsNot(Config().proxies, config.proxies)
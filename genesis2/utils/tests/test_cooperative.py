@@ -0,0 +1,14 @@
+import threading
+from unittest import TestCase
+
+from genesis2.utils.cooperative import Event
+
+
+class TestEvent(TestCase):
+    def test_set_from_another_thread(self):
+        event = Event()
+        self.assertFalse(event.wait(0.01))
+        threading.Timer(0.01, event.set).start()
+        self.assertTrue(event.wait(5))
+        self.assertTrue(event.is_set())
+        self.assertTrue(event.wait())
@@ -0,0 +1,57 @@
+__author__ = 'kudrom'
+import time
+import threading
+from unittest import TestCase
+
+from genesis2.core.utils import Singleton
+from genesis2.utils.hashpool import HashPool, PoolBusy
+from genesis2.utils.utils import hashpw, check_password
+
+
+def slow(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+class TestHashPool(TestCase):
+    def setUp(self):
+        Singleton._instances.pop(HashPool, None)
+
+    def tearDown(self):
+        HashPool().close()
+        Singleton._instances.pop(HashPool, None)
+
+    def test_processes(self):
+        pool = HashPool(processes=2)
+        hashed = pool.hash('secret')
+        self.assertTrue(check_password('secret', hashed))
+        self.assertTrue(pool.verify('secret', hashed))
+        self.assertFalse(pool.verify('wrong', hashed))
+        self.assertEqual(pool.stats()['submitted'], 3)
+
+    def test_shed(self):
+        pool = HashPool(processes=1, max_pending=1, threads=True)
+        hashed = hashpw('secret')
+        thread = threading.Thread(target=pool.run, args=(slow, 0.2))
+        thread.start()
+        time.sleep(0.05)
+        self.assertRaises(PoolBusy, pool.verify, 'secret', hashed)
+        thread.join()
+        stats = pool.stats()
+        self.assertEqual((stats['rejected'], stats['pending']), (1, 0))
+        self.assertEqual(pool.run(slow, 0), 0)
+
+    def test_timeout(self):
+        pool = HashPool(processes=1, max_pending=1, threads=True, timeout=0.05)
+        self.assertRaises(PoolBusy, pool.run, slow, 0.2)
+        # The worker is still busy, so the call is still pending and the next one is shed
+        self.assertEqual(pool.stats()['pending'], 1)
+        self.assertRaises(PoolBusy, pool.run, slow, 0)
+        time.sleep(0.3)
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['rejected'], stats['pending']), (1, 1, 0))
+
+    def test_exception(self):
+        pool = HashPool(processes=1, threads=True)
+        self.assertRaises(ZeroDivisionError, pool.run, divmod, 1, 0)
+        self.assertEqual(pool.stats()['pending'], 0)
@@ -0,0 +1,80 @@
+__author__ = 'kudrom'
+import threading
+import time
+from unittest import TestCase
+
+from genesis2.utils import interlocked
+from genesis2.utils.interlocked import ClassProxy, LockStats, LockMonitor
+
+
+class Resource(object):
+    def __init__(self):
+        self.started = threading.Event()
+        self.finish = threading.Event()
+
+    def work(self):
+        return 'done'
+
+    def hold(self):
+        self.started.set()
+        self.finish.wait()
+
+
+class TestLockStats(TestCase):
+    def setUp(self):
+        self.stats = interlocked.enable_stats(summary_interval=3600, hold_threshold=3600)
+        self.stats.reset()
+
+    def tearDown(self):
+        interlocked.disable_stats()
+
+    def test_disabled(self):
+        interlocked.disable_stats()
+        self.assertIsNone(interlocked.get_stats())
+        self.assertEqual(ClassProxy(Resource()).work(), 'done')
+        self.assertEqual(self.stats.snapshot(), {})
+
+    def test_record_calls(self):
+        proxy = ClassProxy(Resource())
+        self.assertEqual(proxy.work(), 'done')
+        proxy.work()
+        snapshot = self.stats.snapshot()
+        self.assertIn('Resource.work', snapshot)
+        self.assertEqual(snapshot['Resource.work']['calls'], 2)
+        self.assertEqual(snapshot['Resource.work']['contended'], 0)
+        self.assertEqual(self.stats.held(), [])
+
+    def test_contention(self):
+        resource = Resource()
+        proxy = ClassProxy(resource)
+        owner = threading.Thread(target=proxy.hold)
+        owner.start()
+        resource.started.wait()
+        self.assertEqual(self.stats.held()[0][:2], ('Resource.hold', owner.ident))
+
+        waiter = threading.Thread(target=proxy.hold)
+        waiter.start()
+        time.sleep(0.05)
+        resource.finish.set()
+        owner.join()
+        waiter.join()
+
+        snapshot = self.stats.snapshot()['Resource.hold']
+        self.assertEqual(snapshot['calls'], 2)
+        self.assertEqual(snapshot['contended'], 1)
+        self.assertGreater(snapshot['wait_max'], 0)
+
+
+class TestLockMonitor(TestCase):
+    def test_watchdog(self):
+        stats = LockStats()
+        monitor = LockMonitor(stats, hold_threshold=10)
+        lock = threading.Lock()
+        stats.acquired(lock, 'Resource.hold')
+        stats._held[id(lock)] = ('Resource.hold', threading.current_thread().ident, time.time() - 60)
+
+        monitor.check_held()
+        self.assertEqual(len(monitor._reported), 1)
+        stats.released(lock)
+        monitor.check_held()
+        self.assertEqual(len(monitor._reported), 0)
@@ -0,0 +1,121 @@
+import threading
+from unittest import TestCase
+from mock import patch
+
+from genesis2.utils import metrics
+from genesis2.utils.metrics import MetricsMiddleware, RequestMetrics, exposition, set_route
+
+
+def application(route=None, body=('hello',), status='200 OK'):
+    def app(environ, start_response):
+        if route is not None:
+            set_route(environ, route)
+        start_response(status, [('Content-type', 'text/plain')])
+        return body
+    return app
+
+
+def request(app, path='/', method='GET'):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+    return app(environ, lambda status, headers, exc_info=None: None)
+
+
+class TestRequestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = RequestMetrics(latency_buckets=(0.1, 1.0), size_buckets=(10, 100))
+
+    def test_requests(self):
+        request(MetricsMiddleware(application('/api/(\\w+)'), self.metrics), '/api/meters')
+        request(MetricsMiddleware(application('/api/(\\w+)'), self.metrics), '/api/alerts')
+        request(MetricsMiddleware(application('/api/(\\w+)', status='404 Not Found'), self.metrics))
+        request(MetricsMiddleware(application(), self.metrics), '/nothing', method='POST')
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['requests'], {
+            ('/api/(\\w+)', 'GET', '200'): 2,
+            ('/api/(\\w+)', 'GET', '404'): 1,
+            (metrics.UNMATCHED, 'POST', '200'): 1,
+        })
+        self.assertEqual(snapshot['in_flight'], {'/api/(\\w+)': 0, metrics.UNMATCHED: 0})
+        self.assertEqual(snapshot['sizes']['/api/(\\w+)'].counts, [3, 0])
+        self.assertEqual(snapshot['sizes']['/api/(\\w+)'].sum, 15)
+        self.assertEqual(snapshot['latency']['/api/(\\w+)'].count, 3)
+
+    def test_stream(self):
+        closed = []
+
+        def generate():
+            try:
+                yield 'a' * 50
+                yield 'b' * 50
+            finally:
+                closed.append(True)
+
+        body = request(MetricsMiddleware(application('/logs', body=generate()), self.metrics))
+        self.assertEqual(self.metrics.snapshot()['in_flight'], {'/logs': 1, metrics.UNMATCHED: 0})
+        self.assertEqual(''.join(body), 'a' * 50 + 'b' * 50)
+        body.close()
+        self.assertEqual(closed, [True])
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['in_flight'], {'/logs': 0, metrics.UNMATCHED: 0})
+        self.assertEqual(snapshot['sizes']['/logs'].counts, [0, 1])
+        self.assertEqual(snapshot['requests'], {('/logs', 'GET', '200'): 1})
+
+    def test_exception(self):
+        def broken(environ, start_response):
+            set_route(environ, '/broken')
+            raise ValueError()
+
+        self.assertRaises(ValueError, request, MetricsMiddleware(broken, self.metrics))
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['requests'], {('/broken', 'GET', '500'): 1})
+        self.assertEqual(snapshot['in_flight'], {'/broken': 0, metrics.UNMATCHED: 0})
+
+    def test_threads(self):
+        app = MetricsMiddleware(application('/'), self.metrics)
+
+        def serve():
+            for i in range(100):
+                request(app)
+
+        threads = [threading.Thread(target=serve) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.metrics.snapshot()['requests'], {('/', 'GET', '200'): 400})
+
+
+class TestExposition(TestCase):
+    def setUp(self):
+        self.metrics = RequestMetrics(latency_buckets=(0.1, 1.0), size_buckets=(10, 100))
+        self.collectors = dict(metrics._collectors)
+        metrics._collectors.clear()
+
+    def tearDown(self):
+        metrics._collectors.clear()
+        metrics._collectors.update(self.collectors)
+
+    def test_requests(self):
+        request(MetricsMiddleware(application('/say "hi"'), self.metrics))
+        lines = exposition(self.metrics).splitlines()
+        self.assertIn('# TYPE genesis2_http_requests_total counter', lines)
+        self.assertIn('genesis2_http_requests_total{code="200",method="GET",route="/say \\"hi\\""} 1', lines)
+        self.assertIn('genesis2_http_requests_in_flight{route="/say \\"hi\\""} 0', lines)
+        self.assertIn('genesis2_http_response_size_bytes_bucket{le="10",route="/say \\"hi\\""} 1', lines)
+        self.assertIn('genesis2_http_response_size_bytes_bucket{le="+Inf",route="/say \\"hi\\""} 1', lines)
+        self.assertIn('genesis2_http_response_size_bytes_sum{route="/say \\"hi\\""} 5', lines)
+        self.assertIn('genesis2_http_request_duration_seconds_count{route="/say \\"hi\\""} 1', lines)
+
+    def test_collectors(self):
+        metrics.register_collector('cache', lambda: {'hits': 3, 'ratio': 0.5, 'enabled': True,
+                                                     'compressed': {'gzip': 2}})
+        metrics.register_collector('process', lambda: {'ls': {'calls': 4}}, label='command')
+        metrics.register_collector('broken', lambda: 1 / 0)
+        with patch('genesis2.utils.metrics.logging') as logging:
+            lines = exposition(self.metrics).splitlines()
+        self.assertTrue(logging.getLogger.return_value.exception.called)
+        self.assertIn('genesis2_cache_hits 3', lines)
+        self.assertIn('genesis2_cache_ratio 0.5', lines)
+        self.assertIn('genesis2_cache_compressed{key="gzip"} 2', lines)
+        self.assertIn('genesis2_process_calls{command="ls"} 4', lines)
+        self.assertFalse([line for line in lines if 'enabled' in line or 'broken' in line])
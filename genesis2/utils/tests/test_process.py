@@ -0,0 +1,48 @@
+__author__ = 'kudrom'
+from unittest import TestCase
+
+from genesis2.utils import process
+from genesis2.utils.process import execute, command_name, ProcessTimeout
+from genesis2.utils.utils import shell, shell_cs, shell_status, shell_stdin, command, command_cs, command_stdin
+
+
+class TestProcess(TestCase):
+    def setUp(self):
+        process.stats.reset()
+
+    def test_execute(self):
+        self.assertEqual(execute('echo out; echo err >&2; exit 3'), (3, 'out\n', 'err\n'))
+        self.assertEqual(execute('cat', input='hello'), (0, 'hello', ''))
+
+    def test_timeout(self):
+        self.assertRaises(ProcessTimeout, execute, 'sleep 5', timeout=0.1)
+        self.assertEqual(process.stats.snapshot()['sleep']['timeouts'], 1)
+        self.assertEqual(process.stats.running, 0)
+
+    def test_stats(self):
+        execute('true')
+        execute('LC_ALL=C false')
+        snapshot = process.stats.snapshot()
+        self.assertEqual(snapshot['true']['calls'], 1)
+        self.assertEqual(snapshot['true']['failures'], 0)
+        self.assertEqual(snapshot['false']['failures'], 1)
+
+    def test_execute_argv(self):
+        self.assertEqual(execute(['echo', '$HOME; true']), (0, '$HOME; true\n', ''))
+        self.assertEqual(execute(['sh', '-c', 'echo $VAR'], env={'VAR': 'value'}), (0, 'value\n', ''))
+
+    def test_command_name(self):
+        self.assertEqual(command_name('LC_ALL=C /usr/bin/systemctl status nginx'), 'systemctl')
+        self.assertEqual(command_name(['/usr/bin/pacman', '-R']), 'pacman')
+
+    def test_shell_helpers(self):
+        self.assertEqual(shell('env | grep ^LC_ALL='), 'LC_ALL=C\n')
+        self.assertEqual(shell('echo err >&2', stderr=True), 'err\n')
+        self.assertEqual(shell_status('exit 2'), 2)
+        self.assertEqual(shell_cs('echo hi; exit 1'), (1, 'hi\n'))
+        self.assertEqual(shell_stdin('cat', 'data'), ('data', ''))
+
+    def test_command_helpers(self):
+        self.assertEqual(command(['sh', '-c', 'echo $LC_ALL']), 'C\n')
+        self.assertEqual(command_cs(['sh', '-c', 'echo $A; exit 1'], env={'A': 'a'}), (1, 'a\n'))
+        self.assertEqual(command_stdin(['cat'], 'data'), ('data', ''))
@@ -0,0 +1,60 @@
+__author__ = 'kudrom'
+from unittest import TestCase
+from mock import patch
+
+from genesis2.core.utils import Singleton
+from genesis2.utils.throttle import LoginThrottle
+
+
+class TestLoginThrottle(TestCase):
+    def setUp(self):
+        Singleton._instances.pop(LoginThrottle, None)
+        self.throttle = LoginThrottle(free_failures=2, window=60, base_delay=2, max_delay=10, max_entries=3,
+                                      user_free_failures=4)
+        self.now = 1000.0
+        self.patcher = patch('genesis2.utils.throttle.time.time', lambda: self.now)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        Singleton._instances.pop(LoginThrottle, None)
+
+    def test_backoff(self):
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 0)
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 0)
+        self.assertEqual(self.throttle.check('1.1.1.1', 'admin'), 0)
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 2)
+        self.assertEqual(self.throttle.check('1.1.1.1', 'admin'), 2)
+        # The address is blocked for any username, but the username isn't blocked from other addresses
+        self.assertEqual(self.throttle.check('1.1.1.1', 'guest'), 2)
+        self.assertEqual(self.throttle.check('2.2.2.2', 'admin'), 0)
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 4)
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 8)
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 10)
+        self.now += 11
+        self.assertEqual(self.throttle.check('1.1.1.1', 'admin'), 0)
+        self.assertEqual(self.throttle.stats()['throttled'], 2)
+
+    def test_user(self):
+        self.throttle.max_entries = 100
+        # Guesses spread over many addresses, every one of them under its own limit
+        for i in range(5):
+            self.assertEqual(self.throttle.failure('10.0.0.%d' % i, 'admin'), 2 if i == 4 else 0)
+        self.assertEqual(self.throttle.check('10.0.0.0', 'admin'), 2)
+        # An address without failures isn't blocked by the username
+        self.assertEqual(self.throttle.check('2.2.2.2', 'admin'), 0)
+
+    def test_window_and_success(self):
+        for i in range(3):
+            self.throttle.failure('1.1.1.1', 'admin')
+        self.now += 61
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 0)
+        self.throttle.failure('1.1.1.1', 'admin')
+        self.throttle.success('1.1.1.1', 'admin')
+        self.assertEqual(self.throttle.failure('1.1.1.1', 'admin'), 0)
+
+    def test_bounded(self):
+        for i in range(5):
+            self.throttle.failure('10.0.0.%d' % i, None)
+        stats = self.throttle.stats()
+        self.assertEqual((stats['entries'], stats['evictions'], stats['failures']), (3, 2, 5))
@@ -0,0 +1,80 @@
+__author__ = 'kudrom'
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from genesis2.utils.config import Config, ConfigProxy
+from genesis2.utils.userstore import UserStore
+
+
+class TestUserStore(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = UserStore(os.path.join(self.dir, 'users.db'))
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.dir)
+
+    def test_users(self):
+        self.assertFalse(self.store.has_users())
+        self.assertIsNone(self.store.get_password('admin'))
+        self.store.set_password('admin', '$6$hash')
+        self.store.set_password('guest', '$6$other')
+        self.assertTrue(self.store.has_user('admin'))
+        self.assertEqual(self.store.get_password('admin'), '$6$hash')
+        self.assertEqual(self.store.users(), ['admin', 'guest'])
+        self.store.remove_user('guest')
+        self.assertEqual(self.store.count(), 1)
+        self.assertTrue(self.store.has_users())
+
+    def test_settings(self):
+        self.store.set_settings('admin', {'theme': {'color': 'blue', 'size': 3}})
+        self.store.set_settings('admin', {'theme': {'size': 4}})
+        self.assertEqual(self.store.get_settings('admin'), {'theme': {'color': 'blue', 'size': '4'}})
+        self.assertEqual(self.store.get_setting('admin', 'theme', 'size'), '4')
+        self.store.set_settings('admin', {'lang': {'code': 'es'}}, replace=True)
+        self.assertEqual(self.store.get_settings('admin'), {'lang': {'code': 'es'}})
+        self.store.remove_setting('admin', 'lang')
+        self.assertEqual(self.store.get_settings('admin'), {})
+
+    def test_batch_rollback(self):
+        try:
+            with self.store.batch():
+                self.store.set_password('admin', '$6$hash')
+                raise KeyError()
+        except KeyError:
+            pass
+        self.assertFalse(self.store.has_user('admin'))
+
+    def test_threads(self):
+        def add(i):
+            self.store.set_password('user%d' % i, 'hash')
+        threads = [threading.Thread(target=add, args=(i,)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.store.count(), 5)
+
+    def test_import_legacy(self):
+        os.mkdir(os.path.join(self.dir, 'users'))
+        path = os.path.join(self.dir, 'genesis2.conf')
+        with open(path, 'w') as fd:
+            fd.write('[users]\nadmin = $6$hash\n')
+        with open(os.path.join(self.dir, 'users', 'admin.conf'), 'w') as fd:
+            fd.write('[theme]\ncolor = blue\n')
+        config = Config()
+        config.load(path)
+        self.assertEqual(self.store.import_legacy(config), (1, 1))
+        self.assertEqual(self.store.get_password('admin'), '$6$hash')
+
+        # The personal configs are read from and saved in the store
+        config.user_store = self.store
+        proxy = ConfigProxy(config, 'admin')
+        self.assertEqual(proxy.get('theme', 'color'), 'blue')
+        proxy.set('theme', 'color', 'red')
+        proxy.save()
+        self.assertEqual(self.store.get_settings('admin'), {'theme': {'color': 'red'}})
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from StringIO import StringIO
+
+from genesis2.utils import wsgi
+
+
+class TestResponseBody(TestCase):
+    def test_known_length(self):
+        self.assertEqual(wsgi.response_body('hello'), (['hello'], 5))
+        self.assertEqual(wsgi.response_body(None), ([''], 0))
+        self.assertEqual(wsgi.response_body(u'\xf1'), (['\xc3\xb1'], 2))
+        self.assertEqual(wsgi.response_body(['ab', u'c']), (['ab', 'c'], 3))
+
+    def test_generator(self):
+        closed = []
+
+        def generate():
+            try:
+                yield 'a'
+                yield u'b'
+            finally:
+                closed.append(True)
+
+        body, length = wsgi.response_body(generate())
+        self.assertIsNone(length)
+        self.assertEqual(list(body), ['a', 'b'])
+        body.close()
+        self.assertEqual(closed, [True])
+
+    def test_close_propagates_before_the_end(self):
+        closed = []
+
+        def generate():
+            try:
+                for i in range(10):
+                    yield str(i)
+            finally:
+                closed.append(True)
+
+        body, length = wsgi.response_body(generate())
+        self.assertEqual(next(iter(body)), '0')
+        body.close()
+        self.assertEqual(closed, [True])
+
+    def test_file(self):
+        content = StringIO('x' * (wsgi.FILE_BLOCK_SIZE + 1))
+        body, length = wsgi.response_body(content)
+        self.assertIsNone(length)
+        self.assertEqual([len(chunk) for chunk in body], [wsgi.FILE_BLOCK_SIZE, 1])
+        body.close()
+        self.assertTrue(content.closed)
+
+
+class TestClosingIterator(TestCase):
+    def test_callbacks(self):
+        calls = []
+        body = wsgi.ClosingIterator(['a', 'b'], [lambda: calls.append(1), lambda: calls.append(2)])
+        self.assertEqual(list(body), ['a', 'b'])
+        body.close()
+        body.close()
+        self.assertEqual(calls, [1, 2])
+
+
+class TestGetHeader(TestCase):
+    def test_get_header(self):
+        headers = [('Content-type', 'text/html'), ('content-length', '3')]
+        self.assertEqual(wsgi.get_header(headers, 'Content-Length'), '3')
+        self.assertIsNone(wsgi.get_header(headers, 'ETag'))
@@ -0,0 +1,122 @@
+import time
+import threading
+from collections import OrderedDict
+
+from genesis2.core.utils import Singleton
+
+
+class LoginThrottle(object):
+    """
+    Limits the failed logins per client address and per pair of address and username with an exponential backoff.
+
+    Every key has ``free_failures`` failures inside a ``window`` of seconds for free; each further failure blocks the
+    key for ``base_delay`` seconds, doubled on every failure up to ``max_delay``. The failures of a key are forgotten
+    when it doesn't fail during ``window`` seconds or when a login of it succeeds.
+
+    A username alone is only limited after ``user_free_failures`` failures from any address, against the guesses
+    spread over many addresses, and that limit never blocks an address without failures of its own: nobody can lock
+    the account of someone else by failing logins with its username.
+
+    The tracking table is an LRU bounded by ``max_entries``, so a flood of addresses can't exhaust the memory.
+
+    Instance vars:
+
+    - ``failures`` - `int`, failed logins recorded
+    - ``throttled`` - `int`, attempts rejected because the address, the pair or the username was blocked
+    - ``evictions`` - `int`, keys forgotten because the table was full
+    """
+    __metaclass__ = Singleton
+
+    def __init__(self, free_failures=3, window=900, base_delay=2, max_delay=600, max_entries=10000,
+                 user_free_failures=100):
+        self.free_failures = free_failures
+        self.user_free_failures = user_free_failures
+        self.window = window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_entries = max_entries
+        self.failures = 0
+        self.throttled = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> [failures, time of the last failure, blocked until], least recently failed first
+        self._entries = OrderedDict()
+
+    def _keys(self, address, user):
+        """
+        :returns:   list of tuples (key, failures for free) of a login
+        """
+        keys = []
+        if address:
+            keys.append((('address', address), self.free_failures))
+        if user:
+            keys.append((('pair', (address, user)), self.free_failures))
+            keys.append((('user', user), self.user_free_failures))
+        return keys
+
+    def _failing(self, address, now):
+        entry = self._entries.get(('address', address))
+        return entry is not None and now - entry[1] <= self.window
+
+    def check(self, address, user):
+        """
+        :returns:   seconds the client has to wait before trying again, 0 if the attempt is allowed
+        """
+        now = time.time()
+        wait = 0
+        with self._lock:
+            for key, free in self._keys(address, user):
+                if key[0] == 'user' and not self._failing(address, now):
+                    continue
+                entry = self._entries.get(key)
+                if entry is not None:
+                    wait = max(wait, entry[2] - now)
+            if wait > 0:
+                self.throttled += 1
+        return max(wait, 0)
+
+    def failure(self, address, user):
+        """
+        Records a failed login.
+
+        :returns:   seconds the client has to wait before trying again
+        """
+        now = time.time()
+        wait = 0
+        with self._lock:
+            self.failures += 1
+            for key, free in self._keys(address, user):
+                entry = self._entries.pop(key, None)
+                if entry is None or now - entry[1] > self.window:
+                    entry = [0, now, 0]
+                entry[0] += 1
+                entry[1] = now
+                excess = entry[0] - free
+                if excess > 0:
+                    entry[2] = now + min(self.base_delay * 2 ** (excess - 1), self.max_delay)
+                wait = max(wait, entry[2] - now)
+                self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return wait
+
+    def success(self, address, user):
+        """
+        Forgets the failures of the address, the pair and the username of a successful login.
+        """
+        with self._lock:
+            for key, free in self._keys(address, user):
+                self._entries.pop(key, None)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            blocked = sum(1 for entry in self._entries.values() if entry[2] > now)
+            return {
+                'entries': len(self._entries),
+                'blocked': blocked,
+                'failures': self.failures,
+                'throttled': self.throttled,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,180 @@
+"""
+Indexed store of the users of Genesis: their credentials and their personal settings in a single SQLite database,
+instead of the [users] section of genesis2.conf and a users/<user>.conf file per user.
+"""
+import os
+import glob
+import sqlite3
+import threading
+from contextlib import contextmanager
+from ConfigParser import RawConfigParser
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settings (
+    user TEXT NOT NULL,
+    section TEXT NOT NULL,
+    option TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (user, section, option)
+);
+"""
+
+
+class UserStore(object):
+    """
+    The lookups use the primary keys of the tables, so they cost O(log n) whatever the number of users. Every thread
+    has its own connection; the writes made inside :meth:`batch` are committed in a single transaction.
+    """
+    def __init__(self, path):
+        """
+        :param  path:   path of the database, created if it doesn't exist
+        :type   path:   str
+        """
+        self.path = path
+        self._local = threading.local()
+        with self.batch() as cursor:
+            cursor.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.depth = 0
+        return connection
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager that groups the writes made by the calling thread in a transaction, committed when the block
+        ends without errors and rolled back otherwise. A nested block joins the outer transaction.
+
+        :returns:   a cursor of the connection of the thread
+        """
+        connection = self._connection()
+        self._local.depth += 1
+        try:
+            yield connection.cursor()
+        except:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                connection.rollback()
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            connection.commit()
+
+    def _query(self, sql, *args):
+        return self._connection().execute(sql, args).fetchall()
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # Credentials
+    def has_user(self, name):
+        return bool(self._query('SELECT 1 FROM users WHERE name = ?', name))
+
+    def get_password(self, name):
+        """
+        :returns:   the hash of the password of the user or None if the user doesn't exist
+        """
+        rows = self._query('SELECT password FROM users WHERE name = ?', name)
+        return rows[0][0] if rows else None
+
+    def set_password(self, name, password):
+        """
+        Creates the user or changes its password.
+
+        :param  password:   hash of the password, see :func:`genesis2.utils.utils.hashpw`
+        """
+        with self.batch() as cursor:
+            cursor.execute('INSERT OR REPLACE INTO users (name, password) VALUES (?, ?)', (name, password))
+
+    def remove_user(self, name):
+        with self.batch() as cursor:
+            cursor.execute('DELETE FROM users WHERE name = ?', (name,))
+            cursor.execute('DELETE FROM settings WHERE user = ?', (name,))
+
+    def users(self):
+        return [row[0] for row in self._query('SELECT name FROM users ORDER BY name')]
+
+    def count(self):
+        return self._query('SELECT COUNT(*) FROM users')[0][0]
+
+    def has_users(self):
+        """
+        :returns:   True if there's any user, without counting them all like :meth:`count`
+        """
+        return bool(self._query('SELECT 1 FROM users LIMIT 1'))
+
+    # Settings
+    def get_setting(self, user, section, option, default=None):
+        rows = self._query('SELECT value FROM settings WHERE user = ? AND section = ? AND option = ?',
+                           user, section, option)
+        return rows[0][0] if rows else default
+
+    def get_settings(self, user):
+        """
+        :returns:   dict section -> dict option -> value with the settings of the user
+        """
+        settings = {}
+        for section, option, value in self._query('SELECT section, option, value FROM settings WHERE user = ?',
+                                                  user):
+            settings.setdefault(section, {})[option] = value
+        return settings
+
+    def set_settings(self, user, settings, replace=False):
+        """
+        Stores many settings of a user in a single transaction.
+
+        :param  settings:   dict section -> dict option -> value
+        :param  replace:    if True the settings of the user not in ``settings`` are deleted
+        """
+        rows = [(user, section, option, str(value))
+                for section, options in settings.items() for option, value in options.items()]
+        with self.batch() as cursor:
+            if replace:
+                cursor.execute('DELETE FROM settings WHERE user = ?', (user,))
+            cursor.executemany('INSERT OR REPLACE INTO settings (user, section, option, value) VALUES (?, ?, ?, ?)',
+                               rows)
+
+    def remove_setting(self, user, section, option=None):
+        with self.batch() as cursor:
+            if option is None:
+                cursor.execute('DELETE FROM settings WHERE user = ? AND section = ?', (user, section))
+            else:
+                cursor.execute('DELETE FROM settings WHERE user = ? AND section = ? AND option = ?',
+                               (user, section, option))
+
+    def import_legacy(self, config, users_dir=None):
+        """
+        Imports the users of the [users] section of ``config`` and the settings of the users/<user>.conf files, in
+        a single transaction. The entries already in the store are replaced.
+
+        :param  config:     :class:`genesis2.utils.config.Config` with the [users] section
+        :param  users_dir:  directory with the personal configs, next to the config file by default
+        :returns:           tuple (number of users, number of settings files) imported
+        """
+        if users_dir is None:
+            users_dir = os.path.join(os.path.dirname(config.filename), 'users')
+        users = config.items('users', raw=True) if config.has_section('users') else []
+        files = 0
+        with self.batch() as cursor:
+            cursor.executemany('INSERT OR REPLACE INTO users (name, password) VALUES (?, ?)', users)
+            for path in glob.glob(os.path.join(users_dir, '*.conf')):
+                parser = RawConfigParser()
+                parser.read(path)
+                settings = dict((section, dict(parser.items(section))) for section in parser.sections())
+                self.set_settings(os.path.basename(path)[:-len('.conf')], settings)
+                files += 1
+        return len(users), files
@@ -4,11 +4,24 @@ import ntplib
 import os
 import mimetypes
 import urllib2
-from datetime import datetime
 from hashlib import sha1
 from base64 import b64encode
 from passlib.hash import sha512_crypt, bcrypt
 
+from genesis2.utils.process import execute
+from genesis2.utils.cache import TTLCache
+from genesis2.utils.compression import negotiate
+from genesis2.utils.conditional import is_fresh, not_modified_headers
+from genesis2.utils.wsgi import http_date
+
+
+# Results of the commands declared with shell_cacheable
+shell_cache = TTLCache()
+_cacheable = {}
+
+# Environment of every command run by the helpers
+_C_LOCALE = {'LC_ALL': 'C'}
+
 
 class SystemTime:
     def get_datetime(self, display=''):
@@ -92,20 +105,39 @@ def download(url, file=None, crit=False):
             raise
 
 
-def shell(c, stderr=False):
+def shell_cacheable(c, ttl=None):
     """
-    Runs commandline in the default shell and returns output. Blocking.
+    Declares that the command ``c`` (a commandline or an argv list) is
+    idempotent, so the shell and command helpers can reuse its result instead
+    of running it again.
+
+    :param  ttl:    seconds the result is valid, None for the process lifetime
+    :type   ttl:    int
     """
-    p = subprocess.Popen('LC_ALL=C '+c, shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
+    _cacheable[_cache_key(c)] = ttl
+
+
+def _cache_key(c):
+    return c if isinstance(c, basestring) else tuple(c)
 
-    try:
-        # Workaround; waiting first causes a deadlock
-        data = p.stdout.read()
-    except OSError:
-        # WTF OSError (interrupted request)
-        data = ''
-    p.wait()
-    return data + p.stdout.read() + (p.stderr.read() if stderr else '')
+
+def _execute(c, input=None, env=None):
+    env = dict(_C_LOCALE, **env) if env else _C_LOCALE
+    key = _cache_key(c)
+    if input is None and key in _cacheable:
+        # The same command run with another environment may give another result
+        cache_key = (key, tuple(sorted(env.items())))
+        return shell_cache.get(cache_key, lambda: execute(c, env=env), _cacheable[key])
+    return execute(c, input=input, env=env)
+
+
+def shell(c, stderr=False):
+    """
+    Runs commandline in the default shell and returns output. Blocks the
+    caller but not the gevent loop, see :func:`genesis2.utils.process.execute`.
+    """
+    code, out, err = _execute(c)
+    return out + (err if stderr else '')
 
 
 def shell_bg(c, output=None, deleteout=False):
@@ -129,33 +161,62 @@ def shell_status(c):
     """
     Same, but returns only the exitcode.
     """
-    return subprocess.Popen('LC_ALL=C '+c, shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE).wait()
+    return _execute(c)[0]
 
 
 def shell_cs(c, stderr=False):
     """
     Same, but returns exitcode and output in a tuple.
     """
-    p = subprocess.Popen('LC_ALL=C '+c, shell=True, stderr=subprocess.PIPE, stdout=subprocess.PIPE)
-
-    try:
-        # Workaround; waiting first causes a deadlock
-        data = p.stdout.read()
-    # WTF OSError (interrupted request)
-    except OSError:
-        data = ''
-    p.wait()
-    return p.returncode, data + p.stdout.read() + (p.stderr.read() if stderr else '')
+    code, out, err = _execute(c)
+    return code, out + (err if stderr else '')
 
 
 def shell_stdin(c, input):
     """
     Same, but feeds input to process' stdin and returns its stdout
-    upon completion.
+    and stderr upon completion.
+    """
+    code, out, err = _execute(c, input=input)
+    return out, err
+
+
+def command(args, stderr=False, env=None):
+    """
+    Runs an argv list without shell and returns output. Blocks the caller
+    but not the gevent loop, see :func:`genesis2.utils.process.execute`.
+
+    :param  args:   program and its arguments
+    :type   args:   list
+    :param  env:    variables added to the environment of the process
+    :type   env:    dict
+    """
+    code, out, err = _execute(args, env=env)
+    return out + (err if stderr else '')
+
+
+def command_status(args, env=None):
+    """
+    Same, but returns only the exitcode.
+    """
+    return _execute(args, env=env)[0]
+
+
+def command_cs(args, stderr=False, env=None):
+    """
+    Same, but returns exitcode and output in a tuple.
+    """
+    code, out, err = _execute(args, env=env)
+    return code, out + (err if stderr else '')
+
+
+def command_stdin(args, input, env=None):
+    """
+    Same, but feeds input to process' stdin and returns its stdout
+    and stderr upon completion.
     """
-    p = subprocess.Popen('LC_ALL=C '+c, shell=True, stderr=subprocess.PIPE,
-                         stdout=subprocess.PIPE, stdin=subprocess.PIPE)
-    return p.communicate(input)
+    code, out, err = _execute(args, input=input, env=env)
+    return out, err
 
 
 def hashpw(passw, scheme='sha512_crypt'):
@@ -178,6 +239,33 @@ def hashpw(passw, scheme='sha512_crypt'):
     return sha512_crypt.encrypt(passw)
 
 
+def check_password(passw, hashpass):
+    """
+    Tests if a password is the same as the hash.
+
+    Instance vars:
+
+    - ``passw`` - ``str``, The password in it's original form
+    - ``hash`` - ``str``, The hashed version of the password to check against
+    """
+    if hashpass.startswith('{SHA}'):
+        try:
+            import warnings
+            warnings.warn(
+                'SHA1 as a password hash may be removed in a future release.')
+            passw_hash = '{SHA}' + b64encode(sha1(passw).digest())
+            if passw_hash == hashpass:
+                return True
+        except:
+            import traceback
+            traceback.print_exc()
+    elif hashpass.startswith('$2a$') and len(hashpass) == 60:
+        return bcrypt.verify(passw, hashpass)
+    elif sha512_crypt.identify(hashpass):
+        return sha512_crypt.verify(passw, hashpass)
+    return False
+
+
 def str_fsize(sz):
     """
     Formats file size as string (1.2 Mb)
@@ -196,7 +284,8 @@ def str_fsize(sz):
 
 def wsgi_serve_file(req, start_response, file):
     """
-    Serves a file as WSGI reponse.
+    Serves a file as WSGI reponse. The clients that already have it (If-None-Match or If-Modified-Since) get a
+    304 Not Modified.
     """
     # Check for directory traversal
     if file.find('..') > -1:
@@ -226,18 +315,24 @@ def wsgi_serve_file(req, start_response, file):
             content_type = mimetype
     headers.append(('Content-type', content_type))
 
-    size = os.path.getsize(file)
     mtimestamp = os.path.getmtime(file)
-    mtime = datetime.utcfromtimestamp(mtimestamp)
+    # A precompressed copy next to the file, if it's up to date, is sent as it is to the clients that accept gzip
+    gzipped = file + '.gz'
+    if os.path.isfile(gzipped) and os.path.getmtime(gzipped) >= mtimestamp:
+        headers.append(('Vary', 'Accept-Encoding'))
+        if negotiate(req.get('HTTP_ACCEPT_ENCODING')) == 'gzip':
+            headers.append(('Content-Encoding', 'gzip'))
+            file = gzipped
+    size = os.path.getsize(file)
+    etag = '"%x-%x"' % (int(mtimestamp), size)
+    headers.append(('ETag', etag))
+    headers.append(('Last-modified', http_date(mtimestamp)))
 
-    rtime = req.get('HTTP_IF_MODIFIED_SINCE', None)
-    if rtime is not None:
-        rtime = datetime.strptime(rtime, '%a, %b %d %Y %H:%M:%S GMT')
-        if mtime <= rtime:
-            start_response('304 Not Modified', [])
-            return ''
+    if is_fresh(req, etag=etag, last_modified=mtimestamp):
+        start_response('304 Not Modified', not_modified_headers(headers))
+        return ''
 
     headers.append(('Content-length', str(size)))
-    headers.append(('Last-modified', mtime.strftime('%a, %b %d %Y %H:%M:%S GMT')))
     start_response('200 OK', headers)
-    return open(file).read()
+    with open(file, 'rb') as f:
+        return f.read()
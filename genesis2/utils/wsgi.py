@@ -0,0 +1,110 @@
+"""
+Helpers for the WSGI bodies returned by the handlers and the middlewares of genesis2.
+"""
+from email.utils import formatdate, parsedate_tz, mktime_tz
+
+# Bytes read per chunk when a handler returns a file
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+class ClosingIterator(object):
+    """
+    Iterates over a WSGI body and, when the server closes it, closes the body and calls the ``callbacks``.
+
+    A middleware that wraps the body of the next application must return an object like this one, otherwise the
+    ``close()`` of the original body (which releases its files, processes or locks) would never be called.
+    """
+
+    def __init__(self, body, callbacks=()):
+        """
+        :param  body:       iterable of strings
+        :param  callbacks:  functions without arguments called after closing the body
+        """
+        self._body = body
+        self._iterator = iter(body)
+        self._callbacks = list(callbacks)
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self._iterator.next()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._body, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            for callback in self._callbacks:
+                callback()
+
+
+def _encode(chunk):
+    if isinstance(chunk, unicode):
+        return chunk.encode('utf-8')
+    return chunk
+
+
+def _encode_chunks(iterable):
+    for chunk in iterable:
+        yield _encode(chunk)
+
+
+def response_body(content):
+    """
+    Converts the result of a URL handler to a WSGI body. The handlers may return a string, a list of strings, a file
+    or any other iterable of strings (a generator for example); unicode is encoded as UTF-8 and None is an empty body.
+
+    :returns:   tuple (body, length), where ``length`` is the size in bytes of the body or None if it's not known
+                without consuming it. The ``close()`` of the content, if any, is kept by the body.
+    """
+    if content is None:
+        return [''], 0
+    if isinstance(content, basestring):
+        content = _encode(content)
+        return [content], len(content)
+    if isinstance(content, (list, tuple)) and all(isinstance(chunk, basestring) for chunk in content):
+        body = [_encode(chunk) for chunk in content]
+        return body, sum(len(chunk) for chunk in body)
+    if hasattr(content, 'read'):
+        chunks = iter(lambda: content.read(FILE_BLOCK_SIZE), '')
+        return ClosingIterator(chunks, [content.close] if hasattr(content, 'close') else []), None
+    return ClosingIterator(_encode_chunks(content), [content.close] if hasattr(content, 'close') else []), None
+
+
+def get_header(headers, name, default=None):
+    """
+    :returns:   the value of the first header called ``name`` (case insensitive) in the list ``headers``
+    """
+    name = name.lower()
+    for header, value in headers:
+        if header.lower() == name:
+            return value
+    return default
+
+
+def http_date(timestamp):
+    """
+    :returns:   the timestamp as an HTTP date (RFC 1123), like ``Sun, 06 Nov 1994 08:49:37 GMT``
+    """
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value):
+    """
+    :returns:   the timestamp of an HTTP date in any of the formats of RFC 2616 or None if it's not valid
+    """
+    if not value:
+        return None
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    try:
+        return mktime_tz(parsed)
+    except (OverflowError, ValueError):
+        return None